@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:07
+
+from django.db import migrations, models
+
+
+def backfill_avatar_url(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+    users = User.objects.filter(avatar__isnull=False, avatar__residing_server__isnull=False).values_list(
+        "id", "avatar_id", "avatar__residing_server__base_url"
+    )
+    for user_id, media_id, base_url in users.iterator():
+        User.objects.filter(id=user_id).update(avatar_url=f"{base_url}/api/cloud/avatars/{media_id}/")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('cloud', '0018_storagerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.RunPython(backfill_avatar_url, migrations.RunPython.noop),
+    ]
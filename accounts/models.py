@@ -50,6 +50,8 @@ class User(AbstractUser):
     avatar = models.ForeignKey(
         "cloud.MediaFile", on_delete=models.SET_NULL, null=True, blank=True, related_name="user_avatar"
     )
+    # Denormalized URL of the avatar renditions (cloud.utils.avatars.set_user_avatar), so listing users costs no joins
+    avatar_url = models.URLField(max_length=500, blank=True, default="")
     location = models.CharField(max_length=100, null=True, blank=True)
     gender = models.CharField(max_length=6, choices=GENDER_CHOICES, null=True, blank=True, default="Other")
     bio = models.TextField(null=True, blank=True)
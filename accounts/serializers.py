@@ -29,9 +29,8 @@ class UserSerializer(ModelSerializer):
         ]
 
     def get_avatar(self, obj):
-        if obj.avatar:
-            return obj.avatar.url()
-        return None
+        # Stored on the user, reading it needs no MediaFile/Server queries; clients add ?size=64|128|256
+        return obj.avatar_url or None
 
     def get_followers_count(self, obj):
         return obj.get_followers_count()
@@ -5,6 +5,7 @@ from django.db.models.signals import post_migrate
 from django.dispatch import receiver
 
 from accounts.models import User
+from cloud.utils.avatars import set_user_avatar
 from cloud.utils.media import create_media_file
 
 
@@ -37,6 +38,5 @@ def create_caelium_user(sender, **kwargs):
             password=os.environ["CAELIUM_PASSWORD"],
         )
         user.set_password(user.password)
-        avatar = create_media_file("caelium.png", "avatars", owner=user)
-        user.avatar = avatar
         user.save()
+        set_user_avatar(user, create_media_file("caelium.png", "avatars", owner=user))
@@ -17,6 +17,7 @@ from accounts.models import FCMToken, Follow, GoogleToken, User
 from accounts.serializers import FCMTokenSerializer, FollowListSerializer, FollowSerializer, UserSerializer
 from base.utils import log_admin
 from chats.models import Chat, Message
+from cloud.utils.avatars import set_user_avatar
 from cloud.utils.media import create_media_file
 
 
@@ -127,8 +128,7 @@ class GoogleLogin(APIView):
                         print(data['picture'])
                         avatar = create_media_file(file=data["picture"], folder="avatars", filename=f"{email}.png", owner=user, privacy="public")
                         if avatar:
-                            user.avatar = avatar
-                            user.save()
+                            set_user_avatar(user, avatar)
 
             except IntegrityError:
                 user = User.objects.get(email=email)
@@ -246,6 +246,10 @@ class BaseConsumer(WebsocketConsumer):
     def typing(self, event):
         self.send(text_data=json.dumps(event["data"]))
 
+    def cloud_changes(self, event):
+        # The cloud change journal moved; sync clients fetch /api/cloud/changes/ from their cursor
+        self.send(text_data=json.dumps({"category": "cloud_changes", "cursor": event["cursor"]}))
+
     def broadcast_status(self, is_online):
         status_data = {
             "type": "user_status_change",
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from cloud.models import Directory, FileTag, SharedItem, Tag, CloudFile, MediaFile
+from cloud.models import AccessEntry, Directory, FileTag, OrganizeJob, SharedItem, Tag, CloudFile, MediaFile
+from cloud.utils.integrity import verify_media
 
 
 @admin.register(Directory)
@@ -32,6 +34,16 @@ class SharedItemAdmin(admin.ModelAdmin):
     get_shared_item.short_description = "Shared Item"
 
 
+@admin.register(AccessEntry)
+class AccessEntryAdmin(admin.ModelAdmin):
+    list_display = ("user", "owner", "file", "directory", "permission")
+    list_filter = ("permission",)
+    search_fields = ("user__username", "owner__username", "file__name", "directory__name")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("user", "owner", "file", "directory")
+
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ("name", "owner", "related_user", "created_at")
@@ -51,5 +63,37 @@ class FileTagAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related("file", "tag")
 
 
+@admin.register(OrganizeJob)
+class OrganizeJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "owner", "directory", "status", "processed_files", "total_files", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("owner__username", "directory__name")
+    readonly_fields = ("cursor",)
+
+
 admin.site.register(CloudFile)
-admin.site.register(MediaFile)
+
+
+@admin.register(MediaFile)
+class MediaFileAdmin(admin.ModelAdmin):
+    list_display = ("filename", "owner", "size", "is_encrypted", "integrity_status", "last_verified_at", "is_deleted")
+    list_filter = ("integrity_status", "is_encrypted", "is_deleted", "folder")
+    search_fields = ("filename", "media_hash", "owner__username")
+    readonly_fields = ("media_hash", "last_verified_at", "integrity_status", "integrity_error")
+    exclude = ("encryption_key", "encryption_nonce")
+    actions = ["verify_integrity"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("owner")
+
+    @admin.action(description="Verify integrity of selected media now")
+    def verify_integrity(self, request, queryset):
+        counts = {"ok": 0, "missing": 0, "corrupt": 0}
+        for media in queryset:
+            media.integrity_status, media.integrity_error = verify_media(media)
+            media.last_verified_at = timezone.now()
+            media.save(update_fields=["integrity_status", "integrity_error", "last_verified_at"])
+            counts[media.integrity_status] += 1
+        self.message_user(
+            request, f"{counts['ok']} ok, {counts['missing']} missing, {counts['corrupt']} corrupt"
+        )
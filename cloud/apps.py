@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CloudConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "cloud"
+
+    def ready(self):
+        import cloud.signals
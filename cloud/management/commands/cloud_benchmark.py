@@ -0,0 +1,122 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cloud.utils.benchmark import (
+    DEFAULT_SIZES,
+    BenchmarkError,
+    environment_info,
+    parse_size,
+    run_benchmark,
+)
+
+OPERATIONS = ("upload_file", "upload_chunked", "preview", "download")
+
+
+class Command(BaseCommand):
+    help = """
+    Benchmark the storage hot paths: direct upload, chunked upload (initiate, chunks, finalize),
+    preview and download, each with and without server-side encryption.
+
+    Synthetic incompressible files are generated for every size and pushed through the real
+    views in-process as a throwaway user, with MEDIA_ROOT in a scratch directory and upload
+    admission control lifted. Every result reports median and best wall time, throughput,
+    time to first byte (reads), peak traced Python allocations (tracemalloc) and peak RSS.
+    Results are written as JSON together with the commit and environment, so runs on
+    different commits can be compared.
+
+    Usage:
+    python manage.py cloud_benchmark
+    python manage.py cloud_benchmark --sizes 1KB,1MB,1GB,4GB --repeat 1 --output bench.json
+    python manage.py cloud_benchmark --operations preview,download --no-encryption
+    python manage.py cloud_benchmark --work-dir /mnt/data/bench  # Same disk as MEDIA_ROOT for GB sizes
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated file sizes, e.g. 1KB,16MB,2GB")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per operation and size")
+        parser.add_argument(
+            "--operations", default=",".join(OPERATIONS), help=f"Comma-separated subset of {', '.join(OPERATIONS)}"
+        )
+        parser.add_argument("--no-encryption", action="store_true", help="Only measure unencrypted files")
+        parser.add_argument("--encryption-only", action="store_true", help="Only measure encrypted files")
+        parser.add_argument(
+            "--max-direct-size", default="64MB", help="Largest size measured with upload_file (built in memory)"
+        )
+        parser.add_argument("--chunk-size", default="8MB", help="Chunk size of chunked uploads")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic content")
+        parser.add_argument("--work-dir", help="Scratch directory (default: a new temporary directory)")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [parse_size(size) for size in options["sizes"].split(",") if size.strip()]
+            max_direct_size = parse_size(options["max_direct_size"])
+            chunk_size = parse_size(options["chunk_size"])
+        except ValueError as e:
+            raise CommandError(f"Invalid size: {e}")
+        operations = tuple(operation.strip() for operation in options["operations"].split(",") if operation.strip())
+        unknown = set(operations) - set(OPERATIONS)
+        if unknown:
+            raise CommandError(f"Unknown operations: {', '.join(sorted(unknown))}")
+        if options["no_encryption"] and options["encryption_only"]:
+            raise CommandError("--no-encryption and --encryption-only exclude each other")
+        encryption = (False,) if options["no_encryption"] else (True,) if options["encryption_only"] else (False, True)
+
+        work_dir = Path(options["work_dir"] or tempfile.mkdtemp(prefix="cloud-benchmark-"))
+        work_dir.mkdir(parents=True, exist_ok=True)
+        scratch = Path(tempfile.mkdtemp(prefix="run-", dir=work_dir))
+
+        def report(result):
+            mode = "encrypted" if result["encrypted"] else "plain"
+            ttfb = f", ttfb {result['ttfb_seconds_median'] * 1000:.1f} ms" if result["ttfb_seconds_median"] is not None else ""
+            self.stderr.write(
+                f"  {result['operation']:<15} {result['size_label']:>6} {mode:<9} "
+                f"{result['mb_per_second']} MB/s{ttfb}, peak traced {result['peak_traced_bytes'] / 1024 / 1024:.1f} MB"
+            )
+
+        started = timezone.now()
+        try:
+            results = run_benchmark(
+                sizes,
+                scratch,
+                repeat=max(1, options["repeat"]),
+                encryption=encryption,
+                operations=operations,
+                max_direct_size=max_direct_size,
+                chunk_size=chunk_size,
+                seed=options["seed"],
+                on_result=report,
+            )
+        except BenchmarkError as e:
+            raise CommandError(f"Benchmark request failed: {e}")
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+            if not options["work_dir"]:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        report_data = {
+            "started_at": started.isoformat(),
+            "environment": environment_info(),
+            "parameters": {
+                "sizes": sizes,
+                "repeat": max(1, options["repeat"]),
+                "operations": list(operations),
+                "encryption": list(encryption),
+                "max_direct_size": max_direct_size,
+                "chunk_size": chunk_size,
+                "seed": options["seed"],
+            },
+            "results": results,
+        }
+        output = json.dumps(report_data, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"✓ {len(results)} results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+            self.stderr.write(self.style.SUCCESS(f"✓ {len(results)} results"))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+
+from cloud.utils.gc import run_gc
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class Command(BaseCommand):
+    help = """
+    Reconcile MEDIA_ROOT against the database and reclaim storage.
+
+    Removes abandoned chunked-upload sessions and temp downloads, blob directories without a
+    MediaFile row, soft-deleted media that nothing references any more, and delta-sync chunks
+    that went unused; media rows whose blob is missing are flagged for the integrity report.
+    Directories are streamed and the database is read in batches, so memory stays flat however
+    many files there are. Ages and grace periods come from the CLOUD_GC_* settings.
+    Meant to run periodically, e.g. daily from cron.
+
+    Usage:
+    python manage.py cloud_gc
+    python manage.py cloud_gc --dry-run  # Only report what would be removed
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be removed without touching anything",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        results = run_gc(dry_run=dry_run)
+
+        labels = {
+            "temp_sessions": "Expired upload sessions and temp downloads",
+            "orphan_blobs": "Blob directories without a MediaFile",
+            "deleted_media": "Unreferenced deleted media",
+            "stale_chunks": "Unused delta-sync chunks",
+        }
+        total = 0
+        for step, label in labels.items():
+            stats = results[step]
+            total += stats["bytes"]
+            self.stdout.write(f"{label}: {stats['removed']} ({_format_bytes(stats['bytes'])})")
+
+        missing = results["missing_blobs"]
+        if missing["missing"]:
+            self.stdout.write(self.style.WARNING(f"⚠ {missing['missing']} media rows have no blob on disk"))
+            for media_id in missing["ids"]:
+                self.stdout.write(f"  {media_id}")
+
+        if dry_run:
+            self.stdout.write(f"{_format_bytes(total)} would be reclaimed")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✓ Reclaimed {_format_bytes(total)}"))
@@ -0,0 +1,49 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from cloud.models import OrganizeJob
+from cloud.utils.organize_jobs import run_organize_job
+
+
+class Command(BaseCommand):
+    help = """
+    Run or resume cloud organize jobs in the foreground.
+
+    Jobs left "pending" or "failed" continue from their last committed batch. A job left
+    "running" by a restarted server is taken over once it has not committed a batch for
+    10 minutes, so a job still running in the web process is never run twice.
+
+    Usage:
+    python manage.py organize_cloud            # Resume every unfinished job
+    python manage.py organize_cloud --job ID   # Run a single job
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", help="ID of the organize job to run")
+
+    def handle(self, *args, **options):
+        if options["job"]:
+            try:
+                jobs = [OrganizeJob.objects.get(id=options["job"])]
+            except (OrganizeJob.DoesNotExist, ValidationError) as e:
+                raise CommandError(f"Organize job not found: {options['job']}") from e
+        else:
+            jobs = list(OrganizeJob.objects.exclude(status="completed").order_by("created_at"))
+
+        if not jobs:
+            self.stdout.write("No unfinished organize jobs")
+            return
+
+        for job in jobs:
+            self.stdout.write(f"Running organize job {job.id} ({job.processed_files}/{job.total_files} done)...")
+            result = run_organize_job(job.id)
+            if result is None:
+                self.stdout.write(self.style.WARNING(f"Job {job.id} is already being run elsewhere"))
+            elif result.status == "completed":
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✓ Job {job.id}: {result.moved_files} moved, {result.skipped_files} skipped"
+                    )
+                )
+            else:
+                self.stdout.write(self.style.ERROR(f"Job {job.id} failed: {result.error}"))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cloud.utils.versions import prune_versions
+
+
+class Command(BaseCommand):
+    help = """
+    Remove file versions past their retention period, and all versions of deleted files.
+
+    Retention is set by CLOUD_VERSION_MAX_AGE_DAYS (the per-file count limit,
+    CLOUD_VERSION_MAX_COUNT, is applied whenever a new version is stored).
+    Meant to run periodically, e.g. from cron.
+
+    Usage:
+    python manage.py prune_versions
+    python manage.py prune_versions --dry-run  # Only report how many versions would go
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count expired versions without deleting them",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            count = prune_versions(dry_run=True)
+            self.stdout.write(f"{count} versions would be removed")
+            return
+
+        removed = prune_versions()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Removed {removed} versions (max age: {settings.CLOUD_VERSION_MAX_AGE_DAYS or 'unlimited'} days)"
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from cloud.models import AccessEntry, SharedItem
+from cloud.utils.acl import sync_access
+
+
+class Command(BaseCommand):
+    help = """
+    Recompute the AccessEntry index (effective permissions derived from shares) from SharedItems
+    and the directory trees.
+
+    Sharing, directory creates and moves keep the index current on their own; this is for
+    repairing drift, e.g. after directories were changed by hand or restored from a backup.
+
+    Usage:
+    python manage.py rebuild_access                 # Every owner with shares or access entries
+    python manage.py rebuild_access --owner EMAIL   # A single owner
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", help="Email of the owner whose index to rebuild")
+
+    def handle(self, *args, **options):
+        if options["owner"]:
+            try:
+                owner_ids = [User.objects.get(email=options["owner"]).id]
+            except User.DoesNotExist as e:
+                raise CommandError(f"User not found: {options['owner']}") from e
+        else:
+            owner_ids = (
+                set(SharedItem.objects.filter(content__isnull=False).values_list("content__owner_id", flat=True))
+                | set(SharedItem.objects.filter(directory__isnull=False).values_list("directory__owner_id", flat=True))
+                | set(AccessEntry.objects.values_list("owner_id", flat=True))
+            )
+
+        for owner_id in sorted(owner_ids):
+            sync_access(owner_id)
+        self.stdout.write(self.style.SUCCESS(f"✓ Rebuilt the access index of {len(owner_ids)} owner(s)"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from cloud.utils.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = """
+    Recompute the storage rollups (bytes and counts of live media per owner, MIME family, folder,
+    server and month) and Server.total_space from MediaFile.
+
+    Ingest and delete keep the rollups current on their own; this is for repairing drift, e.g.
+    after media rows were changed by hand or restored from a backup. One grouped scan of
+    MediaFile, the rollups are replaced in a single transaction.
+
+    Usage:
+    python manage.py rebuild_storage_rollups
+    """
+
+    def handle(self, *args, **options):
+        result = rebuild_rollups()
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ Rebuilt {result['rollups']} storage rollups covering {result['bytes']} bytes")
+        )
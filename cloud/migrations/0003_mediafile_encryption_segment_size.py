@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0002_mediafile_deleted_at_mediafile_folder_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='encryption_segment_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0003_mediafile_encryption_segment_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='compression',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
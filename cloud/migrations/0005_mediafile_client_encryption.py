@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0004_mediafile_compression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='client_key_metadata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='is_client_encrypted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:35
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0005_mediafile_client_encryption'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizeJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total_files', models.PositiveIntegerField(default=0)),
+                ('processed_files', models.PositiveIntegerField(default=0)),
+                ('moved_files', models.PositiveIntegerField(default=0)),
+                ('skipped_files', models.PositiveIntegerField(default=0)),
+                ('cursor', models.UUIDField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('directory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='organize_jobs', to='cloud.directory')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='organize_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:37
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+# Filename date rules as of this migration, in priority order: (prefixes, regex capturing year,
+# month, day). The rule without prefixes matches call recordings by CALL_RECORD_MARKERS instead.
+_YEARS = range(1990, 2100)
+DATE_RULES = [
+    (("IMG_", "VID_", "MVIMG_", "SAVE_"), r"^[A-Z]+_(\d{4})(\d{2})(\d{2})"),
+    (("IMG-", "AUD-", "PTT-", "VID-", "null-", "DOC"), r"^[^-]*-(\d{4})(\d{2})(\d{2})"),
+    (tuple(f"{year}-" for year in _YEARS), r"^(\d{4})-(\d{2})-(\d{2})"),
+    (tuple(str(year) for year in _YEARS), r"^(\d{4})(\d{2})(\d{2})(?=[_.\s-]|$)"),
+    (("Screenshot_",), r"^Screenshot_(\d{4})-?(\d{2})-?(\d{2})"),
+    (("Screenrecorder-",), r"^Screenrecorder-(\d{4})-(\d{2})-(\d{2})"),
+    (("IMG20",), r"^IMG(\d{4})(\d{2})(\d{2})"),
+    (None, r"^[^_]*_(\d{4})(\d{2})(\d{2})"),
+    (("WhatsApp ", "Screen Recording"), r"^\S+ \S+ (\d{4})-(\d{2})-(\d{2})"),
+    (("Screenshot ",), r"^Screenshot (\d{4})-(\d{2})-(\d{2})"),
+    (("VID",), r"^VID(\d{4})(\d{2})(\d{2})"),
+]
+CALL_RECORD_MARKERS = (")_", "call_")
+
+
+def filename_date(filename):
+    """Naive date in a filename, from the first matching rule or a raw Unix timestamp name."""
+    for prefixes, pattern in DATE_RULES:
+        if prefixes is None:
+            matched = any(marker in filename for marker in CALL_RECORD_MARKERS)
+        else:
+            matched = filename.startswith(prefixes)
+        if matched:
+            match = re.match(pattern, filename)
+            try:
+                return datetime(*map(int, match.groups())) if match else None
+            except ValueError:
+                return None
+
+    match = re.match(r"^\d+(?=\.|$)", filename)
+    if match:
+        try:
+            moment = datetime.fromtimestamp(int(match.group()), dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+        return datetime(moment.year, moment.month, moment.day)
+    return None
+
+
+def backfill_captured_at(apps, schema_editor):
+    # EXIF would need every blob decrypted, existing files get the filename date or their upload time
+    MediaFile = apps.get_model("cloud", "MediaFile")
+    media = MediaFile.objects.filter(
+        Q(mime_type__startswith="image/") | Q(mime_type__startswith="video/"), folder="cloud", captured_at=None
+    ).only("id", "filename", "uploaded_at")
+    batch = []
+    for media_file in media.iterator(chunk_size=2000):
+        date = filename_date(media_file.filename)
+        media_file.captured_at = timezone.make_aware(date) if date else media_file.uploaded_at
+        batch.append(media_file)
+        if len(batch) >= 2000:
+            MediaFile.objects.bulk_update(batch, ["captured_at"])
+            batch = []
+    MediaFile.objects.bulk_update(batch, ["captured_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('cloud', '0006_organizejob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='captured_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_captured_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(condition=models.Q(('captured_at__isnull', False), ('is_deleted', False)), fields=['owner', 'captured_at'], name='media_owner_captured_idx'),
+        ),
+    ]
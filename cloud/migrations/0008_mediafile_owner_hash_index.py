@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('cloud', '0007_mediafile_captured_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['owner', 'media_hash'], name='media_owner_hash_idx'),
+        ),
+    ]
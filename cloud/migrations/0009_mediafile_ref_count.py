@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0008_mediafile_owner_hash_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='ref_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
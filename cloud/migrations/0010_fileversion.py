@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0009_mediafile_ref_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileVersion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('version_number', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='cloud.cloudfile')),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='cloud.mediafile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('file', 'version_number'), name='unique_file_version_number')],
+            },
+        ),
+    ]
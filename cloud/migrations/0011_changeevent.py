@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0010_fileversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('rename', 'Rename'), ('move', 'Move'), ('delete', 'Delete')], max_length=10)),
+                ('item_type', models.CharField(choices=[('file', 'File'), ('directory', 'Directory')], max_length=10)),
+                ('item_id', models.UUIDField()),
+                ('parent_id', models.UUIDField(blank=True, null=True)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cloud_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'id'], name='change_owner_cursor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0011_changeevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['owner', 'item_type', 'id'], name='change_owner_type_idx'),
+        ),
+    ]
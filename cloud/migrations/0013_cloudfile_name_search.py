@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:48
+
+from django.conf import settings
+from django.db import OperationalError, migrations, models, transaction
+
+# The SQLite FTS5 trigram table and its triggers as of this migration; cloud.utils.search
+# rebuilds them at runtime whenever they go missing
+SQLITE_FTS_TABLE = "cloud_cloudfile_name_fts"
+SQLITE_FTS_TRIGGERS = {
+    "cloud_cloudfile_name_fts_insert": f"""CREATE TRIGGER cloud_cloudfile_name_fts_insert AFTER INSERT ON cloud_cloudfile BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE} (rowid, file_id, name) VALUES (new.rowid, new.id, new.name);
+    END""",
+    "cloud_cloudfile_name_fts_update": f"""CREATE TRIGGER cloud_cloudfile_name_fts_update AFTER UPDATE OF name ON cloud_cloudfile BEGIN
+        UPDATE {SQLITE_FTS_TABLE} SET name = new.name WHERE rowid = old.rowid;
+    END""",
+    "cloud_cloudfile_name_fts_delete": f"""CREATE TRIGGER cloud_cloudfile_name_fts_delete AFTER DELETE ON cloud_cloudfile BEGIN
+        DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.rowid;
+    END""",
+}
+
+
+def build_sqlite_name_index(connection):
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for trigger in SQLITE_FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5(file_id UNINDEXED, name, tokenize='trigram')"
+            )
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, file_id, name) SELECT rowid, id, name FROM cloud_cloudfile")
+            for statement in SQLITE_FTS_TRIGGERS.values():
+                cursor.execute(statement)
+    except OperationalError as e:
+        # SQLite before 3.34 has no trigram tokenizer, searches then fall back to LIKE scans
+        print(f"File name search index unavailable: {e}")
+
+
+def create_name_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        # Matches the UPPER(name::text) LIKE UPPER(...) that icontains/istartswith compile to
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS cloudfile_name_trgm_idx ON cloud_cloudfile USING gin (UPPER(name::text) gin_trgm_ops)"
+        )
+    elif vendor == "sqlite":
+        build_sqlite_name_index(schema_editor.connection)
+
+
+def drop_name_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS cloudfile_name_trgm_idx")
+    elif vendor == "sqlite":
+        for trigger in SQLITE_FTS_TRIGGERS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0012_changeevent_owner_type_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cloudfile',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['owner', 'name', 'id'], name='cloudfile_owner_name_idx'),
+        ),
+        migrations.RunPython(create_name_search_index, drop_name_search_index),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:50
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+PERMISSION_RANK = {"view": 1, "edit": 2}
+
+
+def compute_access(parents, shares):
+    """Effective permissions of one owner's shares, as cloud.utils.acl computed them at this migration."""
+    children = {}
+    for directory_id, parent_id in parents.items():
+        children.setdefault(parent_id, []).append(directory_id)
+
+    access = {}
+
+    def grant(key, permission):
+        if PERMISSION_RANK[permission] > PERMISSION_RANK.get(access.get(key), 0):
+            access[key] = permission
+
+    for user_id, file_id, directory_id, permission in shares:
+        if file_id:
+            grant((user_id, "file", file_id), permission)
+        elif directory_id in parents:
+            pending = [directory_id]
+            while pending:
+                current = pending.pop()
+                grant((user_id, "directory", current), permission)
+                pending.extend(children.get(current, ()))
+    return access
+
+
+def backfill_access_entries(apps, schema_editor):
+    SharedItem = apps.get_model("cloud", "SharedItem")
+    Directory = apps.get_model("cloud", "Directory")
+    AccessEntry = apps.get_model("cloud", "AccessEntry")
+    owner_ids = set(SharedItem.objects.exclude(content=None).values_list("content__owner_id", flat=True))
+    owner_ids |= set(SharedItem.objects.exclude(directory=None).values_list("directory__owner_id", flat=True))
+    for owner_id in owner_ids:
+        shares = SharedItem.objects.filter(Q(content__owner_id=owner_id) | Q(directory__owner_id=owner_id)).values_list(
+            "user_id", "content_id", "directory_id", "permission"
+        )
+        parents = dict(Directory.objects.filter(owner_id=owner_id).values_list("id", "parent_id"))
+        AccessEntry.objects.bulk_create(
+            [
+                AccessEntry(
+                    user_id=user_id,
+                    owner_id=owner_id,
+                    permission=permission,
+                    **({"file_id": item_id} if item_type == "file" else {"directory_id": item_id}),
+                )
+                for (user_id, item_type, item_id), permission in compute_access(parents, shares).items()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0013_cloudfile_name_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('permission', models.CharField(choices=[('view', 'View'), ('edit', 'Edit')], default='view', max_length=10)),
+                ('directory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='access_entries', to='cloud.directory')),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='access_entries', to='cloud.cloudfile')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='granted_access_entries', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('file__isnull', False)), fields=('user', 'file'), name='unique_access_user_file'), models.UniqueConstraint(condition=models.Q(('directory__isnull', False)), fields=('user', 'directory'), name='unique_access_user_directory')],
+            },
+        ),
+        migrations.RunPython(backfill_access_entries, migrations.RunPython.noop),
+    ]
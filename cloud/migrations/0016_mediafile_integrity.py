@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('cloud', '0015_sharelink'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='integrity_error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='integrity_status',
+            field=models.CharField(blank=True, choices=[('ok', 'OK'), ('missing', 'Missing'), ('corrupt', 'Corrupt')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['last_verified_at', 'id'], name='media_verified_idx'),
+        ),
+    ]
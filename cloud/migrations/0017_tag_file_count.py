@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:57
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_file_count(apps, schema_editor):
+    Tag = apps.get_model("cloud", "Tag")
+    FileTag = apps.get_model("cloud", "FileTag")
+    live_files = (
+        FileTag.objects.filter(tag_id=OuterRef("id"), file__is_deleted=False)
+        .order_by()
+        .values("tag_id")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Tag.objects.update(file_count=Coalesce(Subquery(live_files, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloud', '0016_mediafile_integrity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_file_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='filetag',
+            index=models.Index(fields=['tag', 'file'], name='filetag_tag_file_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:05
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_storage_rollups(apps, schema_editor):
+    MediaFile = apps.get_model("cloud", "MediaFile")
+    StorageRollup = apps.get_model("cloud", "StorageRollup")
+    Server = apps.get_model("api", "Server")
+
+    rollups = defaultdict(lambda: [0, 0])
+    rows = (
+        MediaFile.objects.filter(is_deleted=False)
+        .annotate(upload_month=TruncMonth("uploaded_at", output_field=DateField()))
+        .values_list("owner_id", "mime_type", "folder", "residing_server_id", "upload_month")
+        .annotate(total_bytes=Sum("size"), total_count=Count("id"))
+        .order_by()
+    )
+    for owner_id, mime_type, folder, server_id, month, total_bytes, total_count in rows:
+        family = ((mime_type or "").split("/")[0] or "other")[:32]
+        rollup = rollups[(owner_id, family, folder, server_id, month)]
+        rollup[0] += total_bytes or 0
+        rollup[1] += total_count
+    StorageRollup.objects.bulk_create(
+        [
+            StorageRollup(
+                owner_id=owner_id, mime_family=family, folder=folder, server_id=server_id, month=month, bytes=size, count=count
+            )
+            for (owner_id, family, folder, server_id, month), (size, count) in rollups.items()
+        ],
+        batch_size=500,
+    )
+
+    server_bytes = defaultdict(int)
+    for (_, _, _, server_id, _), (size, _) in rollups.items():
+        server_bytes[server_id] += size
+    Server.objects.update(total_space=0)
+    for server_id, size in server_bytes.items():
+        if server_id:
+            Server.objects.filter(id=server_id).update(total_space=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('cloud', '0017_tag_file_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('mime_family', models.CharField(max_length=32)),
+                ('folder', models.CharField(max_length=255)),
+                ('month', models.DateField()),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('count', models.BigIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='storage_rollups', to=settings.AUTH_USER_MODEL)),
+                ('server', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='storage_rollups', to='api.server')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('server__isnull', False)), fields=('owner', 'mime_family', 'folder', 'server', 'month'), name='unique_rollup_with_server'), models.UniqueConstraint(condition=models.Q(('server__isnull', True)), fields=('owner', 'mime_family', 'folder', 'month'), name='unique_rollup_without_server')],
+            },
+        ),
+        migrations.RunPython(backfill_storage_rollups, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
+import secrets
 import uuid
+from pathlib import Path
 
+from django.conf import settings
 from django.db import models
 
 from accounts.models import User
@@ -12,11 +15,17 @@ class MediaFile(models.Model):
     is_encrypted = models.BooleanField(default=False)
     encryption_key = models.BinaryField(blank=True, null=True)  # AES-256 key (32 bytes)
     encryption_nonce = models.BinaryField(blank=True, null=True)  # GCM nonce (12 bytes)
+    encryption_segment_size = models.PositiveIntegerField(null=True, blank=True)  # Segmented GCM; null = single message
+    compression = models.CharField(max_length=16, blank=True, default="")  # Codec applied before encryption, "" = raw
+    # Client-side encryption: bytes are opaque ciphertext, the server only keeps the client's wrapped-key metadata
+    is_client_encrypted = models.BooleanField(default=False)
+    client_key_metadata = models.JSONField(null=True, blank=True)
     # File metadata
     media_hash = models.CharField(max_length=64)  # SHA-256 hash of original file
     size = models.BigIntegerField()  # Original file size
     encrypted_size = models.BigIntegerField(null=True, blank=True)  # Encrypted file size (includes GCM tag)
     mime_type = models.CharField(max_length=255, blank=True, null=True)
+    captured_at = models.DateTimeField(null=True, blank=True)  # When a photo/video was taken (EXIF or filename)
     residing_server = models.ForeignKey(
         "api.Server", on_delete=models.CASCADE, related_name="media_files", null=True, blank=True
     )
@@ -26,8 +35,34 @@ class MediaFile(models.Model):
     privacy = models.CharField(max_length=10, choices=[("public", "Public"), ("private", "Private")], default="private")
     folder = models.CharField(max_length=255)
     shared_with = models.ManyToManyField(User, related_name="shared_media_files", blank=True)
+    ref_count = models.PositiveIntegerField(default=1)  # CloudFiles sharing these bytes (copies do not duplicate blobs)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
+    # Integrity scrubbing (scrub_media command): blob checked against media_hash, size and GCM tags
+    last_verified_at = models.DateTimeField(null=True, blank=True)
+    integrity_status = models.CharField(
+        max_length=10,
+        choices=[("ok", "OK"), ("missing", "Missing"), ("corrupt", "Corrupt")],
+        blank=True,
+        default="",  # Never checked
+    )
+    integrity_error = models.CharField(max_length=255, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            # The scrubber walks live media least recently verified first
+            models.Index(
+                fields=["last_verified_at", "id"], name="media_verified_idx", condition=models.Q(is_deleted=False)
+            ),
+            # Photo timeline buckets are grouped straight from this index
+            models.Index(
+                fields=["owner", "captured_at"],
+                name="media_owner_captured_idx",
+                condition=models.Q(is_deleted=False, captured_at__isnull=False),
+            ),
+            # Duplicate detection groups a user's files by content hash
+            models.Index(fields=["owner", "media_hash"], name="media_owner_hash_idx"),
+        ]
 
     def __str__(self):
         return f"{self.filename} ({self.id})"
@@ -37,6 +72,11 @@ class MediaFile(models.Model):
             return f"{self.residing_server.base_url}/api/cloud/files/{self.id}/preview/"
         return None
 
+    def file_path(self):
+        """Path of the stored blob: media/{folder}/{uuid}/{filename or "encrypted"}"""
+        stored_name = "encrypted" if self.is_encrypted else self.filename
+        return Path(settings.MEDIA_ROOT) / self.folder / str(self.id) / stored_name
+
 
 class Directory(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -69,10 +109,39 @@ class CloudFile(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True)
     last_accessed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        # Search results are listed by name (keyset pagination on name, id); substring matching on
+        # name is served by a trigram index on Postgres and an FTS5 table on SQLite, see migration 0013
+        indexes = [
+            models.Index(
+                fields=["owner", "name", "id"], name="cloudfile_owner_name_idx", condition=models.Q(is_deleted=False)
+            )
+        ]
+
     def __str__(self):
         return f"{self.name}"
 
 
+class FileVersion(models.Model):
+    """
+    Earlier content of a CloudFile. The current content is CloudFile.media; each version
+    holds its own reference on its MediaFile, so identical versions share one blob.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.ForeignKey(CloudFile, on_delete=models.CASCADE, related_name="versions")
+    media = models.ForeignKey(MediaFile, on_delete=models.CASCADE, related_name="versions")
+    version_number = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # The unique index also serves "versions of a file, newest first" lookups (scanned backwards)
+        constraints = [models.UniqueConstraint(fields=["file", "version_number"], name="unique_file_version_number")]
+
+    def __str__(self):
+        return f"{self.file.name} v{self.version_number}"
+
+
 class SharedItem(models.Model):
     PERMISSION_CHOICES = (
         ("view", "View"),
@@ -91,11 +160,67 @@ class SharedItem(models.Model):
         return f"{shared_item} shared with {self.user.email}"
 
 
+class AccessEntry(models.Model):
+    """
+    Effective permission of a user on a file or directory, derived from SharedItems.
+
+    A shared directory gives an entry for itself and every directory below it, so access to
+    a file is one lookup on the file or its directory. Maintained by cloud.utils.acl.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="access_entries")
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="granted_access_entries")
+    file = models.ForeignKey(CloudFile, on_delete=models.CASCADE, null=True, blank=True, related_name="access_entries")
+    directory = models.ForeignKey(
+        Directory, on_delete=models.CASCADE, null=True, blank=True, related_name="access_entries"
+    )
+    permission = models.CharField(max_length=10, choices=SharedItem.PERMISSION_CHOICES, default="view")
+
+    class Meta:
+        # The unique indexes serve the (user, file) and (user, directory) access checks
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "file"], name="unique_access_user_file", condition=models.Q(file__isnull=False)
+            ),
+            models.UniqueConstraint(
+                fields=["user", "directory"],
+                name="unique_access_user_directory",
+                condition=models.Q(directory__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} can {self.permission} {self.file or self.directory}"
+
+
+def generate_share_token():
+    return secrets.token_urlsafe(24)
+
+
+class ShareLink(models.Model):
+    """
+    Unauthenticated, read-only link to a file or to a directory with everything below it.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    token = models.CharField(max_length=64, unique=True, default=generate_share_token, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="share_links")
+    file = models.ForeignKey(CloudFile, on_delete=models.CASCADE, null=True, blank=True, related_name="share_links")
+    directory = models.ForeignKey(Directory, on_delete=models.CASCADE, null=True, blank=True, related_name="share_links")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)  # null = never
+
+    def __str__(self):
+        return f"Link to {self.file or self.directory}"
+
+
 class Tag(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="tags")
     related_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="related_tags")
+    file_count = models.PositiveIntegerField(default=0)  # Live files with this tag, kept by cloud.utils.tags
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -125,6 +250,125 @@ class FileTag(models.Model):
     class Meta:
         # Ensure a file can't be tagged with the same tag multiple times
         constraints = [models.UniqueConstraint(fields=["file", "tag"], name="unique_file_tag")]
+        # The unique index serves "tags of these files"; this one serves "files with this tag"
+        indexes = [models.Index(fields=["tag", "file"], name="filetag_tag_file_idx")]
 
     def __str__(self):
         return f"{self.file.name} - {self.tag.name}"
+
+
+class OrganizeJob(models.Model):
+    """
+    Background run of the organizer rules over the files of one directory.
+
+    Files are processed in primary-key order and `cursor` holds the id of the last file of the
+    last committed batch, so an interrupted job resumes where it stopped.
+    """
+
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="organize_jobs")
+    # Directory whose files are sorted; null = the root level
+    directory = models.ForeignKey(
+        Directory, on_delete=models.CASCADE, null=True, blank=True, related_name="organize_jobs"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    total_files = models.PositiveIntegerField(default=0)
+    processed_files = models.PositiveIntegerField(default=0)
+    moved_files = models.PositiveIntegerField(default=0)
+    skipped_files = models.PositiveIntegerField(default=0)  # Unclassifiable or name taken in the destination
+    cursor = models.UUIDField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Organize {self.directory or 'root'} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_files:
+            return 100.0 if self.status == "completed" else 0.0
+        return round(min(self.processed_files / self.total_files, 1) * 100, 1)
+
+
+class ChangeEvent(models.Model):
+    """
+    Per-user journal of tree changes for sync clients. Ids only grow, so a client's position
+    in the feed is simply the id of the last event it has applied.
+    """
+
+    ACTION_CHOICES = (
+        ("create", "Create"),
+        ("update", "Update"),  # New content for an existing file (upload of a new version, restore)
+        ("rename", "Rename"),
+        ("move", "Move"),
+        ("delete", "Delete"),  # A deleted directory implies everything below it
+    )
+    ITEM_TYPE_CHOICES = (
+        ("file", "File"),
+        ("directory", "Directory"),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="cloud_changes")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPE_CHOICES)
+    item_id = models.UUIDField()
+    parent_id = models.UUIDField(null=True, blank=True)  # Directory holding the item after the change, null = root
+    name = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "id"], name="change_owner_cursor_idx"),
+            # Newest directory event of a user, the version of the user's directory tree
+            models.Index(fields=["owner", "item_type", "id"], name="change_owner_type_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.item_type} {self.name}"
+
+
+class StorageRollup(models.Model):
+    """
+    Live (not deleted) media bytes and counts per owner, MIME family, folder, server and upload
+    month, kept up to date on ingest and delete by cloud.utils.rollups. Storage dashboards sum
+    these rows instead of scanning MediaFile.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="storage_rollups")
+    mime_family = models.CharField(max_length=32)  # Top-level MIME type ("image", "video", ...), "other" if unknown
+    folder = models.CharField(max_length=255)  # "cloud", "avatars", ...
+    server = models.ForeignKey(
+        "api.Server", on_delete=models.CASCADE, null=True, blank=True, related_name="storage_rollups"
+    )
+    month = models.DateField()  # First day of the upload month
+    bytes = models.BigIntegerField(default=0)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        # NULL servers never collide in a plain unique index, hence one constraint per case
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "mime_family", "folder", "server", "month"],
+                name="unique_rollup_with_server",
+                condition=models.Q(server__isnull=False),
+            ),
+            models.UniqueConstraint(
+                fields=["owner", "mime_family", "folder", "month"],
+                name="unique_rollup_without_server",
+                condition=models.Q(server__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} {self.mime_family} {self.folder} {self.month:%Y-%m}: {self.bytes} bytes"
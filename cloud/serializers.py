@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from cloud.models import CloudFile, Directory, MediaFile
+from cloud.models import CloudFile, Directory, FileVersion, MediaFile, OrganizeJob, ShareLink, Tag
 
 
 class MediaSerializer(serializers.ModelSerializer):
@@ -29,10 +29,22 @@ class CloudFileSerializer(serializers.ModelSerializer):
     size = serializers.SerializerMethodField()
     mime_type = serializers.SerializerMethodField()
     download_url = serializers.SerializerMethodField()
+    client_encrypted = serializers.SerializerMethodField()
+    key_metadata = serializers.SerializerMethodField()
 
     class Meta:
         model = CloudFile
-        fields = ["id", "name", "size", "mime_type", "download_url", "created_at", "modified_at"]
+        fields = [
+            "id",
+            "name",
+            "size",
+            "mime_type",
+            "download_url",
+            "client_encrypted",
+            "key_metadata",
+            "created_at",
+            "modified_at",
+        ]
 
     def get_size(self, obj):
         if obj.media:
@@ -57,12 +69,50 @@ class CloudFileSerializer(serializers.ModelSerializer):
             return mime_types.get(ext, 'application/octet-stream')
         return 'application/octet-stream'
 
+    def get_client_encrypted(self, obj):
+        return bool(obj.media and obj.media.is_client_encrypted)
+
+    def get_key_metadata(self, obj):
+        # Wrapped key material the client needs to decrypt the downloaded ciphertext
+        if obj.media and obj.media.is_client_encrypted:
+            return obj.media.client_key_metadata
+        return None
+
     def get_download_url(self, obj):
         # Return a placeholder URL that the frontend can use
         # You'll need to implement the actual download endpoint
         return f"/api/cloud/files/{obj.media.id}/download/"
 
 
+class TaggedCloudFileSerializer(CloudFileSerializer):
+    """
+    Cloud file with its tags; the queryset must prefetch them (cloud.utils.tags.with_tags).
+    """
+    tags = serializers.SerializerMethodField()
+
+    class Meta(CloudFileSerializer.Meta):
+        fields = CloudFileSerializer.Meta.fields + ["tags"]
+
+    def get_tags(self, obj):
+        return [{"id": file_tag.tag_id, "name": file_tag.tag.name} for file_tag in obj.tags.all()]
+
+
+class FileVersionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for earlier versions of a cloud file.
+    """
+    size = serializers.IntegerField(source="media.size", read_only=True)
+    media_hash = serializers.CharField(source="media.media_hash", read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FileVersion
+        fields = ["id", "version_number", "size", "media_hash", "download_url", "created_at"]
+
+    def get_download_url(self, obj):
+        return f"/api/cloud/files/{obj.media_id}/download/"
+
+
 class BreadcrumbSerializer(serializers.ModelSerializer):
     """
     Serializer for breadcrumb navigation.
@@ -70,3 +120,57 @@ class BreadcrumbSerializer(serializers.ModelSerializer):
     class Meta:
         model = Directory
         fields = ["id", "name"]
+
+
+class OrganizeJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for organize job progress.
+    """
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = OrganizeJob
+        fields = [
+            "id",
+            "directory",
+            "status",
+            "total_files",
+            "processed_files",
+            "moved_files",
+            "skipped_files",
+            "progress",
+            "error",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        ]
+
+
+class ShareLinkSerializer(serializers.ModelSerializer):
+    """
+    Serializer for public share links.
+    """
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ShareLink
+        fields = ["token", "file", "directory", "url", "created_at", "expires_at"]
+
+    def get_url(self, obj):
+        return f"/api/cloud/public/{obj.token}/"
+
+
+class TagSerializer(serializers.ModelSerializer):
+    """
+    Serializer for tags, with the person of people albums.
+    """
+    related_user = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tag
+        fields = ["id", "name", "related_user", "file_count", "created_at"]
+
+    def get_related_user(self, obj):
+        if not obj.related_user_id:
+            return None
+        return {"id": obj.related_user.id, "name": obj.related_user.name, "email": obj.related_user.email}
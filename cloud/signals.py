@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from cloud.models import MediaFile
+from cloud.utils.hot_cache import hot_file_cache
+from cloud.utils.rollups import subtract_media_from_rollups
+
+
+@receiver(post_delete, sender=MediaFile)
+def evict_deleted_media(sender, instance, **kwargs):
+    """Drop a deleted media file's decrypted payload from the hot cache."""
+    hot_file_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender=MediaFile)
+def evict_soft_deleted_media(sender, instance, **kwargs):
+    """Soft-deleted media must not keep being served from the hot cache."""
+    if instance.is_deleted:
+        hot_file_cache.invalidate(instance.id)
+
+
+@receiver(pre_delete, sender=MediaFile)
+def uncount_deleted_media(sender, instance, **kwargs):
+    """Live media removed outright (failed ingests, cascades) leaves the storage rollups."""
+    if not instance.is_deleted:
+        subtract_media_from_rollups(instance)
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
-# Create your tests here.
+from cryptography.exceptions import InvalidTag
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from api.models import Server
+from cloud.models import CloudFile, Directory, FileTag, MediaFile, StorageRollup, Tag
+from cloud.utils.encryption import (
+    GCM_TAG_SIZE,
+    decrypt_segments,
+    encrypt_segments,
+    generate_encryption_key,
+    generate_nonce,
+)
+from cloud.utils.gc import collect_deleted_media
+from cloud.utils.organizer import classify, classify_many, extract_date_from_filename, get_directory_path
+from cloud.utils.rollups import rebuild_rollups
+from cloud.utils.tags import untag_files
+
+SEGMENT = 64  # Small segments, so boundaries are cheap to hit
+
+# (filename, directory path, date taken from the name)
+CLASSIFICATION_CASES = [
+    ("WhatsApp Image 2024-03-05 at 10.15.30.jpeg", ["Pictures"], datetime(2024, 3, 5)),
+    ("WhatsApp Video 2023-12-31 at 23.59.59.mp4", ["Videos"], datetime(2023, 12, 31)),
+    ("WhatsApp Audio 2024-02-29 at 08.00.00.opus", ["Audio", "Voice Notes"], datetime(2024, 2, 29)),
+    ("IMG-20240101-WA0001.jpg", ["Pictures"], datetime(2024, 1, 1)),
+    ("VID-20230715-WA0003.mp4", ["Videos"], datetime(2023, 7, 15)),
+    ("PTT-20240102-WA0004.opus", ["Audio", "Voice Notes"], datetime(2024, 1, 2)),
+    ("AUD-20240103-WA0005.m4a", ["Audio"], datetime(2024, 1, 3)),
+    ("DOC-20240104-WA0006.pdf", ["Documents"], datetime(2024, 1, 4)),
+    ("Screenshot_2024-01-15-12-00-00_com.app.jpg", ["Pictures", "Screenshots"], datetime(2024, 1, 15)),
+    ("Screenshot_20240116-120000.png", ["Pictures", "Screenshots"], datetime(2024, 1, 16)),
+    ("Screenshot 2024-01-17 at 12.00.00.png", ["Pictures", "Screenshots"], datetime(2024, 1, 17)),
+    ("Screenrecorder-2024-01-18-12-00-00.mp4", ["Videos"], datetime(2024, 1, 18)),
+    ("Screen Recording 2024-01-19 at 12.00.00.mov", ["Videos"], datetime(2024, 1, 19)),
+    ("IMG_20240120_120000.jpg", ["Pictures"], datetime(2024, 1, 20)),
+    ("MVIMG_20240121_120000.jpg", ["Pictures"], datetime(2024, 1, 21)),
+    ("VID_20240122_120000.mp4", ["Videos"], datetime(2024, 1, 22)),
+    ("IMG20240123120000.jpg", ["Pictures"], datetime(2024, 1, 23)),
+    ("VID20240124120000.mp4", ["Videos"], datetime(2024, 1, 24)),
+    ("20240125_120000.jpg", ["Pictures"], datetime(2024, 1, 25)),
+    ("2024-01-26 12.00.00.jpg", ["Pictures"], datetime(2024, 1, 26)),
+    ("Mom(0123456789)_20240127120000.m4a", ["Audio"], datetime(2024, 1, 27)),
+    ("Mom(0123456789)_20240127120000.amr", ["Audio", "Call Records"], datetime(2024, 1, 27)),
+    ("call_20240128_120000.amr", ["Audio", "Call Records"], datetime(2024, 1, 28)),
+    ("1704067200.jpg", ["Pictures"], datetime(2024, 1, 1)),
+    ("1704067200", ["Other"], datetime(2024, 1, 1)),
+    ("IMG_20241340_000000.jpg", ["Pictures"], None),
+    ("PHOTO.JPG", ["Pictures"], None),
+    ("report.pdf", ["Documents"], None),
+    ("archive.tar.gz", ["Archives"], None),
+    ("setup.exe", ["Applications"], None),
+    ("unknown.xyz", ["Other"], None),
+    # Hidden files and chat exports are left where they are
+    (".hidden.jpg", None, None),
+    ("WhatsApp Chat with Mom.txt", None, None),
+]
+
+
+class SegmentedEncryptionTests(SimpleTestCase):
+    def setUp(self):
+        self.key = generate_encryption_key()
+        self.nonce = generate_nonce()
+
+    def encrypt(self, data, chunk_size=50, executor=None):
+        """Ciphertext of data, fed to encrypt_segments in chunks that do not line up with segments."""
+        with tempfile.TemporaryFile() as output:
+            chunks = (data[start : start + chunk_size] for start in range(0, len(data), chunk_size))
+            written = encrypt_segments(chunks, output, self.key, self.nonce, segment_size=SEGMENT, executor=executor)
+            output.seek(0)
+            ciphertext = output.read()
+        self.assertEqual(written, len(ciphertext))
+        return ciphertext
+
+    def decrypt(self, ciphertext, start_segment=0, key=None):
+        # decrypt_segments locates the final segment from the size of a real file
+        with tempfile.TemporaryFile() as stored:
+            stored.write(ciphertext)
+            stored.seek(0)
+            return b"".join(
+                decrypt_segments(stored, key or self.key, self.nonce, segment_size=SEGMENT, start_segment=start_segment)
+            )
+
+    def segments(self, ciphertext):
+        size = SEGMENT + GCM_TAG_SIZE
+        return [ciphertext[start : start + size] for start in range(0, len(ciphertext), size)]
+
+    def test_empty_input_round_trip(self):
+        ciphertext = self.encrypt(b"")
+        # A single empty final segment, only its tag
+        self.assertEqual(len(ciphertext), GCM_TAG_SIZE)
+        self.assertEqual(self.decrypt(ciphertext), b"")
+
+    def test_round_trip_around_segment_boundaries(self):
+        for size in (1, SEGMENT - 1, SEGMENT, SEGMENT + 1, 2 * SEGMENT, 2 * SEGMENT + 1, 5 * SEGMENT):
+            with self.subTest(size=size):
+                data = os.urandom(size)
+                ciphertext = self.encrypt(data)
+                segment_count = max(1, -(-size // SEGMENT))
+                self.assertEqual(len(ciphertext), size + segment_count * GCM_TAG_SIZE)
+                self.assertEqual(self.decrypt(ciphertext), data)
+
+    def test_exact_boundary_has_no_empty_trailing_segment(self):
+        ciphertext = self.encrypt(os.urandom(3 * SEGMENT))
+        self.assertEqual([len(segment) for segment in self.segments(ciphertext)], [SEGMENT + GCM_TAG_SIZE] * 3)
+
+    def test_executor_output_matches_inline(self):
+        data = os.urandom(7 * SEGMENT + 3)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            ciphertext = self.encrypt(data, executor=executor)
+        self.assertEqual(ciphertext, self.encrypt(data))
+        self.assertEqual(self.decrypt(ciphertext), data)
+
+    def test_decrypt_from_start_segment(self):
+        data = os.urandom(4 * SEGMENT + 10)
+        ciphertext = self.encrypt(data)
+        self.assertEqual(self.decrypt(ciphertext, start_segment=2), data[2 * SEGMENT :])
+
+    def test_dropped_final_segment_fails(self):
+        ciphertext = self.encrypt(os.urandom(3 * SEGMENT))
+        # The new last segment was not encrypted as final
+        with self.assertRaises(InvalidTag):
+            self.decrypt(b"".join(self.segments(ciphertext)[:-1]))
+
+    def test_truncated_final_segment_fails(self):
+        ciphertext = self.encrypt(os.urandom(2 * SEGMENT + 20))
+        with self.assertRaises(InvalidTag):
+            self.decrypt(ciphertext[:-5])
+
+    def test_truncated_empty_file_fails(self):
+        with self.assertRaises(InvalidTag):
+            self.decrypt(b"")
+
+    def test_reordered_segments_fail(self):
+        first, second, third = self.segments(self.encrypt(os.urandom(3 * SEGMENT)))
+        with self.assertRaises(InvalidTag):
+            self.decrypt(second + first + third)
+
+    def test_duplicated_segment_fails(self):
+        first, second = self.segments(self.encrypt(os.urandom(2 * SEGMENT)))
+        with self.assertRaises(InvalidTag):
+            self.decrypt(first + first + second)
+
+    def test_tampered_segment_fails(self):
+        ciphertext = bytearray(self.encrypt(os.urandom(2 * SEGMENT)))
+        ciphertext[SEGMENT // 2] ^= 1
+        with self.assertRaises(InvalidTag):
+            self.decrypt(bytes(ciphertext))
+
+    def test_wrong_key_fails(self):
+        ciphertext = self.encrypt(os.urandom(SEGMENT))
+        with self.assertRaises(InvalidTag):
+            self.decrypt(ciphertext, key=generate_encryption_key())
+
+
+class OrganizerClassificationTests(SimpleTestCase):
+    def test_classification_table(self):
+        for name, path, date in CLASSIFICATION_CASES:
+            with self.subTest(name=name):
+                self.assertEqual((get_directory_path(name), classify(name).date), (path, date))
+
+    def test_classify_many_matches_classify(self):
+        names = [name for name, _, _ in CLASSIFICATION_CASES]
+        self.assertEqual(classify_many(names), [classify(name) for name in names])
+
+    def test_undated_names_fall_back_to_today(self):
+        self.assertEqual(extract_date_from_filename("report.pdf").date(), datetime.today().date())
+        self.assertEqual(extract_date_from_filename("IMG_20240120_120000.jpg"), datetime(2024, 1, 20))
+
+
+class CloudAPITestCase(TestCase):
+    """Authenticated API client for one user, with blobs written to a throwaway MEDIA_ROOT."""
+
+    client_class = APIClient
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        # Cursors, tree versions and rollups are cached per user id, and ids are reused between tests
+        cache.clear()
+        self.user = User.objects.create(username="owner", email="owner@example.com")
+        self.client.force_authenticate(self.user)
+
+    def upload(self, data, name="file.bin", directory=None):
+        payload = {"file": SimpleUploadedFile(name, data)}
+        if directory is not None:
+            payload["directory"] = str(directory.id)
+        response = self.client.post(reverse("cloud-upload"), payload, format="multipart")
+        self.assertEqual(response.status_code, 201, response.content)
+        return CloudFile.objects.get(id=response.json()["file"]["id"])
+
+    def create_directory(self, name, parent=None):
+        payload = {"name": name, "parent": str(parent.id) if parent else None}
+        response = self.client.post(reverse("cloud-create-directory"), payload, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return Directory.objects.get(owner=self.user, name=name, parent=parent)
+
+    def copy_file(self, cloud_file, parent=None):
+        payload = {"parent": str(parent.id)} if parent else {}
+        response = self.client.post(reverse("cloud-file-copy", args=[cloud_file.id]), payload, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return CloudFile.objects.get(id=response.json()["file"]["id"])
+
+    def delete_file(self, cloud_file):
+        response = self.client.post(reverse("cloud-file-delete", args=[cloud_file.id]))
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def delete_directory(self, directory):
+        response = self.client.post(reverse("cloud-directory-delete", args=[directory.id]))
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def purge_deleted_media(self):
+        """Run the deleted-media GC pass as if the retention period had already passed."""
+        return collect_deleted_media(time.time() + settings.CLOUD_GC_DELETED_MEDIA_DAYS * 86400 + 60)
+
+
+class MediaReferenceTests(CloudAPITestCase):
+    def assertMedia(self, media, ref_count, is_deleted):
+        media.refresh_from_db()
+        self.assertEqual((media.ref_count, media.is_deleted), (ref_count, is_deleted))
+
+    def test_copy_then_delete_copy(self):
+        original = self.upload(b"shared bytes")
+        copy = self.copy_file(original, parent=self.create_directory("Copies"))
+        self.assertEqual(copy.media_id, original.media_id)
+        self.assertMedia(original.media, 2, False)
+
+        self.delete_file(copy)
+        self.assertMedia(original.media, 1, False)
+        self.purge_deleted_media()
+        self.assertTrue(original.media.file_path().exists())
+
+    def test_delete_original_keeps_copy(self):
+        original = self.upload(b"shared bytes")
+        copy = self.copy_file(original, parent=self.create_directory("Copies"))
+
+        self.delete_file(original)
+        self.assertMedia(copy.media, 1, False)
+        self.purge_deleted_media()
+        self.assertTrue(MediaFile.objects.filter(id=copy.media_id).exists())
+        self.assertTrue(copy.media.file_path().exists())
+
+        self.delete_file(copy)
+        self.assertMedia(copy.media, 0, True)
+        self.purge_deleted_media()
+        self.assertFalse(MediaFile.objects.filter(id=copy.media_id).exists())
+        self.assertFalse(copy.media.file_path().exists())
+
+    def test_delete_directory_holding_copies(self):
+        original = self.upload(b"shared bytes")
+        other = self.upload(b"only in the directory", name="other.bin")
+        directory = self.create_directory("Copies")
+        nested = self.create_directory("Nested", parent=directory)
+        self.copy_file(original, parent=directory)
+        self.copy_file(original, parent=nested)
+        self.copy_file(other, parent=nested)
+        self.delete_file(other)
+        self.assertMedia(original.media, 3, False)
+        self.assertMedia(other.media, 1, False)
+
+        self.delete_directory(directory)
+        self.assertMedia(original.media, 1, False)
+        self.assertMedia(other.media, 0, True)
+        self.purge_deleted_media()
+        self.assertTrue(original.media.file_path().exists())
+        self.assertFalse(other.media.file_path().exists())
+
+
+class StorageRollupTests(CloudAPITestCase):
+    def counters(self):
+        rollups = {
+            (rollup.owner_id, rollup.mime_family, rollup.folder, rollup.server_id, rollup.month): (
+                rollup.bytes,
+                rollup.count,
+            )
+            for rollup in StorageRollup.objects.all()
+            # Rows emptied by deletes are kept at zero, a rebuild does not write them
+            if rollup.bytes or rollup.count
+        }
+        return rollups, dict(Server.objects.values_list("id", "total_space"))
+
+    def assertCountersMatchRebuild(self):
+        counted = self.counters()
+        rebuild_rollups()
+        self.assertEqual(counted, self.counters())
+
+    def test_incremental_counters_match_rebuild(self):
+        directory = self.create_directory("Documents")
+        kept = self.upload(b"first draft", name="notes.txt", directory=directory)
+        self.upload(b"second draft, a little longer", name="notes.txt", directory=directory)
+        self.assertEqual(kept.versions.count(), 1)
+        photo = self.upload(b"\xff\xd8 not really a photo", name="photo.jpg")
+        self.copy_file(photo, parent=directory)
+        self.assertCountersMatchRebuild()
+
+        self.delete_file(photo)
+        self.assertCountersMatchRebuild()
+
+        self.delete_directory(directory)
+        self.assertCountersMatchRebuild()
+
+        self.purge_deleted_media()
+        self.assertCountersMatchRebuild()
+
+        other = User.objects.create(username="other", email="other@example.com")
+        self.client.force_authenticate(other)
+        self.upload(b"someone else's file", name="report.pdf")
+        self.upload(b"and their draft", name="notes.txt")
+        self.assertCountersMatchRebuild()
+        self.assertTrue(Server.objects.filter(total_space__gt=0).exists())
+
+        other.delete()
+        self.assertCountersMatchRebuild()
+
+
+class TagFileCountTests(CloudAPITestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.client.post(reverse("cloud-tags"), {"name": "Holiday"}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.tag = Tag.objects.get(id=response.json()["tag"]["id"])
+
+    def tag_request(self, name, files):
+        payload = {"files": [str(cloud_file.id) for cloud_file in files], "tags": [str(self.tag.id)]}
+        response = self.client.post(reverse(name), payload, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertFileCount(self, expected):
+        self.tag.refresh_from_db()
+        live = FileTag.objects.filter(tag=self.tag, file__is_deleted=False).count()
+        self.assertEqual((self.tag.file_count, live), (expected, expected))
+
+    def test_apply_twice_counts_once(self):
+        files = [self.upload(b"one", name="one.jpg"), self.upload(b"two", name="two.jpg")]
+        self.assertEqual(self.tag_request("cloud-tags-apply", files)["added"], 2)
+        self.assertEqual(self.tag_request("cloud-tags-apply", files)["added"], 0)
+        self.assertFileCount(2)
+
+    def test_untag(self):
+        first, second = self.upload(b"one", name="one.jpg"), self.upload(b"two", name="two.jpg")
+        self.tag_request("cloud-tags-apply", [first, second])
+        self.assertEqual(self.tag_request("cloud-tags-remove", [first])["removed"], 1)
+        self.assertFileCount(1)
+        self.assertEqual(self.tag_request("cloud-tags-remove", [first])["removed"], 0)
+        self.assertFileCount(1)
+
+    def test_file_delete(self):
+        first, second = self.upload(b"one", name="one.jpg"), self.upload(b"two", name="two.jpg")
+        self.tag_request("cloud-tags-apply", [first, second])
+        self.delete_file(first)
+        self.assertFileCount(1)
+        # The pair of the deleted file is removed, but it no longer counted
+        self.assertEqual(untag_files([first.id], [self.tag.id]), 1)
+        self.assertFileCount(1)
+
+    def test_directory_delete(self):
+        directory = self.create_directory("Trip")
+        nested = self.create_directory("Day 1", parent=directory)
+        inside = [
+            self.upload(b"one", name="one.jpg", directory=directory),
+            self.upload(b"two", name="two.jpg", directory=nested),
+        ]
+        outside = self.upload(b"three", name="three.jpg")
+        self.tag_request("cloud-tags-apply", [*inside, outside])
+        self.delete_file(inside[0])
+        self.assertFileCount(2)
+
+        self.delete_directory(directory)
+        self.assertFileCount(1)
+
+
+class DirectoryShareAccessTests(CloudAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.grantee = User.objects.create(username="grantee", email="grantee@example.com")
+        self.grantee_client = APIClient()
+        self.grantee_client.force_authenticate(self.grantee)
+        self.shared = self.create_directory("Shared")
+        response = self.client.post(
+            reverse("cloud-directory-share", args=[self.shared.id]), {"email": self.grantee.email}, format="json"
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def assertGranteeAccess(self, cloud_file, allowed):
+        response = self.grantee_client.get(reverse("cloud-download", args=[cloud_file.media_id]))
+        response.close()
+        self.assertEqual(response.status_code, 200 if allowed else 404)
+
+    def move(self, name, item, parent):
+        payload = {"parent": str(parent.id) if parent else None}
+        response = self.client.post(reverse(name, args=[item.id]), payload, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_files_created_later_are_shared(self):
+        nested = self.create_directory("Later", parent=self.create_directory("Inside", parent=self.shared))
+        self.assertGranteeAccess(self.upload(b"direct", directory=self.shared), True)
+        self.assertGranteeAccess(self.upload(b"nested", directory=nested), True)
+        self.assertGranteeAccess(self.upload(b"private"), False)
+
+    def test_files_moved_in_are_shared(self):
+        cloud_file = self.upload(b"moved file")
+        directory = self.create_directory("Moved")
+        in_directory = self.upload(b"moved with its directory", directory=directory)
+        self.assertGranteeAccess(cloud_file, False)
+        self.assertGranteeAccess(in_directory, False)
+
+        self.move("cloud-file-move", cloud_file, self.shared)
+        self.move("cloud-directory-move", directory, self.shared)
+        self.assertGranteeAccess(cloud_file, True)
+        self.assertGranteeAccess(in_directory, True)
+
+    def test_moving_out_revokes(self):
+        directory = self.create_directory("Leaving", parent=self.shared)
+        nested = self.upload(b"nested", directory=self.create_directory("Nested", parent=directory))
+        cloud_file = self.upload(b"file", directory=self.shared)
+        self.assertGranteeAccess(nested, True)
+        self.assertGranteeAccess(cloud_file, True)
+
+        self.move("cloud-directory-move", directory, None)
+        self.move("cloud-file-move", cloud_file, None)
+        self.assertGranteeAccess(nested, False)
+        self.assertGranteeAccess(cloud_file, False)
+
+
+class PublicShareLinkTests(CloudAPITestCase):
+    def test_file_link_stops_resolving_after_delete(self):
+        cloud_file = self.upload(b"shared publicly", name="public.txt")
+        response = self.client.post(reverse("cloud-file-links", args=[cloud_file.id]), format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        token = response.json()["link"]["token"]
+        anonymous = APIClient()
+        listing = anonymous.get(reverse("cloud-public-share", args=[token]))
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual([item["id"] for item in listing.json()["items"]], [str(cloud_file.id)])
+
+        # Publishes the owner's new change cursor, which the listing cache is keyed by
+        with self.captureOnCommitCallbacks(execute=True):
+            self.delete_file(cloud_file)
+        self.assertEqual(anonymous.get(reverse("cloud-public-share", args=[token])).status_code, 404)
+        download = anonymous.get(reverse("cloud-public-share-file", args=[token, cloud_file.id]))
+        self.assertEqual(download.status_code, 404)
+
+
+class DuplicateResolveTests(CloudAPITestCase):
+    def resolve(self, keep):
+        payload = {"keep": [str(cloud_file.id) for cloud_file in keep]}
+        return self.client.post(reverse("cloud-duplicates-resolve"), payload, format="json")
+
+    def test_copies_of_one_media_are_not_duplicates(self):
+        original = self.upload(b"same bytes")
+        copy = self.copy_file(original, parent=self.create_directory("Copies"))
+        self.assertEqual(self.client.get(reverse("cloud-duplicates")).json()["total_groups"], 0)
+
+        self.assertEqual(self.resolve([original]).status_code, 400)
+        copy.refresh_from_db()
+        self.assertFalse(copy.is_deleted)
+
+    def test_resolve_keeps_one_file_per_group(self):
+        kept = self.upload(b"same bytes", name="one.bin")
+        duplicate = self.upload(b"same bytes", name="two.bin")
+        report = self.client.get(reverse("cloud-duplicates")).json()
+        self.assertEqual((report["total_groups"], report["total_reclaimable_bytes"]), (1, len(b"same bytes")))
+
+        response = self.resolve([kept])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual((response.json()["deleted_files"], response.json()["freed_bytes"]), (1, len(b"same bytes")))
+        duplicate.refresh_from_db()
+        self.assertTrue(duplicate.is_deleted)
+        self.assertEqual(self.client.get(reverse("cloud-duplicates")).json()["total_groups"], 0)
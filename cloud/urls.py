@@ -2,18 +2,55 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from cloud.views import (
+    avatar_view,
+    changes_view,
+    copy_directory,
+    copy_file,
     create_directory,
+    delete_directory,
+    delete_file,
+    delete_tag,
+    apply_tags,
+    directory_share_links,
     download_file,
+    duplicates_view,
     explorer_view,
+    file_share_links,
+    file_versions,
+    hot_cache_stats,
+    integrity_report,
+    people_view,
+    person_files,
+    remove_tags,
+    tag_files_view,
+    tags_view,
     finalize_chunked_upload,
+    finalize_delta_upload,
     initiate_chunked_upload,
+    initiate_delta_upload,
     preview_file,
     upload_chunk,
+    upload_delta_chunk,
     upload_file,
+    upload_scheduler_stats,
     rename_directory,
+    resolve_duplicates,
+    restore_file_version,
+    public_share,
+    public_share_file,
+    revoke_share_link,
+    search_files,
+    storage_usage,
+    share_directory,
+    share_file,
+    shared_with_me,
     rename_file,
     move_directory,
     move_file,
+    organize_directory,
+    organize_job_status,
+    timeline_view,
+    tree_view,
 )
 
 router = DefaultRouter()
@@ -22,15 +59,56 @@ router = DefaultRouter()
 urlpatterns = [
     path("", include(router.urls)),
     path("explorer/", explorer_view, name="cloud-explorer"),
+    path("tree/", tree_view, name="cloud-tree"),
     path("directory/create/", create_directory, name="cloud-create-directory"),
     path("upload/", upload_file, name="cloud-upload"),
     path("upload/initiate/", initiate_chunked_upload, name="cloud-upload-initiate"),
     path("upload/<str:upload_id>/chunk/", upload_chunk, name="cloud-upload-chunk"),
     path("upload/<str:upload_id>/finalize/", finalize_chunked_upload, name="cloud-upload-finalize"),
+    path("delta/initiate/", initiate_delta_upload, name="cloud-delta-initiate"),
+    path("delta/<str:upload_id>/chunk/", upload_delta_chunk, name="cloud-delta-chunk"),
+    path("delta/<str:upload_id>/finalize/", finalize_delta_upload, name="cloud-delta-finalize"),
     path("files/<uuid:file_id>/preview/", preview_file, name="cloud-preview"),
     path("files/<uuid:file_id>/download/", download_file, name="cloud-download"),
+    path("avatars/<uuid:media_id>/", avatar_view, name="cloud-avatar"),
     path("directory/<uuid:directory_id>/rename/", rename_directory, name="cloud-directory-rename"),
     path("files/<uuid:file_id>/rename/", rename_file, name="cloud-file-rename"),
     path("directory/<uuid:directory_id>/move/", move_directory, name="cloud-directory-move"),
     path("files/<uuid:file_id>/move/", move_file, name="cloud-file-move"),
+    path("files/<uuid:file_id>/versions/", file_versions, name="cloud-file-versions"),
+    path(
+        "files/<uuid:file_id>/versions/<uuid:version_id>/restore/",
+        restore_file_version,
+        name="cloud-file-version-restore",
+    ),
+    path("files/<uuid:file_id>/share/", share_file, name="cloud-file-share"),
+    path("directory/<uuid:directory_id>/share/", share_directory, name="cloud-directory-share"),
+    path("shared/", shared_with_me, name="cloud-shared-with-me"),
+    path("files/<uuid:file_id>/links/", file_share_links, name="cloud-file-links"),
+    path("directory/<uuid:directory_id>/links/", directory_share_links, name="cloud-directory-links"),
+    path("links/<str:token>/", revoke_share_link, name="cloud-link-revoke"),
+    path("public/<str:token>/", public_share, name="cloud-public-share"),
+    path("public/<str:token>/files/<uuid:file_id>/", public_share_file, name="cloud-public-share-file"),
+    path("files/<uuid:file_id>/copy/", copy_file, name="cloud-file-copy"),
+    path("directory/<uuid:directory_id>/copy/", copy_directory, name="cloud-directory-copy"),
+    path("files/<uuid:file_id>/delete/", delete_file, name="cloud-file-delete"),
+    path("directory/<uuid:directory_id>/delete/", delete_directory, name="cloud-directory-delete"),
+    path("organize/", organize_directory, name="cloud-organize"),
+    path("organize/<uuid:job_id>/", organize_job_status, name="cloud-organize-status"),
+    path("search/", search_files, name="cloud-search"),
+    path("storage/", storage_usage, name="cloud-storage-usage"),
+    path("tags/", tags_view, name="cloud-tags"),
+    path("tags/apply/", apply_tags, name="cloud-tags-apply"),
+    path("tags/remove/", remove_tags, name="cloud-tags-remove"),
+    path("tags/<uuid:tag_id>/", delete_tag, name="cloud-tag-delete"),
+    path("tags/<uuid:tag_id>/files/", tag_files_view, name="cloud-tag-files"),
+    path("people/", people_view, name="cloud-people"),
+    path("people/<int:user_id>/", person_files, name="cloud-person-files"),
+    path("timeline/", timeline_view, name="cloud-timeline"),
+    path("duplicates/", duplicates_view, name="cloud-duplicates"),
+    path("duplicates/resolve/", resolve_duplicates, name="cloud-duplicates-resolve"),
+    path("changes/", changes_view, name="cloud-changes"),
+    path("cache/stats/", hot_cache_stats, name="cloud-cache-stats"),
+    path("uploads/scheduler/", upload_scheduler_stats, name="cloud-upload-scheduler"),
+    path("integrity/report/", integrity_report, name="cloud-integrity-report"),
 ]
@@ -0,0 +1,207 @@
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User
+from cloud.models import AccessEntry, CloudFile, Directory, SharedItem
+
+PERMISSION_RANK = {"view": 1, "edit": 2}
+ACCESS_BATCH_SIZE = 1000
+
+
+def compute_access(parents, shares):
+    """
+    Effective permissions granted by one owner's shares.
+
+    A directory share covers the directory and everything below it; where several shares
+    cover an item for the same user, the strongest permission wins.
+
+    Args:
+        parents: {directory_id: parent_id} for every directory of the owner
+        shares: Iterable of (user_id, file_id, directory_id, permission) SharedItem rows
+
+    Returns:
+        dict: {(user_id, "file" | "directory", item_id): permission}
+    """
+    children = {}
+    for directory_id, parent_id in parents.items():
+        children.setdefault(parent_id, []).append(directory_id)
+
+    access = {}
+
+    def grant(key, permission):
+        if PERMISSION_RANK[permission] > PERMISSION_RANK.get(access.get(key), 0):
+            access[key] = permission
+
+    for user_id, file_id, directory_id, permission in shares:
+        if file_id:
+            grant((user_id, "file", file_id), permission)
+        elif directory_id in parents:
+            pending = [directory_id]
+            while pending:
+                current = pending.pop()
+                grant((user_id, "directory", current), permission)
+                pending.extend(children.get(current, ()))
+    return access
+
+
+def _lock_owner(owner_id):
+    # One index update per owner at a time, concurrent updates would race on the unique constraints
+    list(User.objects.select_for_update().filter(id=owner_id).values_list("id", flat=True))
+
+
+def _existing_entries(entries):
+    """{(user_id, "file" | "directory", item_id): (entry_id, permission)} of an AccessEntry queryset."""
+    existing = {}
+    for entry_id, user_id, file_id, directory_id, permission in entries.values_list(
+        "id", "user_id", "file_id", "directory_id", "permission"
+    ):
+        key = (user_id, "file", file_id) if file_id else (user_id, "directory", directory_id)
+        existing[key] = (entry_id, permission)
+    return existing
+
+
+def _write_difference(owner_id, existing, wanted):
+    """Delete and create AccessEntries so that `existing` (see _existing_entries) becomes `wanted`."""
+    stale = [entry_id for key, (entry_id, permission) in existing.items() if wanted.get(key) != permission]
+    new_entries = [
+        AccessEntry(
+            user_id=user_id,
+            owner_id=owner_id,
+            permission=permission,
+            **({"file_id": item_id} if item_type == "file" else {"directory_id": item_id}),
+        )
+        for (user_id, item_type, item_id), permission in wanted.items()
+        if existing.get((user_id, item_type, item_id), (None, None))[1] != permission
+    ]
+    for start in range(0, len(stale), ACCESS_BATCH_SIZE):
+        AccessEntry.objects.filter(id__in=stale[start : start + ACCESS_BATCH_SIZE]).delete()
+    AccessEntry.objects.bulk_create(new_entries, batch_size=ACCESS_BATCH_SIZE)
+
+
+def sync_access(owner_id):
+    """
+    Recompute the whole AccessEntry index of one owner from their SharedItems and directory tree.
+
+    Call after shares are granted or revoked, or to repair the index. Directory creates and
+    moves update it incrementally with inherit_access() and move_access(); deletions need
+    nothing, entries cascade with their file or directory. Only the difference to the current
+    index is written.
+    """
+    with transaction.atomic():
+        _lock_owner(owner_id)
+
+        shares = list(
+            SharedItem.objects.filter(Q(content__owner_id=owner_id) | Q(directory__owner_id=owner_id)).values_list(
+                "user_id", "content_id", "directory_id", "permission"
+            )
+        )
+        existing = _existing_entries(AccessEntry.objects.filter(owner_id=owner_id))
+        if not shares and not existing:
+            return
+
+        parents = {}
+        if any(directory_id for _, _, directory_id, _ in shares):
+            parents = dict(Directory.objects.filter(owner_id=owner_id).values_list("id", "parent_id"))
+        _write_difference(owner_id, existing, compute_access(parents, shares))
+
+
+def inherit_access(owner_id, directories):
+    """
+    Give new directories the access entries of their parent directory.
+
+    A new directory cannot be shared yet, so it is covered by exactly the shares covering its
+    parent. Touches only the entries of the parents, not the owner's whole tree.
+
+    Args:
+        directories: The new Directory objects of one owner; parents may be among them if they
+            come first, e.g. a copied subtree
+    """
+    parent_ids = {directory.parent_id for directory in directories if directory.parent_id}
+    if not parent_ids:
+        return
+    with transaction.atomic():
+        _lock_owner(owner_id)
+        inherited = {}
+        for user_id, directory_id, permission in AccessEntry.objects.filter(directory_id__in=parent_ids).values_list(
+            "user_id", "directory_id", "permission"
+        ):
+            inherited.setdefault(directory_id, []).append((user_id, permission))
+        if not inherited:
+            return
+
+        new_entries = []
+        for directory in directories:
+            entries = inherited.get(directory.parent_id, ())
+            if entries:
+                inherited[directory.id] = entries
+            new_entries.extend(
+                AccessEntry(user_id=user_id, owner_id=owner_id, directory_id=directory.id, permission=permission)
+                for user_id, permission in entries
+            )
+        AccessEntry.objects.bulk_create(new_entries, batch_size=ACCESS_BATCH_SIZE)
+
+
+def move_access(directory):
+    """
+    Update the access entries of a directory subtree after the directory was moved.
+
+    The subtree now inherits the shares covering its new parent instead of the old one; shares
+    of directories inside the subtree still apply. Loads and rewrites the subtree only.
+    """
+    owner_id = directory.owner_id
+    with transaction.atomic():
+        _lock_owner(owner_id)
+        if not AccessEntry.objects.filter(owner_id=owner_id, directory__isnull=False).exists():
+            return  # No directory shares, nothing to inherit
+
+        parents = {directory.id: directory.parent_id}
+        level = [directory.id]
+        while level:
+            children = list(Directory.objects.filter(parent_id__in=level).values_list("id", "parent_id"))
+            parents.update(children)
+            level = [child_id for child_id, _ in children]
+
+        # Shares covering the new parent act as shares of the moved directory itself
+        shares = []
+        if directory.parent_id:
+            shares = [
+                (user_id, None, directory.id, permission)
+                for user_id, permission in AccessEntry.objects.filter(directory_id=directory.parent_id).values_list(
+                    "user_id", "permission"
+                )
+            ]
+        existing = {}
+        subtree_ids = list(parents)
+        for start in range(0, len(subtree_ids), ACCESS_BATCH_SIZE):
+            batch = subtree_ids[start : start + ACCESS_BATCH_SIZE]
+            existing.update(_existing_entries(AccessEntry.objects.filter(directory_id__in=batch)))
+            shares.extend(
+                SharedItem.objects.filter(directory_id__in=batch).values_list(
+                    "user_id", "content_id", "directory_id", "permission"
+                )
+            )
+        if not shares and not existing:
+            return
+        _write_difference(owner_id, existing, compute_access(parents, shares))
+
+
+def get_directory_permission(user, directory_id):
+    """Permission of a user on someone else's directory, None without access."""
+    return (
+        AccessEntry.objects.filter(user=user, directory_id=directory_id).values_list("permission", flat=True).first()
+    )
+
+
+def can_access_media(user, media):
+    """
+    Whether a user may read a MediaFile: their own, public, or the content of a file shared
+    with them directly or through one of its directories. One query for shared media.
+    """
+    if media.owner_id == user.id or media.privacy == "public":
+        return True
+    files = CloudFile.objects.filter(media_id=media.id, is_deleted=False)
+    return (
+        AccessEntry.objects.filter(user=user)
+        .filter(Q(file_id__in=files.values("id")) | Q(directory_id__in=files.values("directory_id")))
+        .exists()
+    )
@@ -0,0 +1,211 @@
+import functools
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+THROUGHPUT_WINDOW = 60  # Seconds of history behind the throughput figures
+IDLE_USER_TIMEOUT = 10 * 60  # Per-user state is dropped after this long without uploads
+
+
+class TokenBucket:
+    """
+    Bandwidth budget refilled at `rate` bytes per second, holding at most `capacity` bytes.
+
+    A request is admitted while the bucket is not empty and may overdraw it, so a chunk
+    larger than the burst still passes; the debt delays the next request instead.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a request may be admitted, 0 if it may be now."""
+        if not self.rate:
+            return 0
+        self._refill(now)
+        return 0 if self.tokens > 0 else max(-self.tokens, 1) / self.rate
+
+    def consume(self, size):
+        if self.rate:
+            self.tokens -= size
+
+
+class _UserState:
+    def __init__(self, rate, capacity):
+        self.bucket = TokenBucket(rate, capacity)
+        self.active = 0
+        self.deferred_until = 0  # Monotonic time a deferred request is expected back
+        self.admitted = 0
+        self.rejected = 0
+        self.transfers = deque()  # (finished_at, bytes) within THROUGHPUT_WINDOW
+        self.durations = 0.0  # Moving average of request duration, for Retry-After
+        self.last_seen = time.monotonic()
+
+
+class UploadScheduler:
+    """
+    Process-local admission control for upload work (chunks, direct uploads, finalization).
+
+    Limits concurrent requests per user and in total, and upload bandwidth per user and in
+    total with token buckets. Scheduling is fair between users: once several users upload at
+    the same time, each may hold at most an equal share of the global slots, and users whose
+    requests were just deferred keep their share reserved until they retry.
+
+    Requests over a limit are not queued in the server, sync views share worker threads, so
+    a waiting request would hold up unrelated ones. They are answered with 429 and a
+    Retry-After telling the client when its turn comes.
+    """
+
+    def __init__(self, user_concurrency, global_concurrency, user_rate, global_rate, burst_seconds):
+        self.user_concurrency = user_concurrency
+        self.global_concurrency = global_concurrency
+        self.user_rate = user_rate
+        self.user_capacity = user_rate * burst_seconds
+        self.global_bucket = TokenBucket(global_rate, global_rate * burst_seconds)
+        self._users = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _user(self, user_id, now):
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState(self.user_rate, self.user_capacity)
+        state.last_seen = now
+        return state
+
+    def _fair_share(self, user_id, now):
+        contenders = sum(
+            1
+            for other_id, state in self._users.items()
+            if other_id != user_id and (state.active or state.deferred_until > now)
+        )
+        return max(1, self.global_concurrency // (contenders + 1))
+
+    def _retry_after(self, state):
+        return max(1, math.ceil(state.durations or 1))
+
+    def admit(self, user_id, size):
+        """
+        Admit a request of `size` bytes or tell how long to wait.
+
+        Returns:
+            int: 0 if admitted (release() must follow), otherwise seconds for Retry-After
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._user(user_id, now)
+            limit = min(self.user_concurrency, self._fair_share(user_id, now))
+            if state.active >= limit or self._active >= self.global_concurrency:
+                retry_after = self._retry_after(state)
+            else:
+                retry_after = math.ceil(max(state.bucket.wait_time(now), self.global_bucket.wait_time(now)))
+
+            if retry_after:
+                state.rejected += 1
+                state.deferred_until = now + retry_after + 1
+                return retry_after
+
+            state.bucket.consume(size)
+            self.global_bucket.consume(size)
+            state.active += 1
+            state.admitted += 1
+            state.deferred_until = 0
+            self._active += 1
+            return 0
+
+    def release(self, user_id, size, started):
+        now = time.monotonic()
+        with self._lock:
+            state = self._user(user_id, now)
+            state.active = max(0, state.active - 1)
+            self._active = max(0, self._active - 1)
+            state.transfers.append((now, size))
+            duration = now - started
+            state.durations = duration if not state.durations else 0.8 * state.durations + 0.2 * duration
+            self._prune(now)
+
+    def _prune(self, now):
+        for user_id, state in list(self._users.items()):
+            while state.transfers and state.transfers[0][0] < now - THROUGHPUT_WINDOW:
+                state.transfers.popleft()
+            if not state.active and now - state.last_seen > IDLE_USER_TIMEOUT:
+                del self._users[user_id]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            users = []
+            for user_id, state in self._users.items():
+                window_bytes = sum(size for _, size in state.transfers)
+                users.append(
+                    {
+                        "user_id": user_id,
+                        "active": state.active,
+                        "queued": int(state.deferred_until > now),
+                        "admitted": state.admitted,
+                        "rejected": state.rejected,
+                        "bytes_per_second": round(window_bytes / THROUGHPUT_WINDOW),
+                    }
+                )
+            users.sort(key=lambda user: (-user["active"], -user["bytes_per_second"]))
+            return {
+                "active": self._active,
+                "queued": sum(user["queued"] for user in users),
+                "bytes_per_second": sum(user["bytes_per_second"] for user in users),
+                "user_concurrency": self.user_concurrency,
+                "global_concurrency": self.global_concurrency,
+                "user_bytes_per_second": self.user_rate,
+                "global_bytes_per_second": self.global_bucket.rate,
+                "users": users,
+            }
+
+
+upload_scheduler = UploadScheduler(
+    settings.CLOUD_UPLOAD_USER_CONCURRENCY,
+    settings.CLOUD_UPLOAD_GLOBAL_CONCURRENCY,
+    settings.CLOUD_UPLOAD_USER_BYTES_PER_SECOND,
+    settings.CLOUD_UPLOAD_GLOBAL_BYTES_PER_SECOND,
+    settings.CLOUD_UPLOAD_BURST_SECONDS,
+)
+
+
+def upload_admission(view):
+    """
+    Run an upload view under the upload scheduler, answering 429 with Retry-After when the
+    user or the server is over its limits. The request body size counts against bandwidth.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user_id = request.user.id
+        try:
+            size = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            size = 0
+        retry_after = upload_scheduler.admit(user_id, size)
+        if retry_after:
+            return Response(
+                {"error": "Too many uploads in progress, retry later", "retry_after": retry_after},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(retry_after)},
+            )
+        started = time.monotonic()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            upload_scheduler.release(user_id, size, started)
+
+    return wrapper
@@ -0,0 +1,78 @@
+import io
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from cloud.utils.media import iter_media_content
+
+AVATAR_SIZES = (64, 128, 256)  # Square renditions, in pixels
+DEFAULT_AVATAR_SIZE = 128
+AVATAR_FORMAT = "WEBP"
+AVATAR_CONTENT_TYPE = "image/webp"
+# Renditions belong to one immutable MediaFile, a new avatar gets a new URL
+AVATAR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def avatar_path(media_id, size):
+    """Rendition next to the avatar's blob: media/avatars/{uuid}/{size}.webp"""
+    return Path(settings.MEDIA_ROOT) / "avatars" / str(media_id) / f"{size}.webp"
+
+
+def avatar_url(media):
+    """
+    Absolute URL of a MediaFile's avatar renditions on the server holding it; clients add ?size=.
+    Stored on User.avatar_url so user lists need no lookups.
+    """
+    if media is None or media.residing_server is None:
+        return ""
+    return f"{media.residing_server.base_url}/api/cloud/avatars/{media.id}/"
+
+
+def rendition_size(requested):
+    """The smallest rendition at least `requested` pixels wide, the largest one for bigger requests."""
+    return next((size for size in AVATAR_SIZES if size >= requested), AVATAR_SIZES[-1])
+
+
+def create_avatar_renditions(media):
+    """
+    Write the square renditions of an avatar image, cropped to the centre and downscaled once.
+
+    Returns:
+        bool: False if the media is not an image Pillow can read
+    """
+    try:
+        with Image.open(io.BytesIO(b"".join(iter_media_content(media)))) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            # Downscale the largest rendition from the original, the smaller ones from it
+            rendition = ImageOps.fit(image, (AVATAR_SIZES[-1],) * 2, Image.Resampling.LANCZOS)
+            for size in reversed(AVATAR_SIZES):
+                if rendition.width != size:
+                    rendition = rendition.resize((size, size), Image.Resampling.LANCZOS)
+                path = avatar_path(media.id, size)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Written aside and renamed, concurrent requests never see half a file
+                fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+                try:
+                    with os.fdopen(fd, "wb") as rendition_file:
+                        rendition.save(rendition_file, AVATAR_FORMAT, quality=85, method=4)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    Path(temp_path).unlink(missing_ok=True)
+                    raise
+    except (OSError, Image.DecompressionBombError) as e:
+        print(f"Could not create avatar renditions for {media.id}: {e}")
+        return False
+    return True
+
+
+def set_user_avatar(user, media):
+    """Make a MediaFile the user's avatar: renditions are created and avatar_url updated."""
+    if media is not None:
+        create_avatar_renditions(media)
+    user.avatar = media
+    user.avatar_url = avatar_url(media)
+    user.save(update_fields=["avatar", "avatar_url"])
@@ -0,0 +1,290 @@
+import asyncio
+import gc
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from cloud.models import CloudFile
+from cloud.utils.admission import upload_scheduler
+from cloud.utils.hot_cache import hot_file_cache
+
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+SYNTHETIC_BLOCK_SIZE = 1024 * 1024
+DEFAULT_SIZES = "1KB,1MB,16MB,128MB"
+
+
+def parse_size(value):
+    """Parse "512", "64KB", "1.5GB" (binary units) into bytes."""
+    value = value.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * SIZE_UNITS[unit])
+    return int(value)
+
+
+def format_size(size):
+    for unit in ("GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def write_synthetic_file(path, size, seed):
+    """Incompressible pseudo-random content, identical for the same size and seed."""
+    generator = random.Random(f"{seed}-{size}")
+    with open(path, "wb") as synthetic_file:
+        remaining = size
+        while remaining:
+            block = min(remaining, SYNTHETIC_BLOCK_SIZE)
+            synthetic_file.write(generator.randbytes(block))
+            remaining -= block
+
+
+def _make_unique(path):
+    """Give every run its own content, so versioning or dedup never short-circuit an upload."""
+    with open(path, "r+b") as synthetic_file:
+        synthetic_file.write(uuid.uuid4().bytes[: os.path.getsize(path)])
+
+
+def _max_rss():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Measurement:
+    """Wall time, time to first byte, peak traced Python allocations and peak RSS of one run."""
+
+    def __enter__(self):
+        gc.collect()
+        tracemalloc.reset_peak()
+        self.first_byte = None
+        self.started = time.perf_counter()
+        return self
+
+    def mark_first_byte(self):
+        if self.first_byte is None:
+            self.first_byte = time.perf_counter() - self.started
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.started
+        self.peak_traced_bytes = tracemalloc.get_traced_memory()[1]
+        self.max_rss_bytes = _max_rss()
+        return False
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def _check(response, expected=(200, 201)):
+    if response.status_code not in expected:
+        raise BenchmarkError(f"{response.status_code}: {getattr(response, 'content', b'')[:200]!r}")
+    return response
+
+
+def _summary(operation, size, encrypted, runs):
+    seconds = [run.seconds for run in runs]
+    median = statistics.median(seconds)
+    first_bytes = [run.first_byte for run in runs if run.first_byte is not None]
+    return {
+        "operation": operation,
+        "size": size,
+        "size_label": format_size(size),
+        "encrypted": encrypted,
+        "runs": len(runs),
+        "seconds_median": round(median, 6),
+        "seconds_min": round(min(seconds), 6),
+        "mb_per_second": round(size / SIZE_UNITS["MB"] / median, 2) if median else None,
+        "ttfb_seconds_median": round(statistics.median(first_bytes), 6) if first_bytes else None,
+        "peak_traced_bytes": max(run.peak_traced_bytes for run in runs),
+        "max_rss_bytes": max(run.max_rss_bytes for run in runs),
+    }
+
+
+class _Runner:
+    def __init__(self, user, chunk_size):
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.token = str(AccessToken.for_user(user))
+        self.chunk_size = chunk_size
+
+    def upload_file(self, path, encrypted):
+        with open(path, "rb") as synthetic_file:
+            response = self.client.post(
+                "/api/cloud/upload/",
+                {"file": synthetic_file, "encrypt": "true" if encrypted else "false", "versioning": "false"},
+                format="multipart",
+            )
+        return _check(response).json()["file"]["id"]
+
+    def upload_chunked(self, path, encrypted):
+        size = os.path.getsize(path)
+        total_chunks = max(1, -(-size // self.chunk_size))
+        response = self.client.post(
+            "/api/cloud/upload/initiate/",
+            {
+                "filename": path.name,
+                "file_size": size,
+                "total_chunks": total_chunks,
+                "encrypt": encrypted,
+                "versioning": "false",
+            },
+            format="json",
+        )
+        upload_id = _check(response).json()["upload_id"]
+        with open(path, "rb") as synthetic_file:
+            for chunk_number in range(total_chunks):
+                chunk = SimpleUploadedFile(path.name, synthetic_file.read(self.chunk_size))
+                _check(
+                    self.client.post(
+                        f"/api/cloud/upload/{upload_id}/chunk/",
+                        {"chunk": chunk, "chunk_number": chunk_number},
+                        format="multipart",
+                    )
+                )
+        response = self.client.post(f"/api/cloud/upload/{upload_id}/finalize/")
+        return _check(response).json()["file"]["id"]
+
+    async def _read(self, url, measurement):
+        response = await AsyncClient().get(url, headers={"Authorization": f"Bearer {self.token}"})
+        _check(response)
+        received = 0
+        if response.streaming:
+            if response.is_async:
+                async for chunk in response.streaming_content:
+                    measurement.mark_first_byte()
+                    received += len(chunk)
+            else:
+                for chunk in response.streaming_content:
+                    measurement.mark_first_byte()
+                    received += len(chunk)
+        else:
+            measurement.mark_first_byte()
+            received = len(response.content)
+        return received
+
+    def read(self, kind, media_id, measurement):
+        return asyncio.run(self._read(f"/api/cloud/files/{media_id}/{kind}/", measurement))
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": connection.vendor,
+        "compression_codec": settings.CLOUD_COMPRESSION_CODEC,
+        "stream_block_size": settings.CLOUD_STREAM_BLOCK_SIZE,
+    }
+
+
+def run_benchmark(
+    sizes,
+    work_dir,
+    repeat=3,
+    encryption=(False, True),
+    operations=("upload_file", "upload_chunked", "preview", "download"),
+    max_direct_size=64 * SIZE_UNITS["MB"],
+    chunk_size=8 * SIZE_UNITS["MB"],
+    seed=0,
+    on_result=None,
+):
+    """
+    Measure the storage hot paths in-process, through the real views and middleware.
+
+    Runs as a throwaway user with MEDIA_ROOT pointed into work_dir and upload admission
+    control lifted; both are removed again afterwards. Direct uploads are skipped above
+    max_direct_size, the test client builds multipart bodies in memory.
+
+    Returns:
+        list: One summary dict per (operation, size, encrypted)
+    """
+    work_dir = Path(work_dir)
+    media_root = work_dir / "media"
+    media_root.mkdir(parents=True, exist_ok=True)
+    user = User.objects.create(username=f"cloud-benchmark-{uuid.uuid4().hex[:12]}", email=f"{uuid.uuid4().hex}@benchmark.invalid")
+    scheduler_limits = dict(vars(upload_scheduler))
+    upload_scheduler.__init__(10**9, 10**9, 0, 0, 0)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+
+    results = []
+    try:
+        with override_settings(MEDIA_ROOT=str(media_root), ALLOWED_HOSTS=["*"]):
+            runner = _Runner(user, chunk_size)
+            for size in sizes:
+                source = work_dir / f"synthetic-{format_size(size)}.bin"
+                write_synthetic_file(source, size, seed)
+                for encrypted in encryption:
+                    media_id = None
+                    for operation in ("upload_file", "upload_chunked"):
+                        if operation not in operations or (operation == "upload_file" and size > max_direct_size):
+                            continue
+                        runs = []
+                        for _ in range(repeat):
+                            _make_unique(source)
+                            with Measurement() as measurement:
+                                file_id = getattr(runner, operation)(source, encrypted)
+                            runs.append(measurement)
+                        media_id = CloudFile.objects.values_list("media_id", flat=True).get(id=file_id)
+                        results.append(_summary(operation, size, encrypted, runs))
+                        if on_result:
+                            on_result(results[-1])
+
+                    if not {"preview", "download"} & set(operations):
+                        continue
+                    if media_id is None:
+                        # Reads only: upload something to read, untimed
+                        _make_unique(source)
+                        file_id = runner.upload_chunked(source, encrypted)
+                        media_id = CloudFile.objects.values_list("media_id", flat=True).get(id=file_id)
+                    for operation in ("preview", "download"):
+                        if operation not in operations:
+                            continue
+                        runs = []
+                        for _ in range(repeat):
+                            # Cold reads every time, the decrypted payload cache would hide the storage path
+                            hot_file_cache.clear()
+                            with Measurement() as measurement:
+                                received = runner.read(operation, media_id, measurement)
+                            if received != size:
+                                raise BenchmarkError(f"{operation} returned {received} bytes, expected {size}")
+                            runs.append(measurement)
+                        results.append(_summary(operation, size, encrypted, runs))
+                        if on_result:
+                            on_result(results[-1])
+                source.unlink()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+        upload_scheduler.__dict__.update(scheduler_limits)
+        user.delete()
+    return results
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from django.utils import timezone
+from PIL import Image
+
+from cloud.utils.organizer import classify
+
+EXIF_IFD = 0x8769  # Pointer to the Exif sub-IFD
+EXIF_DATETIME_ORIGINAL = 0x9003  # When the shutter fired
+EXIF_DATETIME = 0x0132  # Last modification, written by most cameras when DateTimeOriginal is missing
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# Files that show up in the photo timeline
+TIMELINE_MIME_PREFIXES = ("image/", "video/")
+
+
+def read_exif_datetime(fileobj):
+    """
+    Read the capture time stored in an image's EXIF block.
+
+    Only the image headers are parsed, pixel data is never decoded.
+
+    Returns:
+        datetime: Naive local capture time, or None if the file has no usable EXIF date
+    """
+    try:
+        with Image.open(fileobj) as image:
+            exif = image.getexif()
+            value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except Exception:
+        # Not an image Pillow understands (e.g. HEIC without a plugin) or a corrupt header
+        return None
+
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value.strip("\x00 ")[:19], EXIF_DATETIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def get_capture_date(fileobj, filename, mime_type):
+    """
+    Work out when a photo or video was taken.
+
+    Args:
+        fileobj: Readable, seekable plaintext of the file, or None when it is not available
+            (e.g. client-encrypted uploads); it is rewound before returning
+        filename: Original filename, used for the IMG_20240101_... style fallback
+        mime_type: MIME type of the file
+
+    Returns:
+        datetime: Aware capture time (EXIF, then filename date, then now) for images and
+        videos, or None for other files
+    """
+    if not mime_type or not mime_type.startswith(TIMELINE_MIME_PREFIXES):
+        return None
+
+    captured_at = None
+    if fileobj is not None and mime_type.startswith("image/"):
+        captured_at = read_exif_datetime(fileobj)
+        fileobj.seek(0)
+
+    if captured_at is None:
+        captured_at = classify(filename).date
+    if captured_at is None:
+        return timezone.now()
+    return timezone.make_aware(captured_at)
@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+from accounts.models import User
+from cloud.models import ChangeEvent
+
+JOURNAL_BATCH_SIZE = 1000
+# The cached cursor is refreshed from the journal at least this often (seconds), which bounds how stale a
+# process-local cache can get when the change was committed by another worker process
+CURSOR_CACHE_TIMEOUT = 5
+
+
+def _cursor_key(owner_id):
+    return f"cloud_changes_cursor_{owner_id}"
+
+
+def _tree_version_key(owner_id):
+    return f"cloud_tree_version_{owner_id}"
+
+
+def file_change(action, cloud_file):
+    """Build an unsaved ChangeEvent for a CloudFile."""
+    return ChangeEvent(
+        owner_id=cloud_file.owner_id,
+        action=action,
+        item_type="file",
+        item_id=cloud_file.id,
+        parent_id=cloud_file.directory_id,
+        name=cloud_file.name,
+    )
+
+
+def directory_change(action, directory):
+    """Build an unsaved ChangeEvent for a Directory."""
+    return ChangeEvent(
+        owner_id=directory.owner_id,
+        action=action,
+        item_type="directory",
+        item_id=directory.id,
+        parent_id=directory.parent_id,
+        name=directory.name,
+    )
+
+
+def record_changes(events):
+    """
+    Append events to their owners' change journals.
+
+    Subscribers (long-polls and websockets) are notified once the surrounding transaction
+    commits, so they never see a cursor whose events are not visible yet.
+
+    Args:
+        events: Iterable of unsaved ChangeEvents, e.g. from file_change()/directory_change()
+    """
+    events = list(events)
+    if not events:
+        return
+    owners = sorted({event.owner_id for event in events})
+    with transaction.atomic():
+        # Serialise journal writes per user: ids are handed out and committed in the same order,
+        # so a reader can never see event N+1 before event N and skip N
+        list(User.objects.select_for_update().filter(id__in=owners).values_list("id", flat=True))
+        for start in range(0, len(events), JOURNAL_BATCH_SIZE):
+            ChangeEvent.objects.bulk_create(events[start : start + JOURNAL_BATCH_SIZE])
+
+    for owner_id in sorted({event.owner_id for event in events if event.item_type == "directory"}):
+        transaction.on_commit(lambda owner_id=owner_id: _load_tree_version(owner_id))
+    for owner_id in owners:
+        transaction.on_commit(lambda owner_id=owner_id: notify_changes(owner_id))
+
+
+def _load_latest_cursor(owner_id):
+    cursor = ChangeEvent.objects.filter(owner_id=owner_id).order_by("-id").values_list("id", flat=True).first() or 0
+    cache.set(_cursor_key(owner_id), cursor, timeout=CURSOR_CACHE_TIMEOUT)
+    return cursor
+
+
+def get_latest_cursor(owner_id):
+    """Id of the newest journal entry of a user, 0 when there is none."""
+    cursor = cache.get(_cursor_key(owner_id))
+    if cursor is None:
+        cursor = _load_latest_cursor(owner_id)
+    return cursor
+
+
+def _load_tree_version(owner_id):
+    version = (
+        ChangeEvent.objects.filter(owner_id=owner_id, item_type="directory")
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+        or 0
+    )
+    cache.set(_tree_version_key(owner_id), version, timeout=CURSOR_CACHE_TIMEOUT)
+    return version
+
+
+def get_tree_version(owner_id):
+    """
+    Id of the newest directory event of a user, 0 when there is none.
+    Moves on every directory create, rename, move and delete, so it versions the directory tree.
+    """
+    version = cache.get(_tree_version_key(owner_id))
+    if version is None:
+        version = _load_tree_version(owner_id)
+    return version
+
+
+def notify_changes(owner_id):
+    """Publish a user's new cursor to the cache (for long-polls) and the user's websocket group."""
+    cursor = _load_latest_cursor(owner_id)
+    try:
+        async_to_sync(get_channel_layer().group_send)(f"user_{owner_id}", {"type": "cloud_changes", "cursor": cursor})
+    except Exception as e:
+        print(f"Failed to notify cloud changes for user {owner_id}: {e}")
+
+
+async def wait_for_changes(owner_id, cursor, timeout, interval=1.0):
+    """
+    Wait until the user's journal moves past cursor or timeout seconds pass, without holding
+    a thread: the user's channel layer group is awaited, which notify_changes() publishes to.
+    The cached cursor is checked every interval as well, for changes committed by another
+    process when the channel layer is process-local.
+
+    Returns:
+        bool: True if there are changes after cursor
+    """
+    channel_layer = get_channel_layer()
+    group = f"user_{owner_id}"
+    channel = await channel_layer.new_channel()
+    await channel_layer.group_add(group, channel)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            if await sync_to_async(get_latest_cursor)(owner_id) > cursor:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                message = await asyncio.wait_for(channel_layer.receive(channel), min(interval, remaining))
+            except asyncio.TimeoutError:
+                continue
+            if message.get("type") == "cloud_changes" and message.get("cursor", 0) > cursor:
+                return True
+    finally:
+        await channel_layer.group_discard(group, channel)
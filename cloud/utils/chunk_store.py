@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+import tempfile
+from bisect import bisect_right
+from pathlib import Path
+
+from django.conf import settings
+
+CHUNK_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ChunkHashMismatch(Exception):
+    pass
+
+
+def chunk_store_root(user_id):
+    """Per-user store, so one user can never learn which chunks another user holds."""
+    return Path(settings.MEDIA_ROOT) / "chunk_store" / str(user_id)
+
+
+def chunk_path(user_id, chunk_hash):
+    """Path of a stored chunk: media/chunk_store/{user}/{first two hex chars}/{sha256}"""
+    return chunk_store_root(user_id) / chunk_hash[:2] / chunk_hash
+
+
+def find_missing_chunks(user_id, chunk_hashes):
+    """
+    Split a manifest's hashes into the ones the store lacks.
+
+    Chunks that are present get their mtime refreshed, so cleanup can expire chunks by
+    last use instead of by first upload.
+
+    Returns:
+        list: Missing hashes, each listed once, in manifest order
+    """
+    missing = []
+    seen = set()
+    for chunk_hash in chunk_hashes:
+        if chunk_hash in seen:
+            continue
+        seen.add(chunk_hash)
+        try:
+            os.utime(chunk_path(user_id, chunk_hash))
+        except FileNotFoundError:
+            missing.append(chunk_hash)
+    return missing
+
+
+def write_chunk(user_id, chunk_hash, chunks):
+    """
+    Store one chunk after checking it really hashes to chunk_hash.
+
+    The data is written to a temporary file first and renamed into place, so a chunk
+    path only ever holds complete, verified bytes.
+
+    Args:
+        chunks: Iterable of bytes making up the chunk
+
+    Returns:
+        int: Size of the chunk in bytes
+
+    Raises:
+        ChunkHashMismatch: If the data does not match chunk_hash
+    """
+    destination = chunk_path(user_id, chunk_hash)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=destination.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            for data in chunks:
+                sha256.update(data)
+                size += len(data)
+                temp_file.write(data)
+        if sha256.hexdigest() != chunk_hash:
+            raise ChunkHashMismatch(f"Chunk data hashes to {sha256.hexdigest()}, expected {chunk_hash}")
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return size
+
+
+class ChunkManifestFile:
+    """
+    Read-only file object over a sequence of stored chunks, in the shape create_media_file()
+    expects from an upload (name, size, content_type, read, seek, chunks).
+
+    The file is never materialised: reads go straight to the chunk files.
+    """
+
+    def __init__(self, paths, sizes, name, content_type):
+        self.name = name
+        self.content_type = content_type
+        self._paths = list(paths)
+        self._offsets = []
+        offset = 0
+        for size in sizes:
+            self._offsets.append(offset)
+            offset += size
+        self._size = offset
+        self._position = 0
+        self._open_index = None
+        self._file = None
+
+    @property
+    def size(self):
+        return self._size
+
+    def _open(self, index):
+        if self._open_index != index:
+            self.close()
+            self._file = open(self._paths[index], "rb")
+            self._open_index = index
+        return self._file
+
+    def seek(self, position, whence=0):
+        if whence == 1:
+            position += self._position
+        elif whence == 2:
+            position += self._size
+        self._position = max(0, position)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._size - self._position
+        parts = []
+        while size > 0 and self._position < self._size:
+            index = bisect_right(self._offsets, self._position) - 1
+            chunk_file = self._open(index)
+            chunk_end = self._offsets[index + 1] if index + 1 < len(self._offsets) else self._size
+            chunk_file.seek(self._position - self._offsets[index])
+            data = chunk_file.read(min(size, chunk_end - self._position))
+            if not data:
+                raise OSError(f"Stored chunk {self._paths[index]} is shorter than its manifest entry")
+            parts.append(data)
+            self._position += len(data)
+            size -= len(data)
+        return b"".join(parts)
+
+    def chunks(self, chunk_size=1024 * 1024):
+        self.seek(0)
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            self._open_index = None
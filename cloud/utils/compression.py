@@ -0,0 +1,106 @@
+import zlib
+from typing import Iterable, Iterator
+
+DECOMPRESS_BLOCK_SIZE = 1024 * 1024  # Cap on plaintext produced per decompress call
+
+# MIME types that are stored as plain text or markup and usually shrink well.
+# Media, archives and OOXML documents (docx/xlsx/pptx are zip files) are already compressed.
+COMPRESSIBLE_MIME_PREFIXES = ("text/",)
+COMPRESSIBLE_MIME_TYPES = {
+    "application/json",
+    "application/ld+json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/xhtml+xml",
+    "application/javascript",
+    "application/x-javascript",
+    "application/typescript",
+    "application/sql",
+    "application/x-sh",
+    "application/x-yaml",
+    "application/yaml",
+    "application/csv",
+    "application/rtf",
+    "application/msword",
+    "application/vnd.ms-excel",
+    "application/vnd.ms-powerpoint",
+    "application/vnd.oasis.opendocument.text-flat-xml",
+    "application/x-tex",
+    "image/svg+xml",
+    "image/bmp",
+}
+
+
+class ZlibCodec:
+    """
+    Default codec. A codec exposes `name`, `compressor()` and `decompressor()`, where the
+    returned objects follow the zlib interface (compress/flush and decompress/flush).
+    """
+
+    name = "zlib"
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compressor(self):
+        return zlib.compressobj(self.level)
+
+    def decompressor(self):
+        return zlib.decompressobj()
+
+
+CODECS = {ZlibCodec.name: ZlibCodec()}
+
+
+def register_codec(codec):
+    """Make a codec available by name, e.g. for CLOUD_COMPRESSION_CODEC."""
+    CODECS[codec.name] = codec
+
+
+def get_codec(name):
+    """
+    Look up a registered codec.
+
+    Raises:
+        ValueError: If no codec is registered under this name
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec: {name}") from None
+
+
+def should_compress(mime_type):
+    """Whether files of this MIME type are worth compressing before they are stored."""
+    if not mime_type:
+        return False
+    mime_type = mime_type.split(";")[0].strip().lower()
+    return mime_type.startswith(COMPRESSIBLE_MIME_PREFIXES) or mime_type in COMPRESSIBLE_MIME_TYPES
+
+
+def compress_chunks(chunks: Iterable[bytes], codec) -> Iterator[bytes]:
+    """Compress a stream of chunks, yielding compressed output as it becomes available."""
+    compressor = codec.compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def decompress_chunks(chunks: Iterable[bytes], codec) -> Iterator[bytes]:
+    """
+    Decompress a stream of chunks produced by compress_chunks().
+
+    Output is produced in blocks of at most DECOMPRESS_BLOCK_SIZE, so a highly
+    compressible file never inflates into one huge buffer.
+    """
+    decompressor = codec.decompressor()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk, DECOMPRESS_BLOCK_SIZE)
+        while data:
+            yield data
+            data = decompressor.decompress(decompressor.unconsumed_tail, DECOMPRESS_BLOCK_SIZE)
+    data = decompressor.flush()
+    if data:
+        yield data
@@ -1,5 +1,7 @@
 import os
-from typing import BinaryIO
+from collections import deque
+from concurrent.futures import Executor
+from typing import BinaryIO, Iterable, Iterator
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
@@ -7,6 +9,8 @@ from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 AES_KEY_SIZE = 32  # 256 bits
 GCM_NONCE_SIZE = 12  # 96 bits (recommended for GCM)
 CHUNK_SIZE = 64 * 1024  # 64KB chunks for reading files
+GCM_TAG_SIZE = 16  # 128-bit authentication tag appended to each GCM message
+SEGMENT_SIZE = 4 * 1024 * 1024  # 4MB plaintext per segment in the segmented format
 
 
 def generate_encryption_key() -> bytes:
@@ -170,3 +174,125 @@ def decrypt_file_memory(data: bytes, key: bytes, nonce: bytes) -> bytes:
 
     aesgcm = AESGCM(key)
     return aesgcm.decrypt(nonce, data, None)
+
+
+def segment_nonce(nonce: bytes, index: int, is_last: bool) -> bytes:
+    """
+    Derive the per-segment nonce for the segmented format.
+
+    The first 7 bytes of the file nonce are kept, followed by a 4-byte segment
+    counter and a 1-byte final-segment flag, so segments cannot be reordered,
+    duplicated or truncated without failing authentication.
+    """
+    return nonce[:7] + index.to_bytes(4, "big") + (b"\x01" if is_last else b"\x00")
+
+
+def iter_segments(chunks: Iterable[bytes], segment_size: int = SEGMENT_SIZE) -> Iterator[tuple]:
+    """
+    Regroup a stream of arbitrarily sized chunks into fixed-size segments.
+
+    Yields:
+        tuple: (index, data, is_last). An empty input yields a single empty final segment.
+    """
+    buffer = bytearray()
+    index = 0
+    for chunk in chunks:
+        buffer += chunk
+        # Keep at least one byte buffered so the final segment can be flagged
+        while len(buffer) > segment_size:
+            yield index, bytes(buffer[:segment_size]), False
+            del buffer[:segment_size]
+            index += 1
+    yield index, bytes(buffer), True
+
+
+def encrypt_segments(
+    chunks: Iterable[bytes],
+    output_file: BinaryIO,
+    key: bytes,
+    nonce: bytes,
+    segment_size: int = SEGMENT_SIZE,
+    executor: Executor = None,
+    max_pending: int = 8,
+) -> int:
+    """
+    Encrypt a stream of plaintext chunks as independently authenticated AES-256-GCM segments.
+
+    Segments are encrypted on the executor (AESGCM releases the GIL) while the
+    caller keeps reading and hashing the next ones, and are written in order.
+
+    Args:
+        chunks: Iterable of plaintext bytes
+        output_file: File-like object to write ciphertext to
+        key: 32-byte encryption key
+        nonce: 12-byte file nonce, see segment_nonce()
+        segment_size: Plaintext bytes per segment
+        executor: Optional executor to encrypt on; runs inline when None
+        max_pending: Maximum number of segments in flight at once
+
+    Returns:
+        int: Total bytes written (each segment carries its own 16-byte tag)
+    """
+    if len(key) != AES_KEY_SIZE:
+        raise ValueError(f"Key must be {AES_KEY_SIZE} bytes")
+    if len(nonce) != GCM_NONCE_SIZE:
+        raise ValueError(f"Nonce must be {GCM_NONCE_SIZE} bytes")
+
+    aesgcm = AESGCM(key)
+    pending = deque()
+    total_size = 0
+
+    for index, data, is_last in iter_segments(chunks, segment_size):
+        if executor is None:
+            ciphertext = aesgcm.encrypt(segment_nonce(nonce, index, is_last), data, None)
+            output_file.write(ciphertext)
+            total_size += len(ciphertext)
+            continue
+
+        pending.append(executor.submit(aesgcm.encrypt, segment_nonce(nonce, index, is_last), data, None))
+        while len(pending) >= max_pending:
+            ciphertext = pending.popleft().result()
+            output_file.write(ciphertext)
+            total_size += len(ciphertext)
+
+    while pending:
+        ciphertext = pending.popleft().result()
+        output_file.write(ciphertext)
+        total_size += len(ciphertext)
+
+    return total_size
+
+
+def decrypt_segments(
+    input_file: BinaryIO, key: bytes, nonce: bytes, segment_size: int = SEGMENT_SIZE, start_segment: int = 0
+) -> Iterator[bytes]:
+    """
+    Decrypt a file written by encrypt_segments(), yielding one plaintext segment at a time.
+
+    Args:
+        input_file: Real file object opened in binary mode (its size locates the final segment)
+        key: 32-byte encryption key
+        nonce: 12-byte file nonce
+        segment_size: Plaintext bytes per segment used during encryption
+        start_segment: Index of the first segment to yield (lets callers seek)
+
+    Yields:
+        bytes: Decrypted segment plaintext
+
+    Raises:
+        cryptography.exceptions.InvalidTag: If any segment fails authentication
+    """
+    if len(key) != AES_KEY_SIZE:
+        raise ValueError(f"Key must be {AES_KEY_SIZE} bytes")
+    if len(nonce) != GCM_NONCE_SIZE:
+        raise ValueError(f"Nonce must be {GCM_NONCE_SIZE} bytes")
+
+    aesgcm = AESGCM(key)
+    stored_segment_size = segment_size + GCM_TAG_SIZE
+    encrypted_size = os.fstat(input_file.fileno()).st_size
+    last_index = max(0, -(-encrypted_size // stored_segment_size) - 1)
+
+    input_file.seek(start_segment * stored_segment_size)
+    for index in range(start_segment, last_index + 1):
+        ciphertext = input_file.read(stored_segment_size)
+        yield aesgcm.decrypt(segment_nonce(nonce, index, index == last_index), ciphertext, None)
@@ -0,0 +1,205 @@
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+from cloud.models import CloudFile, FileVersion, MediaFile
+
+GC_BATCH_SIZE = 1000
+# Top-level MEDIA_ROOT entries that are not blob folders
+NON_BLOB_FOLDERS = {"temp_chunks", "temp_downloads", "chunk_store", "defaults"}
+
+
+def _new_stats():
+    return {"removed": 0, "bytes": 0}
+
+
+def _tree_size(path):
+    """Bytes under a file or directory, walked with scandir so nothing is listed up front."""
+    try:
+        if not path.is_dir():
+            return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+    size = 0
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    else:
+                        size += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+    return size
+
+
+def _remove(path, stats, dry_run):
+    stats["bytes"] += _tree_size(path)
+    stats["removed"] += 1
+    if dry_run:
+        return
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _scan(path):
+    """Entries of a directory, streamed; nothing if it does not exist."""
+    try:
+        with os.scandir(path) as entries:
+            yield from entries
+    except FileNotFoundError:
+        return
+
+
+def collect_temp_sessions(now, dry_run=False):
+    """
+    Remove chunked upload sessions (temp_chunks/<upload_id>/) and URL downloads (temp_downloads/)
+    untouched for CLOUD_GC_TEMP_MAX_AGE_HOURS. The cache entry of a session expires after the same
+    time, but its chunks used to stay on disk forever.
+    """
+    stats = _new_stats()
+    cutoff = now - settings.CLOUD_GC_TEMP_MAX_AGE_HOURS * 3600
+    for folder in ("temp_chunks", "temp_downloads"):
+        for entry in _scan(Path(settings.MEDIA_ROOT) / folder):
+            # Every new chunk touches the session directory
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                _remove(Path(entry.path), stats, dry_run)
+    return stats
+
+
+def _blob_folders():
+    folders = set(MediaFile.objects.values_list("folder", flat=True).distinct())
+    return sorted(folder for folder in folders if folder and folder not in NON_BLOB_FOLDERS)
+
+
+def collect_orphan_blobs(now, dry_run=False):
+    """
+    Remove blob directories ({folder}/{uuid}/) that have no MediaFile row, e.g. from ingests that
+    died before cleaning up. Directories younger than CLOUD_GC_ORPHAN_GRACE_HOURS are left alone,
+    their ingest may still be running.
+    """
+    stats = _new_stats()
+    cutoff = now - settings.CLOUD_GC_ORPHAN_GRACE_HOURS * 3600
+
+    def reconcile(batch):
+        known = set(MediaFile.objects.filter(id__in=list(batch)).values_list("id", flat=True))
+        for media_id, (path, mtime) in batch.items():
+            if media_id not in known and mtime < cutoff:
+                _remove(path, stats, dry_run)
+
+    for folder in _blob_folders():
+        batch = {}
+        for entry in _scan(Path(settings.MEDIA_ROOT) / folder):
+            try:
+                media_id = uuid.UUID(entry.name)
+            except ValueError:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                batch[media_id] = (Path(entry.path), entry.stat(follow_symlinks=False).st_mtime)
+            if len(batch) >= GC_BATCH_SIZE:
+                reconcile(batch)
+                batch = {}
+        reconcile(batch)
+    return stats
+
+
+def collect_deleted_media(now, dry_run=False):
+    """
+    Purge media soft-deleted more than CLOUD_GC_DELETED_MEDIA_DAYS ago that nothing references:
+    the blob directory is removed and the row deleted (with the tombstones of deleted files
+    that pointed at it).
+    """
+    stats = _new_stats()
+    cutoff = datetime.fromtimestamp(now - settings.CLOUD_GC_DELETED_MEDIA_DAYS * 86400, tz=dt_timezone.utc)
+    purgeable = (
+        MediaFile.objects.filter(is_deleted=True, ref_count=0, deleted_at__lt=cutoff)
+        # ref_count is the source of truth, these only guard against a miscount
+        .exclude(Exists(CloudFile.objects.filter(media_id=OuterRef("id"), is_deleted=False)))
+        .exclude(Exists(FileVersion.objects.filter(media_id=OuterRef("id"))))
+        .only("id", "folder", "filename", "is_encrypted")
+        .order_by("id")
+    )
+    last_id = None
+    while True:
+        batch = purgeable if last_id is None else purgeable.filter(id__gt=last_id)
+        batch = list(batch[:GC_BATCH_SIZE])
+        if not batch:
+            return stats
+        last_id = batch[-1].id
+        for media in batch:
+            _remove(media.file_path().parent, stats, dry_run)
+        if not dry_run:
+            MediaFile.objects.filter(id__in=[media.id for media in batch]).delete()
+
+
+def find_missing_blobs(dry_run=False):
+    """
+    Flag live media whose blob is gone (integrity_status "missing"), so they show up in the
+    integrity report. Rows are kept: files still point at them.
+
+    Returns:
+        dict: {"missing": count, "ids": first ids found}
+    """
+    stats = {"missing": 0, "ids": []}
+    media = MediaFile.objects.filter(is_deleted=False).only("id", "folder", "filename", "is_encrypted").order_by("id")
+    last_id = None
+    while True:
+        batch = list((media if last_id is None else media.filter(id__gt=last_id))[:GC_BATCH_SIZE])
+        if not batch:
+            return stats
+        last_id = batch[-1].id
+        missing = [media_file.id for media_file in batch if not media_file.file_path().exists()]
+        stats["missing"] += len(missing)
+        stats["ids"].extend(missing[: max(0, 100 - len(stats["ids"]))])
+        if missing and not dry_run:
+            MediaFile.objects.filter(id__in=missing).update(integrity_status="missing", integrity_error="Blob not found")
+
+
+def collect_stale_chunks(now, dry_run=False):
+    """
+    Remove delta-sync chunks (chunk_store/<user>/<xx>/<sha256>) no manifest used for
+    CLOUD_GC_CHUNK_MAX_AGE_DAYS; find_missing_chunks() refreshes the mtime of every chunk it
+    reuses. Leftover temporary files of interrupted writes go after the orphan grace period.
+    """
+    stats = _new_stats()
+    cutoff = now - settings.CLOUD_GC_CHUNK_MAX_AGE_DAYS * 86400
+    temp_cutoff = now - settings.CLOUD_GC_ORPHAN_GRACE_HOURS * 3600
+    for user_dir in _scan(Path(settings.MEDIA_ROOT) / "chunk_store"):
+        if not user_dir.is_dir(follow_symlinks=False):
+            continue
+        for prefix_dir in _scan(user_dir.path):
+            if not prefix_dir.is_dir(follow_symlinks=False):
+                continue
+            for entry in _scan(prefix_dir.path):
+                mtime = entry.stat(follow_symlinks=False).st_mtime
+                if mtime < (temp_cutoff if entry.name.startswith(".tmp-") else cutoff):
+                    _remove(Path(entry.path), stats, dry_run)
+    return stats
+
+
+def run_gc(dry_run=False):
+    """
+    Reconcile MEDIA_ROOT against the database, one streamed pass per kind of garbage.
+
+    Returns:
+        dict: Per step, {"removed", "bytes"} (or {"missing", "ids"} for missing blobs)
+    """
+    now = time.time()
+    return {
+        "temp_sessions": collect_temp_sessions(now, dry_run),
+        "orphan_blobs": collect_orphan_blobs(now, dry_run),
+        "deleted_media": collect_deleted_media(now, dry_run),
+        "stale_chunks": collect_stale_chunks(now, dry_run),
+        "missing_blobs": find_missing_blobs(dry_run),
+    }
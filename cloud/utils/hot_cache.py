@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class DecryptedFileCache:
+    """
+    Process-local LRU cache of decrypted/decompressed payloads of small media files.
+
+    Entries are keyed by MediaFile.id and only returned when the caller's media_hash
+    matches the cached one, so replaced content is never served. The cache is bounded
+    by total payload bytes rather than by entry count.
+    """
+
+    def __init__(self, max_bytes, max_item_size):
+        self.max_bytes = max_bytes
+        self.max_item_size = max_item_size
+        self._entries = OrderedDict()  # media_id -> (media_hash, data)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, media_id, media_hash):
+        key = str(media_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != media_hash:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, media_id, media_hash, data):
+        if len(data) > self.max_item_size or len(data) > self.max_bytes:
+            return
+        key = str(media_id)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (media_hash, data)
+            self._size += len(data)
+            # Evict least recently used entries until we are back under budget
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, media_id):
+        with self._lock:
+            old = self._entries.pop(str(media_id), None)
+            if old is not None:
+                self._size -= len(old[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "max_item_size": self.max_item_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+hot_file_cache = DecryptedFileCache(settings.CLOUD_HOT_CACHE_MAX_BYTES, settings.CLOUD_HOT_CACHE_MAX_FILE_SIZE)
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import time
+from datetime import timedelta
+
+from cryptography.exceptions import InvalidTag
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from cloud.models import MediaFile
+from cloud.utils.media import iter_media_content
+
+SCRUB_BATCH_SIZE = 200
+
+
+class IOBudget:
+    """
+    Caps the average read rate of a long-running job by sleeping between reads.
+
+    Args:
+        bytes_per_second: Allowed average rate, 0 for no limit
+    """
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.started = time.monotonic()
+        self.consumed = 0
+
+    def consume(self, size):
+        self.consumed += size
+        if not self.bytes_per_second:
+            return
+        ahead = self.consumed / self.bytes_per_second - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _read_sequential(path, read_size, budget):
+    """
+    Yield a file's bytes with large unbuffered reads into one reused buffer.
+
+    The kernel is told the file is read sequentially and asked to drop its pages afterwards,
+    so a full scrub does not evict the page cache of files users are actually reading.
+    """
+    buffer = bytearray(read_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as stored_file:
+        fd = stored_file.fileno()
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        try:
+            while True:
+                read = stored_file.readinto(buffer)
+                if not read:
+                    break
+                budget.consume(read)
+                yield view[:read]
+        finally:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def verify_media(media, budget=None, read_size=None):
+    """
+    Check a MediaFile's blob against its recorded metadata.
+
+    Verifies the stored size (encrypted_size for encrypted blobs), that every GCM segment
+    authenticates, and that the original content has the recorded size and SHA-256.
+
+    Returns:
+        tuple: (status, error) with status "ok", "missing" or "corrupt"
+    """
+    budget = budget or IOBudget(0)
+    path = media.file_path()
+    try:
+        stored_size = path.stat().st_size
+    except FileNotFoundError:
+        return "missing", "Blob not found"
+
+    if media.is_encrypted and media.encrypted_size is not None:
+        expected_stored_size = media.encrypted_size
+    elif not media.is_encrypted and not media.compression:
+        expected_stored_size = media.size
+    else:
+        expected_stored_size = None  # Compressed and not encrypted, only known after inflating
+    if expected_stored_size is not None and stored_size != expected_stored_size:
+        return "corrupt", f"Stored size is {stored_size} bytes, expected {expected_stored_size}"
+
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        if media.is_encrypted or media.compression:
+            for chunk in iter_media_content(media):
+                budget.consume(len(chunk))
+                sha256.update(chunk)
+                size += len(chunk)
+        else:
+            for chunk in _read_sequential(path, read_size or settings.CLOUD_SCRUB_READ_SIZE, budget):
+                sha256.update(chunk)
+                size += len(chunk)
+    except InvalidTag:
+        return "corrupt", "Encrypted data failed GCM authentication"
+    except Exception as e:
+        return "corrupt", f"Unreadable: {e}"[:255]
+
+    if size != media.size:
+        return "corrupt", f"Content is {size} bytes, expected {media.size}"
+    if media.media_hash and sha256.hexdigest() != media.media_hash:
+        return "corrupt", "Content does not match media_hash"
+    return "ok", ""
+
+
+def scrub_media(limit=None, interval_days=None, bytes_per_second=None, on_result=None):
+    """
+    Verify live media that was never checked or not within interval_days, least recently
+    verified first, and record the outcome on each MediaFile.
+
+    Args:
+        limit: Maximum number of media to verify in this run (None for all that are due)
+        interval_days: Re-verification interval, defaults to CLOUD_SCRUB_INTERVAL_DAYS
+        bytes_per_second: I/O budget, defaults to CLOUD_SCRUB_BYTES_PER_SECOND
+        on_result: Optional callback(media, status, error), e.g. for progress output
+
+    Returns:
+        dict: Number of media per status
+    """
+    if interval_days is None:
+        interval_days = settings.CLOUD_SCRUB_INTERVAL_DAYS
+    if bytes_per_second is None:
+        bytes_per_second = settings.CLOUD_SCRUB_BYTES_PER_SECOND
+    budget = IOBudget(bytes_per_second)
+    due_before = timezone.now() - timedelta(days=interval_days)
+    due = MediaFile.objects.filter(Q(last_verified_at=None) | Q(last_verified_at__lt=due_before), is_deleted=False)
+
+    counts = {"ok": 0, "missing": 0, "corrupt": 0}
+    while limit is None or sum(counts.values()) < limit:
+        batch_size = SCRUB_BATCH_SIZE if limit is None else min(SCRUB_BATCH_SIZE, limit - sum(counts.values()))
+        # Verified media leaves the due set, so every batch starts from the top again
+        batch = list(
+            due.order_by(F("last_verified_at").asc(nulls_first=True), "id").defer("client_key_metadata")[:batch_size]
+        )
+        if not batch:
+            break
+
+        for media in batch:
+            integrity_status, error = verify_media(media, budget)
+            media.integrity_status = integrity_status
+            media.integrity_error = error
+            media.last_verified_at = timezone.now()
+            counts[integrity_status] += 1
+            if on_result:
+                on_result(media, integrity_status, error)
+        MediaFile.objects.bulk_update(batch, ["integrity_status", "integrity_error", "last_verified_at"])
+    return counts
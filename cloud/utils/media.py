@@ -1,10 +1,15 @@
 import hashlib
 import mimetypes
+import os
 import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Union
 
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from rest_framework import status
@@ -13,9 +18,115 @@ from rest_framework.response import Response
 from accounts.models import User
 from api.utils import get_current_server
 from cloud.models import MediaFile
-from cloud.utils.encryption import encrypt_file_stream, generate_encryption_key, generate_nonce
+from cloud.utils.capture_date import get_capture_date
+from cloud.utils.compression import compress_chunks, decompress_chunks, get_codec, should_compress
+from cloud.utils.encryption import (
+    SEGMENT_SIZE,
+    decrypt_file_memory,
+    decrypt_segments,
+    encrypt_segments,
+    generate_encryption_key,
+    generate_nonce,
+)
+from cloud.utils.rollups import add_media_to_rollups
 
 MAX_FILE_SIZE = 5 * 1024 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # 64KB chunks for streaming remote files
+INGEST_READ_SIZE = 1024 * 1024  # 1MB reads keep hashing/encryption calls large enough to release the GIL
+
+_http_session = None
+_ingest_executor = None
+
+
+class RemoteFileTooLarge(Exception):
+    pass
+
+
+def get_http_session():
+    """
+    Return a process-wide requests.Session with a pooled adapter.
+
+    Reusing one session keeps TCP/TLS connections to hosts like
+    lh3.googleusercontent.com alive between logins instead of handshaking every time.
+    """
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _http_session = session
+    return _http_session
+
+
+def get_ingest_executor():
+    """
+    Return the process-wide thread pool used to encrypt ingested files.
+
+    The pool is shared by all requests and sized by CLOUD_INGEST_WORKERS, so
+    concurrent uploads cannot use more cores than the knob allows.
+    """
+    global _ingest_executor
+    if _ingest_executor is None:
+        _ingest_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.CLOUD_INGEST_WORKERS), thread_name_prefix="cloud-ingest"
+        )
+    return _ingest_executor
+
+
+def hashed_chunks(chunks, sha256):
+    """Yield chunks unchanged while feeding them to a running hash."""
+    for chunk in chunks:
+        sha256.update(chunk)
+        yield chunk
+
+
+def download_to_temp(url: str, max_size: int):
+    """
+    Stream a remote file to a temporary file on disk, hashing it as it arrives.
+
+    Args:
+        url: The HTTP/HTTPS URL to download
+        max_size: Abort once the body grows past this many bytes
+
+    Returns:
+        tuple: (temp_path, file_size, sha256 hexdigest, content_type)
+
+    Raises:
+        RemoteFileTooLarge: If Content-Length or the streamed body exceeds max_size
+        requests.exceptions.RequestException: On connection errors, bad statuses or timeouts
+    """
+    temp_dir = Path(settings.MEDIA_ROOT) / "temp_downloads"
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + settings.CLOUD_REMOTE_FETCH_TIMEOUT
+
+    with get_http_session().get(url, stream=True, timeout=(5, 10)) as response:
+        response.raise_for_status()
+
+        # Reject early when the server tells us the size up front
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            raise RemoteFileTooLarge(f"Remote file is {content_length} bytes, limit is {max_size} bytes")
+
+        sha256 = hashlib.sha256()
+        file_size = 0
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    file_size += len(chunk)
+                    if file_size > max_size:
+                        raise RemoteFileTooLarge(f"Remote file exceeds limit of {max_size} bytes")
+                    if time.monotonic() > deadline:
+                        raise requests.exceptions.Timeout(f"Download took longer than {settings.CLOUD_REMOTE_FETCH_TIMEOUT}s")
+                    sha256.update(chunk)
+                    temp_file.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        content_type = response.headers.get("content-type", "").split(";")[0].strip()
+        return Path(temp_path), file_size, sha256.hexdigest(), content_type
 
 
 def create_media_file(
@@ -26,6 +137,7 @@ def create_media_file(
     privacy="private",
     should_encrypt=False,
     filename: str = None,
+    client_key_metadata: dict = None,
 ):
     """
     Create a MediaFile from an uploaded file, a filename, or a URL.
@@ -35,6 +147,8 @@ def create_media_file(
         folder: The folder to store the file in (e.g., "avatars", "cloud")
         should_encrypt: Whether to encrypt the file (only applies to UploadedFile, not str)
         filename: Optional custom filename to use (mainly for URLs)
+        client_key_metadata: Wrapped-key metadata for client-side encrypted uploads; the bytes are
+            then stored as opaque ciphertext, with no server encryption or compression
 
     Returns:
         MediaFile instance or Response/None on error
@@ -45,32 +159,28 @@ def create_media_file(
     is_url = is_string and file.startswith(("http://", "https://"))
     is_filename = is_string and not is_url
 
-    downloaded_content = None  # For URL downloads
+    downloaded_path = None  # Temporary file for URL downloads
+    downloaded_hash = None
+    captured_at = None  # Only cloud uploads are placed on the timeline
 
     # Get file info based on type
     if is_url:
-        # Handle URL case - download from HTTP/HTTPS
+        # Handle URL case - stream from HTTP/HTTPS to a temporary file
         try:
-            response = requests.get(file, timeout=10)
-            if response.status_code != 200:
-                print(f"Failed to download file from {file}: Status {response.status_code}")
-                return None
-
-            downloaded_content = response.content
-            file_size = len(downloaded_content)
+            max_size = min(MAX_FILE_SIZE, settings.CLOUD_REMOTE_FETCH_MAX_SIZE)
+            downloaded_path, file_size, downloaded_hash, mime_type = download_to_temp(file, max_size)
 
             # Use provided filename or extract from URL
             if not filename:
                 filename = file.split("/")[-1].split("?")[0] or "downloaded_file"
 
-            # Get mime type from response headers or guess from filename
-            mime_type = response.headers.get("content-type")
+            # Fall back to guessing mime type from filename
             if not mime_type:
                 mime_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
 
             should_encrypt = False  # Never encrypt downloaded files
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, RemoteFileTooLarge) as e:
             print(f"Error downloading file from {file}: {e}")
             return None
 
@@ -91,6 +201,11 @@ def create_media_file(
         file_size = file.size
         filename = file.name
         mime_type = file.content_type or "application/octet-stream"
+        if client_key_metadata is not None:
+            should_encrypt = False  # Already encrypted by the client
+        # EXIF has to be read before the bytes are compressed/encrypted; client ciphertext only has its name
+        if folder == "cloud":
+            captured_at = get_capture_date(None if client_key_metadata is not None else file, filename, mime_type)
 
     # Check file size (5GB limit)
     if file_size > MAX_FILE_SIZE:
@@ -104,26 +219,25 @@ def create_media_file(
         sha256 = hashlib.sha256()
 
         if is_url:
-            # Hash from downloaded content
-            sha256.update(downloaded_content)
+            # Already hashed while streaming the download
+            pass
         elif is_filename:
             # Hash from file path
             with open(source_path, "rb") as f:
                 for chunk in iter(lambda: f.read(8192), b""):
                     sha256.update(chunk)
-        else:
-            # Hash from uploaded file
-            for chunk in file.chunks():
-                sha256.update(chunk)
-            file.seek(0)  # Reset file pointer
+        # Uploaded files are hashed in the same pass that writes them to disk
 
         # Create MediaFile instance
         media_file = MediaFile(
             filename=filename,
-            media_hash=sha256.hexdigest(),
+            media_hash=downloaded_hash or (sha256.hexdigest() if is_filename else ""),
             size=file_size,
             mime_type=mime_type,
+            captured_at=captured_at,
             is_encrypted=should_encrypt,
+            is_client_encrypted=client_key_metadata is not None and not is_string,
+            client_key_metadata=client_key_metadata if not is_string else None,
             residing_server=get_current_server(),
             owner=owner,
             privacy=privacy,
@@ -147,31 +261,44 @@ def create_media_file(
 
         # Save the file
         if is_url:
-            # Write downloaded content to file
-            with open(output_path, "wb") as f:
-                f.write(downloaded_content)
+            # Move the downloaded temporary file into place
+            shutil.move(downloaded_path, output_path)
         elif is_filename:
             # Copy file from defaults folder
             shutil.copy2(source_path, output_path)
-        elif should_encrypt:
-            # Encrypt and save uploaded file
-            encryption_key = generate_encryption_key()
-            nonce = generate_nonce()
-
-            with open(output_path, "wb") as output_file:
-                encrypted_size = encrypt_file_stream(file, output_file, encryption_key, nonce)
-
-            # Store encryption parameters
-            media_file.encryption_key = encryption_key
-            media_file.encryption_nonce = nonce
-            media_file.encrypted_size = encrypted_size
-            media_file.save()
         else:
-            # Save uploaded file without encryption
-            with open(output_path, "wb") as output_file:
-                for chunk in file.chunks():
-                    output_file.write(chunk)
+            # Read the upload once: hash on this thread, encrypt segments on the ingest pool
+            chunks = hashed_chunks(file.chunks(chunk_size=INGEST_READ_SIZE), sha256)
+
+            # Compress text-like files before they are encrypted (ciphertext does not compress)
+            if settings.CLOUD_COMPRESSION_CODEC and not media_file.is_client_encrypted and should_compress(mime_type):
+                chunks = compress_chunks(chunks, get_codec(settings.CLOUD_COMPRESSION_CODEC))
+                media_file.compression = settings.CLOUD_COMPRESSION_CODEC
+
+            if should_encrypt:
+                encryption_key = generate_encryption_key()
+                nonce = generate_nonce()
+
+                with open(output_path, "wb") as output_file:
+                    encrypted_size = encrypt_segments(
+                        chunks, output_file, encryption_key, nonce, SEGMENT_SIZE, get_ingest_executor()
+                    )
+
+                # Store encryption parameters
+                media_file.encryption_key = encryption_key
+                media_file.encryption_nonce = nonce
+                media_file.encryption_segment_size = SEGMENT_SIZE
+                media_file.encrypted_size = encrypted_size
+            else:
+                # Save uploaded file without encryption
+                with open(output_path, "wb") as output_file:
+                    for chunk in chunks:
+                        output_file.write(chunk)
 
+            media_file.media_hash = sha256.hexdigest()
+            media_file.save()
+
+        add_media_to_rollups(media_file)
         return media_file
 
     except Exception as e:
@@ -181,6 +308,8 @@ def create_media_file(
             if file_dir.exists():
                 shutil.rmtree(file_dir)
             media_file.delete()
+        if downloaded_path and downloaded_path.exists():
+            downloaded_path.unlink()
 
         # Return None for URLs/filenames, raise exception for uploaded files
         error_msg = f"Failed to process file: {str(e)}"
@@ -189,3 +318,54 @@ def create_media_file(
             return None
         
         raise Exception(error_msg)
+
+
+def iter_media_content(media: MediaFile, start: int = 0, end: int = None):
+    """
+    Yield the original bytes of a stored media file, decrypting and decompressing as needed.
+
+    Args:
+        media: The MediaFile to read
+        start: First byte offset of the original file to return
+        end: Last byte offset to return (inclusive), or None for the end of the file
+
+    Note:
+        Raw and segmented-encrypted files seek straight to the requested range.
+        Compressed files have to be inflated from the beginning, and files encrypted
+        as a single GCM message are decrypted whole before slicing.
+    """
+    skip = start
+    with open(media.file_path(), "rb") as stored_file:
+        if media.is_encrypted:
+            key, nonce = bytes(media.encryption_key), bytes(media.encryption_nonce)
+            if media.encryption_segment_size:
+                first_segment = 0
+                if not media.compression:
+                    first_segment = start // media.encryption_segment_size
+                    skip = start - first_segment * media.encryption_segment_size
+                stream = decrypt_segments(stored_file, key, nonce, media.encryption_segment_size, first_segment)
+            else:
+                stream = iter([decrypt_file_memory(stored_file.read(), key, nonce)])
+        else:
+            if not media.compression:
+                stored_file.seek(start)
+                skip = 0
+            stream = iter(lambda: stored_file.read(INGEST_READ_SIZE), b"")
+
+        if media.compression:
+            stream = decompress_chunks(stream, get_codec(media.compression))
+
+        remaining = None if end is None else end - start + 1
+        for chunk in stream:
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            if remaining is not None:
+                if len(chunk) >= remaining:
+                    yield chunk[:remaining]
+                    return
+                remaining -= len(chunk)
+            yield chunk
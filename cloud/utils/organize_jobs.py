@@ -0,0 +1,211 @@
+import threading
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from cloud.models import CloudFile, Directory, OrganizeJob
+from cloud.utils.acl import inherit_access
+from cloud.utils.changes import directory_change, file_change, record_changes
+from cloud.utils.organizer import classify_many
+
+BATCH_SIZE = 1000  # Files classified, and moved in one transaction, per batch
+LOCK_TIMEOUT = 10 * 60  # Seconds a running job may go without finishing a batch before another run may take over
+
+
+class JobTakenOver(Exception):
+    """Another run claimed the job, e.g. after this one stalled for longer than LOCK_TIMEOUT."""
+
+
+def _claim(job_id):
+    """
+    Mark a job running for this run, in the database so runs in other processes see it.
+    A running job is only taken over once it has not committed a batch for LOCK_TIMEOUT.
+
+    Returns:
+        OrganizeJob: The claimed job, or None if it is completed or held by another run
+    """
+    now = timezone.now()
+    claimable = Q(status__in=("pending", "failed")) | Q(
+        status="running", updated_at__lt=now - timedelta(seconds=LOCK_TIMEOUT)
+    )
+    if not OrganizeJob.objects.filter(claimable, id=job_id).update(status="running", error="", updated_at=now):
+        return None
+    return OrganizeJob.objects.get(id=job_id)
+
+
+def _save_progress(job, **fields):
+    """
+    Save job fields if this run still holds the job: updated_at doubles as the run's heartbeat,
+    and another run that took over has moved it. Raises JobTakenOver otherwise.
+    """
+    now = timezone.now()
+    if not OrganizeJob.objects.filter(id=job.id, status="running", updated_at=job.updated_at).update(
+        updated_at=now, **fields
+    ):
+        raise JobTakenOver(job.id)
+    job.updated_at = now
+
+
+def _target_path(name, classification):
+    """Directory names a file should live under, or None to leave it where it is (see get_directory_path)."""
+    if name.startswith(".") or name.endswith(".txt"):
+        return None
+    if classification.subcategory:
+        return (classification.category, classification.subcategory)
+    return (classification.category,)
+
+
+def _ensure_directories(owner_id, root_id, paths, directory_ids):
+    """
+    Make sure every Category[/Subcategory] path exists below root_id.
+
+    Uses one lookup and at most one bulk_create per level. directory_ids maps path tuples to
+    Directory ids and is filled in place, so later batches mostly skip the database.
+    """
+    for depth in (1, 2):
+        wanted = {path[:depth] for path in paths if len(path) >= depth} - directory_ids.keys()
+        if not wanted:
+            continue
+
+        existing = Directory.objects.filter(owner_id=owner_id, name__in={path[-1] for path in wanted})
+        if depth == 1:
+            # parent_id=None matches root-level directories
+            existing = existing.filter(parent_id=root_id)
+        else:
+            existing = existing.filter(parent_id__in={directory_ids[path[:-1]] for path in wanted})
+        existing = existing.values_list("parent_id", "name", "id")
+
+        by_parent = {}
+        for parent_id, name, directory_id in existing:
+            by_parent.setdefault((parent_id, name), directory_id)
+
+        new_directories = []
+        for path in sorted(wanted):
+            parent_id = directory_ids[path[:-1]]
+            directory_id = by_parent.get((parent_id, path[-1]))
+            if directory_id is None:
+                directory = Directory(name=path[-1], owner_id=owner_id, parent_id=parent_id)
+                new_directories.append(directory)
+                directory_id = directory.id
+            directory_ids[path] = directory_id
+        Directory.objects.bulk_create(new_directories)
+        record_changes(directory_change("create", directory) for directory in new_directories)
+        inherit_access(owner_id, new_directories)
+
+
+def _process_batch(job, files, directory_ids):
+    """Classify and move one batch of files. Must run inside a transaction."""
+    classifications = classify_many([file.name for file in files])
+    targets = {}
+    for file, classification in zip(files, classifications):
+        path = _target_path(file.name, classification)
+        if path:
+            targets[file.id] = path
+
+    root_id = job.directory_id
+    _ensure_directories(job.owner_id, root_id, set(targets.values()), directory_ids)
+
+    # One query for names already taken in any destination directory of this batch
+    taken = set(
+        CloudFile.objects.filter(
+            owner_id=job.owner_id,
+            directory_id__in={directory_ids[path] for path in targets.values()},
+            name__in={file.name for file in files if file.id in targets},
+            is_deleted=False,
+        ).values_list("directory_id", "name")
+    )
+
+    now = timezone.now()
+    moved = []
+    for file in files:
+        path = targets.get(file.id)
+        if path is None:
+            continue
+        destination = (directory_ids[path], file.name)
+        if destination in taken:
+            continue
+        taken.add(destination)
+        file.directory_id = destination[0]
+        file.modified_at = now
+        moved.append(file)
+
+    CloudFile.objects.bulk_update(moved, ["directory", "modified_at"])
+    record_changes(file_change("move", file) for file in moved)
+    return len(moved)
+
+
+def run_organize_job(job_id):
+    """
+    Run (or resume) an organize job in the current thread.
+
+    Every batch is committed together with the job's cursor and counters, so a crash loses
+    at most the batch in flight and the next run picks up after the last committed file.
+
+    Returns:
+        OrganizeJob: The job as left by this run, or None if another run holds the job
+    """
+    job = _claim(job_id)
+    if job is None:
+        job = OrganizeJob.objects.filter(id=job_id).first()
+        return job if job and job.status == "completed" else None
+
+    try:
+        files = CloudFile.objects.filter(owner_id=job.owner_id, directory_id=job.directory_id, is_deleted=False)
+        if job.cursor is None:
+            job.total_files = files.count()
+            _save_progress(job, total_files=job.total_files)
+
+        directory_ids = {(): job.directory_id}
+        while True:
+            batch_query = files.order_by("id").only("id", "name", "owner_id", "directory_id")
+            if job.cursor is not None:
+                batch_query = batch_query.filter(id__gt=job.cursor)
+            batch = list(batch_query[:BATCH_SIZE])
+            if not batch:
+                break
+
+            with transaction.atomic():
+                moved = _process_batch(job, batch, directory_ids)
+                job.cursor = batch[-1].id
+                job.processed_files += len(batch)
+                job.moved_files += moved
+                job.skipped_files += len(batch) - moved
+                # Rolls the batch back if another run took the job over in the meantime
+                _save_progress(
+                    job,
+                    cursor=job.cursor,
+                    processed_files=job.processed_files,
+                    moved_files=job.moved_files,
+                    skipped_files=job.skipped_files,
+                )
+
+        job.status = "completed"
+        job.finished_at = timezone.now()
+        _save_progress(job, status=job.status, finished_at=job.finished_at)
+        return job
+    except JobTakenOver:
+        print(f"Organize job {job_id} was taken over by another run")
+        return None
+    except Exception as e:
+        print(f"Organize job {job_id} failed: {e}")
+        OrganizeJob.objects.filter(id=job_id, status="running", updated_at=job.updated_at).update(
+            status="failed", error=str(e), updated_at=timezone.now()
+        )
+        return OrganizeJob.objects.filter(id=job_id).first()
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_organize_job(job_id)
+    finally:
+        connection.close()
+
+
+def start_organize_job(job):
+    """Run an organize job on a daemon thread once the surrounding transaction has committed."""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_thread, args=(job.id,), daemon=True).start()
+    )
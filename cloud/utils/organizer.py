@@ -1,208 +1,224 @@
 import os
+import re
+from collections import namedtuple
 from datetime import datetime, timezone
+from functools import lru_cache
 
 # Define the destination directory
 DESTINATION_DIR = "exports"
 
+Classification = namedtuple("Classification", ["category", "subcategory", "date"])
+
+# File type rules, first match wins. Each rule is (kind, patterns, main_category, sub_category) where kind is
+#   "ext":      lower-cased file extension is one of patterns
+#   "contains": lower-cased filename contains one of patterns
+#   "prefix":   filename starts with one of patterns
+TYPE_RULES = [
+    ("ext", (".opus",), "Audio", "Voice Notes"),
+    ("ext", (".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac"), "Audio", None),
+    ("contains", (")_", "call"), "Audio", "Call Records"),
+    ("ext", (".mp4", ".mov", ".avi", ".mkv", ".webm", ".flv", ".3gp"), "Videos", None),
+    ("contains", ("record",), "Videos", "Screen Records"),
+    ("ext", (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".heic"), "Pictures", None),
+    ("prefix", ("Screenshot",), "Pictures", "Screenshots"),
+    ("prefix", ("IMG_", "IMG-", "MVIMG_"), "Pictures", None),
+    ("prefix", ("DOC",), "Documents", None),
+    (
+        "ext",
+        (
+            ".pdf", ".csv", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt",
+            ".rtf", ".odt", ".ods", ".odp", ".htm", ".html", ".xml", ".json",
+        ),
+        "Documents",
+        None,
+    ),
+    ("ext", (".zip", ".rar", ".7z", ".tar", ".gz", ".bz2"), "Archives", None),
+    ("ext", (".apk", ".exe", ".msi", ".dmg", ".app", ".sh", ".bat"), "Applications", None),
+]
+
+# Date rules in priority order: (prefixes, date regex capturing year, month, day).
+# A rule without prefixes is matched by CALL_RECORD_MARKERS appearing anywhere in the name instead.
+_YEARS = range(1990, 2100)
+DATE_RULES = [
+    (("IMG_", "VID_", "MVIMG_", "SAVE_"), r"^[A-Z]+_(\d{4})(\d{2})(\d{2})"),  # IMG_20240101_120000.jpg
+    (("IMG-", "AUD-", "PTT-", "VID-", "null-", "DOC"), r"^[^-]*-(\d{4})(\d{2})(\d{2})"),  # IMG-20240101-WA0001.jpg
+    (tuple(f"{year}-" for year in _YEARS), r"^(\d{4})-(\d{2})-(\d{2})"),  # 2024-01-01 12.00.00.jpg
+    (tuple(str(year) for year in _YEARS), r"^(\d{4})(\d{2})(\d{2})(?=[_.\s-]|$)"),  # 20240101_120000.jpg
+    (("Screenshot_",), r"^Screenshot_(\d{4})-?(\d{2})-?(\d{2})"),  # Screenshot_2024-01-01-12-00-00_com.app.jpg
+    (("Screenrecorder-",), r"^Screenrecorder-(\d{4})-(\d{2})-(\d{2})"),  # Screenrecorder-2024-01-01-12-00-00.mp4
+    (("IMG20",), r"^IMG(\d{4})(\d{2})(\d{2})"),  # IMG20240101120000.jpg
+    (None, r"^[^_]*_(\d{4})(\d{2})(\d{2})"),  # Call recording Name(0123)_20240101120000.m4a
+    (("WhatsApp ", "Screen Recording"), r"^\S+ \S+ (\d{4})-(\d{2})-(\d{2})"),  # WhatsApp Image 2024-01-01 at ...
+    (("Screenshot ",), r"^Screenshot (\d{4})-(\d{2})-(\d{2})"),  # Screenshot 2024-01-01 at 12.00.00.png
+    (("VID",), r"^VID(\d{4})(\d{2})(\d{2})"),  # VID20240101120000.mp4
+]
+CALL_RECORD_MARKERS = (")_", "call_")
+
+
+def _compile_type_rules():
+    """
+    Compile TYPE_RULES into an extension lookup table.
 
-def any_in(checks, target):
-    for check in checks:
-        if check in target:
-            return True
-    return False
+    Each known extension maps to (name_rules, result): the "contains"/"prefix" rules that
+    take priority over the extension rule, in order, and the extension rule's own result.
+    Unknown extensions use the None entry, which tests every name rule before falling back
+    to Other.
+    """
+    name_rules = [
+        (index, kind == "contains", patterns, (main_category, sub_category))
+        for index, (kind, patterns, main_category, sub_category) in enumerate(TYPE_RULES)
+        if kind != "ext"
+    ]
+
+    ext_table = {None: (tuple(rule[1:] for rule in name_rules), ("Other", None))}
+    for index, (kind, patterns, main_category, sub_category) in enumerate(TYPE_RULES):
+        if kind != "ext":
+            continue
+        preceding = tuple(rule[1:] for rule in name_rules if rule[0] < index)
+        for ext in patterns:
+            ext_table.setdefault(ext, (preceding, (main_category, sub_category)))
+    return ext_table
+
+
+def _compile_date_rules():
+    """Build a prefix trie mapping each DATE_RULES prefix to its rule index, plus the compiled regexes."""
+    trie = {}
+    call_rule = None
+    for index, (prefixes, _) in enumerate(DATE_RULES):
+        if prefixes is None:
+            call_rule = index
+            continue
+        for prefix in prefixes:
+            node = trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            # Keep the highest-priority rule when prefixes repeat
+            node[None] = min(node.get(None, index), index)
+    regexes = [re.compile(pattern).match for _, pattern in DATE_RULES]
+    return trie, call_rule, regexes
+
+
+_EXT_TABLE = _compile_type_rules()
+_DATE_TRIE, _CALL_RULE, _DATE_REGEXES = _compile_date_rules()
+_CALL_RE = re.compile("|".join(map(re.escape, CALL_RECORD_MARKERS)))
+_RAW_TIMESTAMP_RE = re.compile(r"^\d+(?=\.|$)")
+
+
+def _match_type(filename):
+    """Return (main_category, sub_category) for a filename according to TYPE_RULES."""
+    dot = filename.rfind(".")
+    entry = _EXT_TABLE.get(filename[dot:].lower()) if dot != -1 else None
+    name_rules, result = entry or _EXT_TABLE[None]
+
+    lowered = filename.lower()
+    for is_contains, patterns, rule_result in name_rules:
+        if is_contains:
+            for pattern in patterns:
+                if pattern in lowered:
+                    return rule_result
+        elif filename.startswith(patterns):
+            return rule_result
+    return result
+
+
+def _match_date_rule(filename):
+    """Walk the prefix trie and return the index of the highest-priority DATE_RULES entry, or None."""
+    best = None
+    node = _DATE_TRIE
+    for char in filename:
+        node = node.get(char)
+        if node is None:
+            break
+        index = node.get(None)
+        if index is not None and (best is None or index < best):
+            best = index
+    if (best is None or best > _CALL_RULE) and _CALL_RE.search(filename):
+        best = _CALL_RULE
+    return best
+
+
+@lru_cache(maxsize=8192)
+def _make_date(year, month, day):
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
 
 
-def check_type(raw_name, other=False):
-    """
-    Determine the file type category based on the filename.
+def _extract_date(filename):
+    rule = _match_date_rule(filename)
+    if rule is not None:
+        match = _DATE_REGEXES[rule](filename)
+        return _make_date(*match.groups()) if match else None
 
-    Returns a tuple of (main_category, sub_category) to build the folder structure.
-    """
-    raw_name_lower = raw_name.lower()
-
-    # Audio files
-    if raw_name.endswith((".opus", ".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac")):
-        return ("Audio", "Voice Notes" if raw_name.endswith(".opus") else None)
-    if any_in([")_", "call"], raw_name_lower):
-        return ("Audio", "Call Records")
-
-    # Video files
-    if raw_name.endswith((".mp4", ".MP4", ".mov", ".MOV", ".avi", ".AVI", ".mkv", ".webm", ".flv", ".3gp")):
-        return ("Videos", None)
-    if "record" in raw_name_lower or "screenrecord" in raw_name_lower:
-        return ("Videos", "Screen Records")
-
-    # Image files
-    if raw_name.endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".heic", ".JPG", ".JPEG", ".PNG")):
-        return ("Pictures", None)
-    # Updated screenshot detection to handle "Screenshot_" pattern
-    if raw_name.startswith(("Screenshot", "Screenshot_")):
-        return ("Pictures", "Screenshots")
-    if raw_name.startswith(("IMG_", "IMG-", "MVIMG_")) and not raw_name.endswith((".mp4", ".MP4", ".mov", ".MOV")):
-        return ("Pictures", None)
-
-    # Document files
-    if raw_name.startswith("DOC") or raw_name.endswith(
-        (
-            ".pdf",
-            ".csv",
-            ".doc",
-            ".docx",
-            ".xls",
-            ".xlsx",
-            ".ppt",
-            ".pptx",
-            ".txt",
-            ".rtf",
-            ".odt",
-            ".ods",
-            ".odp",
-            ".htm",
-            ".html",
-            ".xml",
-            ".json",
-        )
-    ):
-        return ("Documents", None)
-
-    # Archives
-    if raw_name.endswith((".zip", ".rar", ".7z", ".tar", ".gz", ".bz2")):
-        return ("Archives", None)
-
-    # Applications/Executables
-    if raw_name.endswith((".apk", ".exe", ".msi", ".dmg", ".app", ".sh", ".bat")):
-        return ("Applications", None)
-
-    # Default: Return "Other" only when truly unknown
-    return ("Other", None)
+    # Names like 1704067200.jpg are raw Unix timestamps
+    match = _RAW_TIMESTAMP_RE.match(filename)
+    if match:
+        try:
+            moment = datetime.fromtimestamp(int(match.group()), timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+        return datetime(moment.year, moment.month, moment.day)
+    return None
 
 
-def get_directory_path(filename):
+def classify(filename):
     """
-    Get the destination directory path for a file based on its timestamp.
-    Returns a list of directory names that form the path hierarchy.
+    Classify a filename in a single pass.
 
     Args:
         filename (str): The name of the file to process
 
     Returns:
-        list: A list of directory names forming the hierarchy, or None if path cannot be determined
+        Classification: (category, subcategory, date) where date is a naive datetime at
+        midnight, or None when the filename carries no recognisable date
     """
-    timestamp1 = ("IMG_", "VID_", "MVIMG_", "SAVE_", "MVIMG_")
-    timestamp2 = ("IMG-", "AUD-", "PTT-", "VID-", "null-", "DOC")
-    timestamp3 = ("2017-", "2018-", "2019-", "2020-", "2021-", "2022-", "2023-", "2024-")
-    timestamp4 = ("2017", "2018", "2019", "2020", "2021", "2022", "2023", "2024")
-    timestamp5 = ("Screenshot_",)
-    timestamp6 = ("Screenrecorder-",)
-    timestamp7 = ("IMG20",)
-    timestamp8 = (")_", "call_")
-    timestamp9 = ("WhatsApp ", "Screen Recording")
-    timestamp10 = ("Screenshot ",)
-    timestamp11 = ("VID",)
-
-    # Skip hidden files
-    if filename.startswith("."):
-        return None
+    main_category, sub_category = _match_type(filename)
+    # All screenshots go to the Screenshots subfolder, whatever their type
+    if filename.startswith("Screenshot"):
+        sub_category = "Screenshots"
+    return Classification(main_category, sub_category, _extract_date(filename))
 
-    # Skip text files (chat files) as requested
-    if filename.endswith(".txt"):
-        return None
 
-    try:
-        is_other = False
-        try:
-            is_raw = bool(datetime.fromtimestamp(float(filename.split(".")[0]), timezone.utc))
-        except:
-            is_raw = False
-
-        if (
-            not filename.startswith(
-                timestamp1
-                + timestamp2
-                + timestamp3
-                + timestamp4
-                + timestamp5
-                + timestamp6
-                + timestamp7
-                + timestamp9
-                + timestamp10
-                + timestamp11
-            )
-            and not any_in(timestamp8, filename)
-        ) and not is_raw:
-            is_other = True
-            timestamp = str(datetime.today().strftime(r"%Y%m%d"))
-        elif filename.startswith(timestamp1):
-            timestamp = filename.split("_")[1]
-        elif filename.startswith(timestamp2):
-            timestamp = filename.split("-")[1]
-        elif filename.startswith(timestamp3):
-            pre = str(filename.split(".")[0]).split("-")
-            timestamp = f"{pre[0]}{pre[1]}{pre[2]}"
-        elif filename.startswith(timestamp4):
-            timestamp = filename.split("_")[0]
-        elif filename.startswith(timestamp5):
-            if "com." in filename:
-                pre = str(filename.split("_")[1]).split("-")
-                timestamp = f"{pre[0]}{pre[1]}{pre[2]}"
-            else:
-                timestamp = str(filename.split("_")[1]).split("-", maxsplit=1)[0]
-        elif filename.startswith(timestamp6):
-            pre = filename.split("-")
-            timestamp = f"{pre[1]}{pre[2]}{pre[3]}"
-        elif filename.startswith(timestamp7):
-            timestamp = filename.split(".")[0][3:11]
-        elif any_in(timestamp8, filename):
-            timestamp = f"{filename.split('_')[1].split('.')[0]}"[:8]
-        elif filename.startswith(timestamp9):
-            timestamp = f"{filename.split(' ')[2].replace('-', '')}"
-        elif filename.startswith(timestamp10):
-            timestamp = f"{filename.split(' ')[1].replace('-', '')}"
-        elif filename.startswith(timestamp11):
-            timestamp = f"{filename[3:11]}"
-        elif is_raw:
-            timestamp = datetime.fromtimestamp(float(filename.split(".")[0]), timezone.utc).strftime("%Y%m%d")
-        else:
-            return None
+def classify_many(names):
+    """
+    Classify many filenames at once, e.g. a whole camera roll.
 
-        try:
-            date = datetime.strptime(timestamp, "%Y%m%d")
-        except:
-            timestamp = str(datetime.today().strftime(r"%Y%m%d"))
-            date = datetime.strptime(timestamp, "%Y%m%d")
+    Returns:
+        list: One Classification per name, in the same order
+    """
+    return [classify(name) for name in names]
 
-        # Get file type and create the folder hierarchy
-        main_category, sub_category = check_type(filename, is_other)
 
-        # Create path hierarchy with main category always first
-        path_hierarchy = [main_category]
+def check_type(raw_name):
+    """
+    Determine the file type category based on the filename.
 
-        # Add subcategory if it exists
-        if sub_category:
-            path_hierarchy.append(sub_category)
+    Returns a tuple of (main_category, sub_category) to build the folder structure.
+    """
+    return _match_type(raw_name)
 
-        # Force screenshot pattern detection regardless of timestamp extraction
-        # This ensures all screenshot files go to Screenshots subfolder
-        if filename.startswith(("Screenshot", "Screenshot_")):
-            if len(path_hierarchy) == 1:  # Only has main category
-                path_hierarchy.append("Screenshots")
-            elif path_hierarchy[1] != "Screenshots":  # Has wrong subcategory
-                path_hierarchy[1] = "Screenshots"
 
-        # Debug output
-        print(f"Final path hierarchy for {filename}: {path_hierarchy}")
+def get_directory_path(filename):
+    """
+    Get the destination directory path for a file based on its name.
+    Returns a list of directory names that form the path hierarchy.
+
+    Args:
+        filename (str): The name of the file to process
 
-        return path_hierarchy
+    Returns:
+        list: A list of directory names forming the hierarchy, or None if path cannot be determined
+    """
+    # Skip hidden files and text files (chat files)
+    if filename.startswith(".") or filename.endswith(".txt"):
+        return None
 
-    except:
-        # If anything fails, just use the file type categorization
-        main_category, sub_category = check_type(filename, True)
-        path_hierarchy = [main_category]
-        if sub_category:
-            path_hierarchy.append(sub_category)
-            # Add debug print
-            print(f"Exception handler - File: {filename}, Category: {main_category}, Subcategory: {sub_category}")
-        return path_hierarchy
+    classification = classify(filename)
+    path_hierarchy = [classification.category]
+    if classification.subcategory:
+        path_hierarchy.append(classification.subcategory)
+    return path_hierarchy
 
 
 def get_file_destination(filename, destination_dir=DESTINATION_DIR):
@@ -230,7 +246,7 @@ def get_file_destination(filename, destination_dir=DESTINATION_DIR):
 
 def extract_date_from_filename(filename):
     """
-    Extract the date from a filename using the same logic as get_directory_path.
+    Extract the date from a filename.
 
     Args:
         filename (str): The name of the file to process
@@ -238,78 +254,4 @@ def extract_date_from_filename(filename):
     Returns:
         datetime: The extracted date, or today's date if extraction fails
     """
-    timestamp1 = ("IMG_", "VID_", "MVIMG_", "SAVE_", "MVIMG_")
-    timestamp2 = ("IMG-", "AUD-", "PTT-", "VID-", "null-", "DOC")
-    timestamp3 = ("2017-", "2018-", "2019-", "2020-", "2021-", "2022-", "2023-", "2024-")
-    timestamp4 = ("2017", "2018", "2019", "2020", "2021", "2022", "2023", "2024")
-    timestamp5 = ("Screenshot_",)
-    timestamp6 = ("Screenrecorder-",)
-    timestamp7 = ("IMG20",)
-    timestamp8 = (")_", "call_")
-    timestamp9 = ("WhatsApp ", "Screen Recording")
-    timestamp10 = ("Screenshot ",)
-    timestamp11 = ("VID",)
-
-    try:
-        try:
-            is_raw = bool(datetime.fromtimestamp(float(filename.split(".")[0]), timezone.utc))
-        except:
-            is_raw = False
-
-        if (
-            not filename.startswith(
-                timestamp1
-                + timestamp2
-                + timestamp3
-                + timestamp4
-                + timestamp5
-                + timestamp6
-                + timestamp7
-                + timestamp9
-                + timestamp10
-                + timestamp11
-            )
-            and not any_in(timestamp8, filename)
-        ) and not is_raw:
-            timestamp = str(datetime.today().strftime(r"%Y%m%d"))
-        elif filename.startswith(timestamp1):
-            timestamp = filename.split("_")[1]
-        elif filename.startswith(timestamp2):
-            timestamp = filename.split("-")[1]
-        elif filename.startswith(timestamp3):
-            pre = str(filename.split(".")[0]).split("-")
-            timestamp = f"{pre[0]}{pre[1]}{pre[2]}"
-        elif filename.startswith(timestamp4):
-            timestamp = filename.split("_")[0]
-        elif filename.startswith(timestamp5):
-            if "com." in filename:
-                pre = str(filename.split("_")[1]).split("-")
-                timestamp = f"{pre[0]}{pre[1]}{pre[2]}"
-            else:
-                timestamp = str(filename.split("_")[1]).split("-", maxsplit=1)[0]
-        elif filename.startswith(timestamp6):
-            pre = filename.split("-")
-            timestamp = f"{pre[1]}{pre[2]}{pre[3]}"
-        elif filename.startswith(timestamp7):
-            timestamp = filename.split(".")[0][3:11]
-        elif any_in(timestamp8, filename):
-            timestamp = f"{filename.split('_')[1].split('.')[0]}"[:8]
-        elif filename.startswith(timestamp9):
-            timestamp = f"{filename.split(' ')[2].replace('-', '')}"
-        elif filename.startswith(timestamp10):
-            timestamp = f"{filename.split(' ')[1].replace('-', '')}"
-        elif filename.startswith(timestamp11):
-            timestamp = f"{filename[3:11]}"
-        elif is_raw:
-            timestamp = datetime.fromtimestamp(float(filename.split(".")[0]), timezone.utc).strftime("%Y%m%d")
-        else:
-            return datetime.today()
-
-        try:
-            date = datetime.strptime(timestamp, "%Y%m%d")
-            return date
-        except:
-            return datetime.today()
-
-    except:
-        return datetime.today()
+    return classify(filename).date or datetime.today()
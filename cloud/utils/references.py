@@ -0,0 +1,67 @@
+from collections import Counter, defaultdict
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from cloud.models import MediaFile
+from cloud.utils.hot_cache import hot_file_cache
+from cloud.utils.rollups import release_media_from_rollups
+
+UPDATE_BATCH_SIZE = 500  # Ids per UPDATE ... WHERE id IN (...)
+
+
+def _grouped_by_count(media_ids):
+    """Group ids by how often they occur, so each group needs a single UPDATE."""
+    by_count = defaultdict(list)
+    for media_id, count in Counter(media_ids).items():
+        if media_id is not None:
+            by_count[count].append(media_id)
+    for count, ids in by_count.items():
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            yield count, ids[start : start + UPDATE_BATCH_SIZE]
+
+
+def add_media_references(media_ids):
+    """
+    Record new CloudFiles pointing at existing MediaFiles.
+
+    Args:
+        media_ids: One entry per new reference; repeated ids are counted as often as they appear
+    """
+    for count, ids in _grouped_by_count(media_ids):
+        MediaFile.objects.filter(id__in=ids).update(ref_count=F("ref_count") + count)
+
+
+def release_media_references(media_ids):
+    """
+    Drop CloudFile references to MediaFiles, deleting the media nothing points at any more.
+
+    Media whose count reaches zero is soft-deleted; the blob on disk is left for cleanup.
+
+    Args:
+        media_ids: One entry per removed reference
+
+    Returns:
+        list: Ids of the MediaFiles that were deleted
+    """
+    media_ids = [media_id for media_id in media_ids if media_id is not None]
+    for count, ids in _grouped_by_count(media_ids):
+        MediaFile.objects.filter(id__in=ids).update(ref_count=Greatest(F("ref_count") - count, 0))
+
+    released = []
+    distinct_ids = list(set(media_ids))
+    now = timezone.now()
+    for start in range(0, len(distinct_ids), UPDATE_BATCH_SIZE):
+        orphans = MediaFile.objects.filter(
+            id__in=distinct_ids[start : start + UPDATE_BATCH_SIZE], ref_count=0, is_deleted=False
+        )
+        ids = list(orphans.values_list("id", flat=True))
+        release_media_from_rollups(ids)
+        MediaFile.objects.filter(id__in=ids).update(is_deleted=True, deleted_at=now)
+        released.extend(ids)
+
+    # Queryset updates bypass the post_save signal that normally evicts deleted media
+    for media_id in released:
+        hot_file_cache.invalidate(media_id)
+    return released
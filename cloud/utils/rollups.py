@@ -0,0 +1,158 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Greatest, TruncMonth
+from django.utils import timezone
+
+from api.models import Server
+from cloud.models import MediaFile, StorageRollup
+
+ROLLUP_BATCH_SIZE = 500
+ROLLUP_GROUP_BY = {
+    "owner": "owner_id",
+    "mime_family": "mime_family",
+    "folder": "folder",
+    "server": "server_id",
+    "month": "month",
+}
+
+
+def mime_family(mime_type):
+    return ((mime_type or "").split("/")[0] or "other")[:32]
+
+
+def _month(uploaded_at):
+    return timezone.localtime(uploaded_at).date().replace(day=1)
+
+
+def _grouped_media(media):
+    """Rollup deltas of a MediaFile queryset: {(owner, family, folder, server, month): [bytes, count]}."""
+    deltas = defaultdict(lambda: [0, 0])
+    rows = (
+        media.annotate(upload_month=TruncMonth("uploaded_at", output_field=DateField()))
+        .values_list("owner_id", "mime_type", "folder", "residing_server_id", "upload_month")
+        .annotate(total_bytes=Sum("size"), total_count=Count("id"))
+        .order_by()
+    )
+    for owner_id, mime_type, folder, server_id, month, total_bytes, total_count in rows:
+        # Several MIME types share a family, so rows are merged again here
+        delta = deltas[(owner_id, mime_family(mime_type), folder, server_id, month)]
+        delta[0] += total_bytes or 0
+        delta[1] += total_count
+    return deltas
+
+
+def _apply(deltas, sign):
+    """Add (sign 1) or subtract (sign -1) rollup deltas, and the same bytes on Server.total_space."""
+    server_bytes = defaultdict(int)
+    for (owner_id, family, folder, server_id, month), (size, count) in deltas.items():
+        size, count = sign * size, sign * count
+        server_bytes[server_id] += size
+        rollup = StorageRollup.objects.filter(
+            owner_id=owner_id, mime_family=family, folder=folder, server_id=server_id, month=month
+        )
+        if rollup.update(bytes=Greatest(F("bytes") + size, 0), count=Greatest(F("count") + count, 0)) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                StorageRollup.objects.create(
+                    owner_id=owner_id,
+                    mime_family=family,
+                    folder=folder,
+                    server_id=server_id,
+                    month=month,
+                    bytes=size,
+                    count=count,
+                )
+        except IntegrityError:
+            # Created by a concurrent ingest in the meantime
+            rollup.update(bytes=F("bytes") + size, count=F("count") + count)
+
+    for server_id, size in server_bytes.items():
+        if server_id and size:
+            Server.objects.filter(id=server_id).update(total_space=Greatest(F("total_space") + size, 0))
+
+
+def _media_key(media):
+    return media.owner_id, mime_family(media.mime_type), media.folder, media.residing_server_id, _month(media.uploaded_at)
+
+
+def add_media_to_rollups(media):
+    """Count a newly stored MediaFile."""
+    _apply({_media_key(media): [media.size, 1]}, 1)
+
+
+def subtract_media_from_rollups(media):
+    """Uncount one live MediaFile, e.g. right before it is deleted."""
+    _apply({_media_key(media): [media.size, 1]}, -1)
+
+
+def release_media_from_rollups(media_ids):
+    """
+    Take live media that is about to be deleted out of the rollups.
+
+    Call before the MediaFiles are marked deleted (or removed), in the same transaction.
+    """
+    media_ids = list(media_ids)
+    for start in range(0, len(media_ids), ROLLUP_BATCH_SIZE):
+        batch = MediaFile.objects.filter(id__in=media_ids[start : start + ROLLUP_BATCH_SIZE], is_deleted=False)
+        _apply(_grouped_media(batch), -1)
+
+
+def rebuild_rollups():
+    """
+    Recompute every rollup and Server.total_space from live MediaFiles, e.g. after the rollups
+    were lost or drifted. One grouped scan of MediaFile.
+
+    Returns:
+        dict: {"rollups": rows written, "bytes": total live bytes}
+    """
+    deltas = _grouped_media(MediaFile.objects.filter(is_deleted=False))
+    with transaction.atomic():
+        StorageRollup.objects.all().delete()
+        StorageRollup.objects.bulk_create(
+            [
+                StorageRollup(
+                    owner_id=owner_id,
+                    mime_family=family,
+                    folder=folder,
+                    server_id=server_id,
+                    month=month,
+                    bytes=size,
+                    count=count,
+                )
+                for (owner_id, family, folder, server_id, month), (size, count) in deltas.items()
+            ],
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+        server_bytes = defaultdict(int)
+        for (_, _, _, server_id, _), (size, _) in deltas.items():
+            server_bytes[server_id] += size
+        Server.objects.update(total_space=0)
+        for server_id, size in server_bytes.items():
+            if server_id:
+                Server.objects.filter(id=server_id).update(total_space=size)
+    return {"rollups": len(deltas), "bytes": sum(size for size, _ in deltas.values())}
+
+
+def storage_breakdown(group_by, **filters):
+    """
+    Bytes and counts summed over the rollups, grouped by one of ROLLUP_GROUP_BY.
+
+    Args:
+        group_by: "owner", "mime_family", "folder", "server" or "month"
+        **filters: StorageRollup filters, e.g. owner_id=1 or month__gte=date(2025, 1, 1)
+
+    Returns:
+        list: [{key, bytes, count}] largest first (oldest first for month)
+    """
+    field = ROLLUP_GROUP_BY[group_by]
+    rows = (
+        StorageRollup.objects.filter(**filters)
+        .values(field)
+        .annotate(total_bytes=Sum("bytes"), total_count=Sum("count"))
+        .filter(total_count__gt=0)
+        .order_by(field if group_by == "month" else "-total_bytes")
+    )
+    return [{"key": row[field], "bytes": row["total_bytes"], "count": row["total_count"]} for row in rows]
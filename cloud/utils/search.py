@@ -0,0 +1,108 @@
+import base64
+import json
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SQLITE_FTS_TABLE = "cloud_cloudfile_name_fts"
+SQLITE_FTS_TRIGGERS = {
+    "cloud_cloudfile_name_fts_insert": f"""CREATE TRIGGER cloud_cloudfile_name_fts_insert AFTER INSERT ON cloud_cloudfile BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE} (rowid, file_id, name) VALUES (new.rowid, new.id, new.name);
+    END""",
+    "cloud_cloudfile_name_fts_update": f"""CREATE TRIGGER cloud_cloudfile_name_fts_update AFTER UPDATE OF name ON cloud_cloudfile BEGIN
+        UPDATE {SQLITE_FTS_TABLE} SET name = new.name WHERE rowid = old.rowid;
+    END""",
+    "cloud_cloudfile_name_fts_delete": f"""CREATE TRIGGER cloud_cloudfile_name_fts_delete AFTER DELETE ON cloud_cloudfile BEGIN
+        DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.rowid;
+    END""",
+}
+# Trigram matching needs at least three characters, shorter terms are matched with a plain LIKE
+MIN_TRIGRAM_LENGTH = 3
+
+_sqlite_index_ready = {}
+
+
+def build_sqlite_name_index(db=None):
+    """
+    (Re)build the FTS5 trigram table over cloud_cloudfile.name and the triggers keeping it current.
+
+    Entries share the file row's rowid, so the triggers find them without a scan. Rebuilding is
+    needed whenever cloud_cloudfile was recreated (SQLite migrations copy tables, dropping
+    their triggers and renumbering rows).
+
+    Returns:
+        bool: False if this SQLite has no trigram tokenizer (before 3.34)
+    """
+    db = db or connection
+    try:
+        with transaction.atomic(using=db.alias), db.cursor() as cursor:
+            for trigger in SQLITE_FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5(file_id UNINDEXED, name, tokenize='trigram')"
+            )
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, file_id, name) SELECT rowid, id, name FROM cloud_cloudfile")
+            for statement in SQLITE_FTS_TRIGGERS.values():
+                cursor.execute(statement)
+    except OperationalError as e:
+        print(f"File name search index unavailable, falling back to LIKE scans: {e}")
+        return False
+    return True
+
+
+def _sqlite_name_index_available():
+    """Check once per process that the FTS table and all of its triggers exist, rebuilding them if not."""
+    ready = _sqlite_index_ready.get(connection.alias)
+    if ready is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = %s OR (type = 'trigger' AND tbl_name = 'cloud_cloudfile')",
+                [SQLITE_FTS_TABLE],
+            )
+            present = {row[0] for row in cursor.fetchall()}
+        ready = present >= {SQLITE_FTS_TABLE, *SQLITE_FTS_TRIGGERS} or build_sqlite_name_index()
+        _sqlite_index_ready[connection.alias] = ready
+    return ready
+
+
+def filter_by_name(files, query, prefix=False):
+    """
+    Restrict a CloudFile queryset to names containing (or, with prefix, starting with) query,
+    case-insensitively.
+
+    On Postgres icontains/istartswith are answered by the trigram GIN index on UPPER(name);
+    on SQLite the match runs against the FTS5 trigram table.
+    """
+    use_fts = (
+        connection.vendor == "sqlite"
+        and len(query) >= MIN_TRIGRAM_LENGTH
+        # LIKE wildcards in the query would need an ESCAPE clause, which FTS5 cannot index
+        and not any(char in query for char in "%_")
+        and _sqlite_name_index_available()
+    )
+    if not use_fts:
+        return files.filter(name__istartswith=query) if prefix else files.filter(name__icontains=query)
+
+    pattern = f"{query}%" if prefix else f"%{query}%"
+    return files.filter(id__in=RawSQL(f"SELECT file_id FROM {SQLITE_FTS_TABLE} WHERE name LIKE %s", [pattern]))
+
+
+def encode_search_cursor(name, file_id):
+    """Opaque keyset cursor for a search result ordered by (name, id)."""
+    return base64.urlsafe_b64encode(json.dumps([name, str(file_id)]).encode()).decode()
+
+
+def after_search_cursor(cursor):
+    """
+    Q matching the results after a cursor from encode_search_cursor().
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        name, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    return Q(name__gt=name) | Q(name=name, id__gt=file_id)
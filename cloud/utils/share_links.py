@@ -0,0 +1,130 @@
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.throttling import AnonRateThrottle
+
+from cloud.models import CloudFile, Directory, ShareLink
+from cloud.utils.changes import get_latest_cursor
+from cloud.utils.tree import get_directory_tree
+
+# How long a resolved token is trusted; bounds how long a revoked link keeps working on other workers
+LINK_CACHE_TIMEOUT = 10
+# Listings are keyed by the owner's change cursor, so they only expire to free memory
+LISTING_CACHE_TIMEOUT = 5 * 60
+
+
+class ShareLinkThrottle(AnonRateThrottle):
+    """Per-client rate limit on public link listings (DEFAULT_THROTTLE_RATES["share_link"])."""
+
+    scope = "share_link"
+
+
+class ShareLinkDownloadThrottle(AnonRateThrottle):
+    """Per-client rate limit on public link downloads (DEFAULT_THROTTLE_RATES["share_link_download"])."""
+
+    scope = "share_link_download"
+
+
+def _link_key(token):
+    return f"share_link_{token}"
+
+
+def get_share_link(token):
+    """
+    Resolve a link token, from the cache when possible. Unknown tokens are cached as well, so
+    guessing tokens does not reach the database either.
+
+    Returns:
+        dict: {owner_id, file_id, directory_id} of a valid, unexpired link, or None
+    """
+    link = cache.get(_link_key(token))
+    if link is None:
+        row = (
+            ShareLink.objects.filter(token=token)
+            .values("owner_id", "file_id", "directory_id", "expires_at")
+            .first()
+        )
+        link = row or {}
+        cache.set(_link_key(token), link, timeout=LINK_CACHE_TIMEOUT)
+    if not link or (link["expires_at"] and link["expires_at"] <= timezone.now()):
+        return None
+    return link
+
+
+def invalidate_share_link(token):
+    cache.delete(_link_key(token))
+
+
+def link_directory_path(link, directory_id):
+    """
+    Directories from the link's root down to directory_id, from the owner's cached tree.
+
+    Returns:
+        list: [(id, name)] root first, or None if directory_id is not inside the shared directory
+    """
+    if not link["directory_id"]:
+        return None
+    _, tree = get_directory_tree(link["owner_id"])
+    root_id = str(link["directory_id"])
+    path = []
+    current = str(directory_id)
+    while current in tree["nodes"]:
+        parent_id, name = tree["nodes"][current]
+        path.insert(0, (current, name))
+        if current == root_id:
+            return path
+        current = parent_id
+    return None
+
+
+def get_public_listing(token, link, directory_id=None):
+    """
+    Read-only listing of a shared file, or of a directory inside a shared directory.
+
+    Cached under the token, directory and the owner's change cursor, which moves with every
+    change to the owner's files and directories, so a cached listing is never out of date
+    for longer than the cursor cache.
+
+    Returns:
+        dict: {directory, breadcrumbs, items}, or None if directory_id is outside the link or the
+        shared file was deleted
+    """
+    if link["file_id"]:
+        directory_id = None
+    version = get_latest_cursor(link["owner_id"])
+    key = f"share_listing_{token}_{directory_id or ''}_{version}"
+    listing = cache.get(key)
+    if listing is not None:
+        return listing
+
+    if link["file_id"]:
+        files = CloudFile.objects.filter(id=link["file_id"], is_deleted=False, pending_upload=False)
+        directory, breadcrumbs, directories = None, [], []
+    else:
+        path = link_directory_path(link, directory_id or link["directory_id"])
+        if path is None:
+            return None
+        directory = {"id": path[-1][0], "name": path[-1][1]}
+        breadcrumbs = [{"id": path_id, "name": name} for path_id, name in path]
+        files = CloudFile.objects.filter(directory_id=directory["id"], is_deleted=False, pending_upload=False)
+        directories = Directory.objects.filter(parent_id=directory["id"]).order_by("name").values_list("id", "name")
+
+    items = [{"type": "directory", "id": str(item_id), "name": name} for item_id, name in directories]
+    for file_id, name, size, mime_type, modified_at in files.order_by("name").values_list(
+        "id", "name", "media__size", "media__mime_type", "modified_at"
+    ):
+        items.append(
+            {
+                "type": "file",
+                "id": str(file_id),
+                "name": name,
+                "size": size,
+                "mime_type": mime_type,
+                "modified_at": modified_at.isoformat(),
+                "download_url": f"/api/cloud/public/{token}/files/{file_id}/",
+            }
+        )
+    if link["file_id"] and not items:
+        return None
+    listing = {"directory": directory, "breadcrumbs": breadcrumbs, "items": items}
+    cache.set(key, listing, timeout=LISTING_CACHE_TIMEOUT)
+    return listing
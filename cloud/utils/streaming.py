@@ -0,0 +1,44 @@
+import asyncio
+
+from django.conf import settings
+
+from cloud.utils.media import iter_media_content
+
+
+def _next_block(iterator, block_size):
+    """Pull chunks from a sync iterator until block_size bytes are gathered; b"" once exhausted."""
+    parts = []
+    size = 0
+    for chunk in iterator:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= block_size:
+            break
+    return b"".join(parts)
+
+
+async def aiter_blocks(iterator, block_size=None):
+    """
+    Async iterator over a sync iterator of bytes, for StreamingHttpResponse under ASGI.
+
+    Every block of at least block_size bytes (CLOUD_STREAM_BLOCK_SIZE) is read, decrypted and
+    decompressed in one worker thread call, so the thread is only borrowed for the disk and
+    crypto work. Waiting for a slow client happens on the event loop and holds no thread.
+    """
+    block_size = block_size or settings.CLOUD_STREAM_BLOCK_SIZE
+    try:
+        while True:
+            block = await asyncio.to_thread(_next_block, iterator, block_size)
+            if not block:
+                break
+            yield block
+    finally:
+        # Closes the file of a generator abandoned by a disconnecting client
+        close = getattr(iterator, "close", None)
+        if close:
+            await asyncio.to_thread(close)
+
+
+def aiter_media_content(media, start=0, end=None):
+    """iter_media_content() as an async iterator of large blocks."""
+    return aiter_blocks(iter_media_content(media, start, end))
@@ -0,0 +1,113 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Greatest
+
+from cloud.models import CloudFile, FileTag, Tag
+
+TAG_BATCH_SIZE = 500  # Ids per query or UPDATE ... WHERE id IN (...)
+
+
+def _adjust_file_counts(tag_ids, sign):
+    """Add (sign 1) or subtract (sign -1) one per occurrence of a tag id, one UPDATE per distinct count."""
+    by_count = defaultdict(list)
+    for tag_id, count in Counter(tag_ids).items():
+        by_count[count].append(tag_id)
+    for count, ids in by_count.items():
+        for start in range(0, len(ids), TAG_BATCH_SIZE):
+            batch = Tag.objects.filter(id__in=ids[start : start + TAG_BATCH_SIZE])
+            if sign > 0:
+                batch.update(file_count=F("file_count") + count)
+            else:
+                batch.update(file_count=Greatest(F("file_count") - count, 0))
+
+
+def _existing_pairs(file_ids, tag_ids):
+    pairs = set()
+    for start in range(0, len(file_ids), TAG_BATCH_SIZE):
+        pairs.update(
+            FileTag.objects.filter(file_id__in=file_ids[start : start + TAG_BATCH_SIZE], tag_id__in=tag_ids).values_list(
+                "file_id", "tag_id"
+            )
+        )
+    return pairs
+
+
+def tag_files(file_ids, tag_ids):
+    """
+    Tag every file with every tag, skipping pairs that already exist.
+
+    The callers check ownership; file_ids must be live files. The tag rows are locked, so
+    concurrent requests on the same tags cannot both count the same new pair.
+
+    Returns:
+        int: Number of FileTags created
+    """
+    file_ids, tag_ids = list(set(file_ids)), list(set(tag_ids))
+    with transaction.atomic():
+        list(Tag.objects.select_for_update().filter(id__in=tag_ids).order_by("id").values_list("id", flat=True))
+        existing = _existing_pairs(file_ids, tag_ids)
+        new_tags = [
+            FileTag(file_id=file_id, tag_id=tag_id)
+            for file_id in file_ids
+            for tag_id in tag_ids
+            if (file_id, tag_id) not in existing
+        ]
+        FileTag.objects.bulk_create(new_tags, batch_size=TAG_BATCH_SIZE)
+        _adjust_file_counts([file_tag.tag_id for file_tag in new_tags], 1)
+    return len(new_tags)
+
+
+def untag_files(file_ids, tag_ids):
+    """
+    Remove every tag from every file.
+
+    Returns:
+        int: Number of FileTags deleted
+    """
+    file_ids, tag_ids = list(set(file_ids)), list(set(tag_ids))
+    with transaction.atomic():
+        list(Tag.objects.select_for_update().filter(id__in=tag_ids).order_by("id").values_list("id", flat=True))
+        deleted = 0
+        removed = []
+        for start in range(0, len(file_ids), TAG_BATCH_SIZE):
+            batch = FileTag.objects.filter(file_id__in=file_ids[start : start + TAG_BATCH_SIZE], tag_id__in=tag_ids)
+            rows = list(batch.values_list("id", "tag_id", "file__is_deleted"))
+            FileTag.objects.filter(id__in=[file_tag_id for file_tag_id, _, _ in rows]).delete()
+            deleted += len(rows)
+            # Deleted files were already taken out of the counts
+            removed.extend(tag_id for _, tag_id, is_deleted in rows if not is_deleted)
+        _adjust_file_counts(removed, -1)
+    return deleted
+
+
+def release_file_tags(files):
+    """
+    Take live files that are about to be deleted out of their tags' file counts.
+
+    Call inside the transaction that deletes them. The FileTags themselves stay with soft-deleted
+    files and cascade with hard-deleted ones.
+
+    Args:
+        files: CloudFile queryset of the files, or a list of their ids
+    """
+    if not isinstance(files, list):
+        files = files.values("id")
+    _adjust_file_counts(
+        list(FileTag.objects.filter(file_id__in=files, file__is_deleted=False).values_list("tag_id", flat=True)), -1
+    )
+
+
+def with_tags(files):
+    """CloudFile queryset with the tags of every file fetched in one extra query, for TaggedCloudFileSerializer."""
+    return files.prefetch_related(
+        Prefetch("tags", queryset=FileTag.objects.select_related("tag").order_by("tag__name"))
+    )
+
+
+def owned_live_files(user, file_ids):
+    """Ids of the given files that belong to the user and are not deleted."""
+    return list(
+        CloudFile.objects.filter(id__in=file_ids, owner=user, is_deleted=False).values_list("id", flat=True)
+    )
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+
+from cloud.models import Directory
+from cloud.utils.changes import get_tree_version
+
+TREE_CACHE_TIMEOUT = 60 * 60  # Entries are keyed by tree version, so they only expire to free memory
+
+
+def get_directory_tree(owner_id):
+    """
+    A user's whole directory hierarchy as an adjacency map, loaded in one query.
+
+    Cached under the user's tree version, which every directory create, rename, move and
+    delete moves forward, so a cached tree is never served after it changed.
+
+    Returns:
+        tuple: (version, tree) where tree is {"nodes": {id: (parent_id, name)},
+            "children": {parent_id: [child ids sorted by name]}}, ids as strings, None for root
+    """
+    version = get_tree_version(owner_id)
+    key = f"cloud_tree_{owner_id}_{version}"
+    tree = cache.get(key)
+    if tree is None:
+        nodes = {}
+        children = {}
+        rows = Directory.objects.filter(owner_id=owner_id).order_by("name").values_list("id", "parent_id", "name")
+        for directory_id, parent_id, name in rows:
+            directory_id = str(directory_id)
+            parent_id = str(parent_id) if parent_id else None
+            nodes[directory_id] = (parent_id, name)
+            children.setdefault(parent_id, []).append(directory_id)
+        tree = {"nodes": nodes, "children": children}
+        cache.set(key, tree, timeout=TREE_CACHE_TIMEOUT)
+    return version, tree
+
+
+def nest_tree(tree, root_id=None, depth=None):
+    """
+    Nested {id, name, has_children, children} nodes below root_id (None for the top level).
+
+    Args:
+        depth: Number of levels to expand (None for all); nodes on the last level get
+            has_children but no children list
+    """
+    children = tree["children"]
+    nodes = tree["nodes"]
+
+    def node(directory_id):
+        return {"id": directory_id, "name": nodes[directory_id][1], "has_children": directory_id in children}
+
+    top = [node(child_id) for child_id in children.get(root_id, ())]
+    # Iterative walk, a deeply nested tree must not hit the recursion limit
+    pending = [(item, 1) for item in top]
+    while pending:
+        item, level = pending.pop()
+        if not item["has_children"] or (depth is not None and level >= depth):
+            continue
+        item["children"] = [node(child_id) for child_id in children[item["id"]]]
+        pending.extend((child, level + 1) for child in item["children"])
+    return top
@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import User
+from cloud.models import CloudFile, FileVersion
+from cloud.utils.changes import file_change, record_changes
+from cloud.utils.references import add_media_references, release_media_references
+
+PRUNE_BATCH_SIZE = 1000
+
+
+def _lock_owner(owner_id):
+    # Content changes of one user are serialised on their User row, which record_changes() locks
+    # as well; taking it first keeps the lock order user, then file, everywhere
+    list(User.objects.select_for_update().filter(id=owner_id).values_list("id", flat=True))
+
+
+def _latest_version_number(file):
+    latest = (
+        FileVersion.objects.filter(file=file).order_by("-version_number").values_list("version_number", flat=True).first()
+    )
+    return latest or 0
+
+
+def _trim_versions(file):
+    """Drop the versions of a file beyond CLOUD_VERSION_MAX_COUNT, oldest first."""
+    max_count = settings.CLOUD_VERSION_MAX_COUNT
+    if max_count <= 0:
+        return
+    stale = list(
+        FileVersion.objects.filter(file=file).order_by("-version_number").values_list("id", "media_id")[max_count:]
+    )
+    if stale:
+        FileVersion.objects.filter(id__in=[version_id for version_id, _ in stale]).delete()
+        release_media_references([media_id for _, media_id in stale])
+
+
+def set_file_content(file, media_file, reuse_media=False):
+    """
+    Make media_file the current content of a file, keeping the old content as a version.
+
+    Content that matches the current version changes nothing, and content that matches an
+    earlier version points back at that version's MediaFile, so re-uploads cost no storage.
+
+    Args:
+        file: The CloudFile to update
+        media_file: MediaFile with the new content
+        reuse_media: True when media_file already has a reference of its own (e.g. restoring a
+            version); otherwise its creation reference is handed over to the file, or released
+            when it turns out to be a duplicate
+
+    Returns:
+        CloudFile: The updated file
+    """
+    with transaction.atomic():
+        _lock_owner(file.owner_id)
+        file = CloudFile.objects.select_for_update().select_related("media").get(id=file.id)
+        media_id, new_hash = media_file.id, media_file.media_hash
+
+        if file.media_id == media_id or (new_hash and file.media and file.media.media_hash == new_hash):
+            # Unchanged content
+            if not reuse_media and file.media_id != media_id:
+                release_media_references([media_id])
+            return file
+
+        if new_hash and not reuse_media:
+            earlier_media_id = (
+                FileVersion.objects.filter(file=file, media__media_hash=new_hash)
+                .values_list("media_id", flat=True)
+                .first()
+            )
+            if earlier_media_id:
+                release_media_references([media_id])
+                media_id, reuse_media = earlier_media_id, True
+
+        # The current content becomes a version, taking over the file's reference to it
+        if file.media_id:
+            FileVersion.objects.create(file=file, media_id=file.media_id, version_number=_latest_version_number(file) + 1)
+
+        if reuse_media:
+            add_media_references([media_id])
+        file.media_id = media_id
+        file.save()
+        _trim_versions(file)
+        record_changes([file_change("update", file)])
+    return file
+
+
+def save_uploaded_file(owner, name, directory, media_file, versioning=True):
+    """
+    Attach a freshly ingested MediaFile to the user's tree.
+
+    With versioning, an upload onto the name of an existing file becomes that file's new
+    version instead of a second file with the same name.
+
+    Returns:
+        tuple: (CloudFile, created)
+    """
+    with transaction.atomic():
+        # Two concurrent uploads of one name must not both miss the existing file
+        _lock_owner(owner.id)
+        if versioning:
+            existing = CloudFile.objects.filter(
+                name=name, directory=directory, owner=owner, is_deleted=False, pending_upload=False
+            ).first()
+            if existing:
+                return set_file_content(existing, media_file), False
+        cloud_file = CloudFile.objects.create(name=name, owner=owner, directory=directory, media=media_file)
+        record_changes([file_change("create", cloud_file)])
+    return cloud_file, True
+
+
+def prune_versions(now=None, dry_run=False):
+    """
+    Apply the age-based retention policy and drop the versions of deleted files.
+
+    Works in batches of PRUNE_BATCH_SIZE; each batch is deleted and its media references
+    released in one transaction.
+
+    Returns:
+        int: Number of versions removed (or that would be removed with dry_run)
+    """
+    now = now or timezone.now()
+    condition = Q(file__is_deleted=True)
+    if settings.CLOUD_VERSION_MAX_AGE_DAYS > 0:
+        condition |= Q(created_at__lt=now - timedelta(days=settings.CLOUD_VERSION_MAX_AGE_DAYS))
+    expired = FileVersion.objects.filter(condition)
+
+    if dry_run:
+        return expired.count()
+
+    removed = 0
+    while True:
+        batch = list(expired.order_by("id").values_list("id", "media_id")[:PRUNE_BATCH_SIZE])
+        if not batch:
+            return removed
+        with transaction.atomic():
+            FileVersion.objects.filter(id__in=[version_id for version_id, _ in batch]).delete()
+            release_media_references([media_id for _, media_id in batch])
+        removed += len(batch)
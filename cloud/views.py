@@ -1,17 +1,213 @@
+import json
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timedelta
 from pathlib import Path
+from urllib.parse import quote
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.cache import cache
-from django.http import FileResponse, HttpResponse
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from accounts.models import User
+from cloud.models import (
+    ChangeEvent,
+    CloudFile,
+    Directory,
+    FileTag,
+    FileVersion,
+    MediaFile,
+    OrganizeJob,
+    SharedItem,
+    ShareLink,
+    Tag,
+)
+from cloud.serializers import (
+    BreadcrumbSerializer,
+    CloudFileSerializer,
+    DirectorySerializer,
+    FileVersionSerializer,
+    OrganizeJobSerializer,
+    ShareLinkSerializer,
+    TaggedCloudFileSerializer,
+    TagSerializer,
+)
+from cloud.utils.acl import can_access_media, get_directory_permission, inherit_access, move_access, sync_access
+from cloud.utils.admission import upload_admission, upload_scheduler
+from cloud.utils.avatars import (
+    AVATAR_CACHE_CONTROL,
+    AVATAR_CONTENT_TYPE,
+    DEFAULT_AVATAR_SIZE,
+    avatar_path,
+    create_avatar_renditions,
+    rendition_size,
+)
+from cloud.utils.changes import (
+    directory_change,
+    file_change,
+    get_latest_cursor,
+    record_changes,
+    wait_for_changes,
+)
+from cloud.utils.chunk_store import (
+    CHUNK_HASH_RE,
+    ChunkHashMismatch,
+    ChunkManifestFile,
+    chunk_path,
+    find_missing_chunks,
+    write_chunk,
+)
+from cloud.utils.hot_cache import hot_file_cache
+from cloud.utils.media import MAX_FILE_SIZE, create_media_file, iter_media_content
+from cloud.utils.organize_jobs import start_organize_job
+from cloud.utils.references import add_media_references, release_media_references
+from cloud.utils.rollups import storage_breakdown
+from cloud.utils.search import after_search_cursor, encode_search_cursor, filter_by_name
+from cloud.utils.share_links import (
+    ShareLinkDownloadThrottle,
+    ShareLinkThrottle,
+    get_public_listing,
+    get_share_link,
+    invalidate_share_link,
+    link_directory_path,
+)
+from cloud.utils.streaming import aiter_media_content
+from cloud.utils.tags import owned_live_files, release_file_tags, tag_files, untag_files, with_tags
+from cloud.utils.tree import get_directory_tree, nest_tree
+from cloud.utils.versions import save_uploaded_file, set_file_content
+
+
+def _parse_range(range_header, size):
+    """
+    Parse a single "bytes=" Range header.
+
+    Returns:
+        tuple: (start, end) inclusive offsets, or None when the header is absent or not a
+        single byte range (the whole file is served then)
+
+    Raises:
+        ValueError: If the range cannot be satisfied for a file of this size
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range {range_header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+
+def _media_response(request, media, stored_file, asynchronous=False):
+    """
+    Build the HTTP response carrying a media file's original bytes, honouring Range requests.
+
+    Raw files are handed to FileResponse (sendfile-capable); encrypted and compressed
+    files are decrypted/decompressed while streaming. With asynchronous, every streamed body
+    is an async iterator reading large blocks in worker threads, for the async views.
+    """
+    content = aiter_media_content if asynchronous else iter_media_content
+    content_type = media.mime_type or "application/octet-stream"
+    is_raw = not media.is_encrypted and not media.compression
+
+    if is_raw and settings.CLOUD_SENDFILE_HEADER:
+        # Let the front proxy sendfile() the blob; it also takes care of Range requests
+        relative_path = stored_file.relative_to(settings.MEDIA_ROOT).as_posix()
+        response = HttpResponse(content_type=content_type)
+        response[settings.CLOUD_SENDFILE_HEADER] = quote(settings.CLOUD_SENDFILE_PREFIX + relative_path)
+        if media.is_client_encrypted:
+            response["X-Client-Encrypted"] = "true"
+        return response
+
+    try:
+        byte_range = _parse_range(request.headers.get("Range"), media.size)
+    except ValueError:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response["Content-Range"] = f"bytes */{media.size}"
+        return response
+
+    # Small encrypted/compressed files are served from the decrypted payload cache
+    if (media.is_encrypted or media.compression) and media.size <= hot_file_cache.max_item_size:
+        data = hot_file_cache.get(media.id, media.media_hash)
+        if data is None:
+            data = b"".join(iter_media_content(media))
+            hot_file_cache.put(media.id, media.media_hash, data)
+        if byte_range is None:
+            response = HttpResponse(data, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = HttpResponse(data[start : end + 1], content_type=content_type, status=status.HTTP_206_PARTIAL_CONTENT)
+            response["Content-Range"] = f"bytes {start}-{end}/{media.size}"
+    elif byte_range is None:
+        if is_raw and not asynchronous:
+            # Return file directly
+            response = FileResponse(open(stored_file, "rb"), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(content(media), content_type=content_type)
+            response["Content-Length"] = str(media.size)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            content(media, start, end),
+            content_type=content_type,
+            status=status.HTTP_206_PARTIAL_CONTENT,
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{media.size}"
 
-from cloud.models import CloudFile, Directory, MediaFile
-from cloud.serializers import BreadcrumbSerializer, CloudFileSerializer, DirectorySerializer
-from cloud.utils.encryption import decrypt_file_memory
-from cloud.utils.media import create_media_file
+    response["Accept-Ranges"] = "bytes"
+    if media.is_client_encrypted:
+        # Opaque ciphertext: the client decrypts with the key_metadata from the file listing
+        response["X-Client-Encrypted"] = "true"
+    return response
+
+
+def _parse_client_encryption(data):
+    """
+    Read the client-side encryption parameters of an upload request.
+
+    Returns:
+        tuple: (key_metadata dict or None, error Response or None)
+    """
+    if str(data.get("client_encrypted", "false")).lower() != "true":
+        return None, None
+
+    key_metadata = data.get("key_metadata")
+    if isinstance(key_metadata, str):
+        try:
+            key_metadata = json.loads(key_metadata)
+        except ValueError:
+            key_metadata = None
+    if not isinstance(key_metadata, dict) or not key_metadata:
+        return None, Response(
+            {"error": "key_metadata must be a JSON object for client-encrypted uploads"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return key_metadata, None
 
 
 @api_view(["GET"])
@@ -19,7 +215,7 @@ from cloud.utils.media import create_media_file
 def explorer_view(request):
     """
     API endpoint to browse directories and files.
-    Returns directories, files, breadcrumbs, and current directory info.
+    Returns directories, files (with their tags), breadcrumbs, and current directory info.
     Query params:
         - parent: UUID of parent directory (optional, if not provided returns root level)
     """
@@ -63,7 +259,7 @@ def explorer_view(request):
 
     # Serialize data
     directories_data = DirectorySerializer(directories, many=True).data
-    files_data = CloudFileSerializer(files, many=True).data
+    files_data = TaggedCloudFileSerializer(with_tags(files.select_related("media")), many=True).data
 
     response_data = {
         "directories": directories_data,
@@ -75,6 +271,50 @@ def explorer_view(request):
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def tree_view(request):
+    """
+    API endpoint for the whole directory hierarchy, e.g. for a sidebar.
+    Query params:
+        - root: UUID of the directory to list below (optional, defaults to the top level)
+        - depth: Number of levels to include (optional, defaults to all)
+        - layout: "nested" (default) or "flat" for {id, parent, name} rows
+
+    Returns:
+        - version: Tree version, changes whenever a directory is created, renamed, moved or deleted
+        - directories: Nested {id, name, has_children, children} nodes, or flat rows
+    """
+    root_id = request.GET.get("root") or None
+    layout = request.GET.get("layout", "nested")
+    try:
+        depth = int(request.GET["depth"]) if request.GET.get("depth") else None
+    except ValueError:
+        return Response({"error": "depth must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    if depth is not None and depth < 1:
+        return Response({"error": "depth must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+    if layout not in ("nested", "flat"):
+        return Response({"error": "layout must be nested or flat"}, status=status.HTTP_400_BAD_REQUEST)
+
+    version, tree = get_directory_tree(request.user.id)
+    if root_id and root_id not in tree["nodes"]:
+        return Response({"error": "Directory not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+
+    directories = nest_tree(tree, root_id, depth)
+    if layout == "flat":
+        rows = []
+        pending = [(directories, root_id)]
+        while pending:
+            items, parent_id = pending.pop()
+            for item in items:
+                rows.append({"id": item["id"], "parent": parent_id, "name": item["name"]})
+                if "children" in item:
+                    pending.append((item["children"], item["id"]))
+        directories = rows
+
+    return Response({"version": version, "directories": directories}, status=status.HTTP_200_OK)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_directory(request):
@@ -126,11 +366,15 @@ def create_directory(request):
 
     try:
         # Create directory
-        new_directory = Directory.objects.create(
-            name=directory_name,
-            owner=user,
-            parent=parent_directory
-        )
+        with transaction.atomic():
+            new_directory = Directory.objects.create(
+                name=directory_name,
+                owner=user,
+                parent=parent_directory
+            )
+            record_changes([directory_change("create", new_directory)])
+            # Inherit the shares of the parent directory
+            inherit_access(user.id, [new_directory])
 
         # Return success response
         serializer = DirectorySerializer(new_directory)
@@ -152,6 +396,7 @@ def create_directory(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@upload_admission
 def upload_file(request):
     """
     Upload a single file with optional encryption.
@@ -160,6 +405,9 @@ def upload_file(request):
         - encrypt: Boolean (true/false) - whether to encrypt the file (default: false)
         - directory: UUID of parent directory (optional)
         - name: Custom name for the file (optional, defaults to filename)
+        - client_encrypted: Boolean - the file is already encrypted by the client (optional)
+        - key_metadata: JSON object with the client's wrapped key/IV, required when client_encrypted
+        - versioning: Boolean - an upload onto an existing file name becomes its new version (default: true)
 
     Returns:
         - CloudFile data with upload status
@@ -175,6 +423,10 @@ def upload_file(request):
     should_encrypt = request.POST.get("encrypt", "false").lower() == "true"
     directory_id = request.POST.get("directory", None)
     custom_name = request.POST.get("name", uploaded_file.name)
+    versioning = request.POST.get("versioning", "true").lower() == "true"
+    key_metadata, error_response = _parse_client_encryption(request.POST)
+    if error_response:
+        return error_response
 
     # Validate directory if provided
     parent_directory = None
@@ -186,15 +438,25 @@ def upload_file(request):
 
     try:
 
-        media_file = create_media_file(file=uploaded_file, folder="cloud", owner=user, should_encrypt=should_encrypt)
+        media_file = create_media_file(
+            file=uploaded_file,
+            folder="cloud",
+            owner=user,
+            should_encrypt=should_encrypt,
+            client_key_metadata=key_metadata,
+        )
 
-        # Create CloudFile entry
-        cloud_file = CloudFile.objects.create(name=custom_name, owner=user, directory=parent_directory, media=media_file)
+        # Create CloudFile entry, or add a version to the file already using this name
+        cloud_file, created = save_uploaded_file(user, custom_name, parent_directory, media_file, versioning)
 
         # Return success response
         serializer = CloudFileSerializer(cloud_file)
         return Response(
-            {"success": True, "message": "File uploaded successfully", "file": serializer.data},
+            {
+                "success": True,
+                "message": "File uploaded successfully" if created else "New version uploaded successfully",
+                "file": serializer.data,
+            },
             status=status.HTTP_201_CREATED,
         )
 
@@ -213,144 +475,107 @@ def upload_file(request):
 
 
 @api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def preview_file(request, file_id):
+@authentication_classes([])
+@permission_classes([AllowAny])
+def avatar_view(request, media_id):
     """
-    Preview a media file (with decryption if needed).
-    Returns the file content for preview purposes.
-    Works directly with MediaFile ID.
-    """
-    user = request.user
+    Square avatar rendition, public like the avatars in user listings (User.avatar_url).
+    Query params:
+        - size: Width in pixels, served from the nearest of 64, 128, 256 (default 128)
 
+    Renditions are made when the avatar is set, so a request is a file read without queries;
+    avatars from before renditions existed get them on first request.
+    """
     try:
-        media = MediaFile.objects.get(id=file_id, is_deleted=False)
+        size = rendition_size(int(request.GET.get("size", DEFAULT_AVATAR_SIZE)))
+    except ValueError:
+        return Response({"error": "size must be a number"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Debug information
-        debug_info = {
-            "file_exists": True,
-            "media_id": str(media.id),
-            "media_filename": media.filename,
-            "media_owner_id": str(media.owner.id),
-            "media_owner_email": media.owner.email,
-            "current_user_id": str(user.id),
-            "current_user_email": user.email,
-            "is_owner": media.owner == user,
-            "media_privacy": media.privacy,
-            "media_is_encrypted": media.is_encrypted,
-            "is_deleted": media.is_deleted,
-        }
+    path = avatar_path(media_id, size)
+    if not path.exists():
+        media = MediaFile.objects.filter(id=media_id, user_avatar__isnull=False, is_deleted=False).first()
+        if media is None or not create_avatar_renditions(media):
+            return Response({"error": "Avatar not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Check access: owner or public media file
-        if media.owner != user and media.privacy != "public":
-            debug_info["access_denied_reason"] = "Not owner and file is not public"
-            return Response(
-                {"error": "File not found or access denied", "debug": debug_info}, status=status.HTTP_404_NOT_FOUND
-            )
+    response = FileResponse(open(path, "rb"), content_type=AVATAR_CONTENT_TYPE)
+    response["Cache-Control"] = AVATAR_CACHE_CONTROL
+    return response
 
-        debug_info["access_granted"] = True
 
-    except MediaFile.DoesNotExist:
-        return Response(
-            {
-                "error": "File not found or access denied",
-                "debug": {
-                    "file_exists": False,
-                    "file_id": file_id,
-                    "current_user_id": str(user.id),
-                    "current_user_email": user.email,
-                },
-            },
-            status=status.HTTP_404_NOT_FOUND,
-        )
-    file_path = Path(settings.MEDIA_ROOT) / media.folder / str(media.id)
+def _authenticate(request):
+    """
+    The user of a plain Django view, which DRF does not wrap, authenticated like the API
+    views with DEFAULT_AUTHENTICATION_CLASSES. None if no credentials are valid.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user.is_authenticated else None
 
-    if media.is_encrypted:
-        encrypted_file = file_path / "encrypted"
-    else:
-        encrypted_file = file_path / media.filename
 
-    if not encrypted_file.exists():
-        return Response({"error": "Physical file not found"}, status=status.HTTP_404_NOT_FOUND)
+def _serve_media(request, file_id, disposition):
+    """
+    Shared body of the async preview and download views, run in one worker thread call.
 
-    try:
-        if media.is_encrypted:
-            # Decrypt file in memory for preview
-            with open(encrypted_file, "rb") as f:
-                encrypted_data = f.read()
+    Only the checks and the response setup happen here; the body is streamed from the event
+    loop with large blocking reads offloaded, so a slow client holds no thread.
+    """
+    user = _authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED
+        )
 
-            decrypted_data = decrypt_file_memory(encrypted_data, bytes(media.encryption_key), bytes(media.encryption_nonce))
+    try:
+        media = MediaFile.objects.get(id=file_id, is_deleted=False)
+    except MediaFile.DoesNotExist:
+        return JsonResponse({"error": "File not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+    # Check access: owner, public media file, or shared with the user
+    if not can_access_media(user, media):
+        return JsonResponse({"error": "File not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
 
-            # Return decrypted content
-            response = HttpResponse(decrypted_data, content_type=media.mime_type or "application/octet-stream")
-        else:
-            # Return file directly
-            response = FileResponse(open(encrypted_file, "rb"), content_type=media.mime_type or "application/octet-stream")
+    encrypted_file = media.file_path()
+    if not encrypted_file.exists():
+        return JsonResponse({"error": "Physical file not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        response["Content-Disposition"] = f'inline; filename="{media.filename}"'
+    try:
+        response = _media_response(request, media, encrypted_file, asynchronous=True)
+        response["Content-Disposition"] = f'{disposition}; filename="{media.filename}"'
 
         # Update accessed_at timestamp
-        media.accessed_at = None  # Django will set auto_now field
-        media.save()
+        media.save(update_fields=["accessed_at"])
 
         return response
 
     except Exception as e:
-        return Response({"error": f"Failed to preview file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        action = "preview" if disposition == "inline" else "download"
+        return JsonResponse({"error": f"Failed to {action} file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def download_file(request, file_id):
+@require_GET
+async def preview_file(request, file_id):
     """
-    Download a media file (with decryption if needed).
-    Returns the file for download.
+    Preview a media file (with decryption if needed).
+    Returns the file content for preview purposes.
     Works directly with MediaFile ID.
-    """
-    user = request.user
-
-    try:
-        media = MediaFile.objects.get(id=file_id, is_deleted=False)
-
-        # Check access: owner or public media file
-        if media.owner != user and media.privacy != "public":
-            return Response({"error": "File not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
-
-    except MediaFile.DoesNotExist:
-        return Response({"error": "File not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
-    file_path = Path(settings.MEDIA_ROOT) / "cloud" / str(media.id)
-
-    if media.is_encrypted:
-        encrypted_file = file_path / "encrypted"
-    else:
-        encrypted_file = file_path / media.filename
-
-    if not encrypted_file.exists():
-        return Response({"error": "Physical file not found"}, status=status.HTTP_404_NOT_FOUND)
-
-    try:
-        if media.is_encrypted:
-            # Decrypt file
-            with open(encrypted_file, "rb") as f:
-                encrypted_data = f.read()
 
-            decrypted_data = decrypt_file_memory(encrypted_data, bytes(media.encryption_key), bytes(media.encryption_nonce))
-
-            # Return decrypted content
-            response = HttpResponse(decrypted_data, content_type=media.mime_type or "application/octet-stream")
-        else:
-            # Return file directly
-            response = FileResponse(open(encrypted_file, "rb"), content_type=media.mime_type or "application/octet-stream")
-
-        response["Content-Disposition"] = f'attachment; filename="{media.filename}"'
+    Async view: under ASGI the content is streamed without a thread per download.
+    """
+    return await sync_to_async(_serve_media)(request, file_id, "inline")
 
-        # Update accessed_at timestamp
-        media.accessed_at = None  # Django will set auto_now field
-        media.save()
 
-        return response
+@require_GET
+async def download_file(request, file_id):
+    """
+    Download a media file (with decryption if needed).
+    Returns the file for download.
+    Works directly with MediaFile ID.
 
-    except Exception as e:
-        return Response({"error": f"Failed to download file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    Async view: under ASGI the content is streamed without a thread per download.
+    """
+    return await sync_to_async(_serve_media)(request, file_id, "attachment")
 
 
 @api_view(["POST"])
@@ -364,6 +589,8 @@ def initiate_chunked_upload(request):
         - total_chunks: Total number of chunks that will be uploaded
         - encrypt: Boolean - whether to encrypt the file
         - directory: UUID of parent directory (optional)
+        - client_encrypted / key_metadata: Client-side encryption, as for upload_file (optional)
+        - versioning: Boolean - add a version to an existing file with this name (default: true)
 
     Returns:
         - upload_id: Unique identifier for this upload session
@@ -375,6 +602,9 @@ def initiate_chunked_upload(request):
     total_chunks = request.data.get("total_chunks")
     should_encrypt = request.data.get("encrypt", False)
     directory_id = request.data.get("directory", None)
+    key_metadata, error_response = _parse_client_encryption(request.data)
+    if error_response:
+        return error_response
 
     if not all([filename, file_size, total_chunks]):
         return Response(
@@ -404,7 +634,9 @@ def initiate_chunked_upload(request):
         "file_size": int(file_size),
         "total_chunks": int(total_chunks),
         "should_encrypt": should_encrypt,
+        "key_metadata": key_metadata,
         "directory_id": directory_id,
+        "versioning": str(request.data.get("versioning", "true")).lower() == "true",
         "chunks_received": [],
         "created_at": str(settings.USE_TZ),
     }
@@ -427,6 +659,7 @@ def initiate_chunked_upload(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@upload_admission
 def upload_chunk(request, upload_id):
     """
     Upload a single chunk of a file.
@@ -481,10 +714,10 @@ def upload_chunk(request, upload_id):
 
     # Save chunk to temporary directory
     temp_dir = Path(settings.MEDIA_ROOT) / "temp_chunks" / upload_id
-    chunk_path = temp_dir / f"chunk_{chunk_number}"
+    chunk_file = temp_dir / f"chunk_{chunk_number}"
 
     try:
-        with open(chunk_path, "wb") as f:
+        with open(chunk_file, "wb") as f:
             for data in chunk.chunks():
                 f.write(data)
 
@@ -513,6 +746,7 @@ def upload_chunk(request, upload_id):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@upload_admission
 def finalize_chunked_upload(request, upload_id):
     """
     Finalize a chunked upload by assembling all chunks into final file.
@@ -561,11 +795,11 @@ def finalize_chunked_upload(request, upload_id):
         assembled_file_path = temp_dir / "assembled"
         with open(assembled_file_path, "wb") as assembled_file:
             for i in range(upload_metadata["total_chunks"]):
-                chunk_path = temp_dir / f"chunk_{i}"
-                if not chunk_path.exists():
+                chunk_file = temp_dir / f"chunk_{i}"
+                if not chunk_file.exists():
                     raise FileNotFoundError(f"Chunk {i} not found")
-                with open(chunk_path, "rb") as chunk_file:
-                    assembled_file.write(chunk_file.read())
+                with open(chunk_file, "rb") as stored_chunk:
+                    assembled_file.write(stored_chunk.read())
 
         # Create a file-like object for create_media_file
         class AssembledFile:
@@ -636,7 +870,8 @@ def finalize_chunked_upload(request, upload_id):
                 file=assembled_file_obj,
                 folder="cloud",
                 owner=user,
-                should_encrypt=upload_metadata["should_encrypt"]
+                should_encrypt=upload_metadata["should_encrypt"],
+                client_key_metadata=upload_metadata.get("key_metadata"),
             )
         finally:
             # Ensure file is closed
@@ -657,12 +892,9 @@ def finalize_chunked_upload(request, upload_id):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 )
 
-        # Create CloudFile entry
-        cloud_file = CloudFile.objects.create(
-            name=upload_metadata["filename"],
-            owner=user,
-            directory=parent_directory,
-            media=media_file
+        # Create CloudFile entry, or add a version to the file already using this name
+        cloud_file, _ = save_uploaded_file(
+            user, upload_metadata["filename"], parent_directory, media_file, upload_metadata.get("versioning", True)
         )
 
         # Clean up temporary files
@@ -694,6 +926,213 @@ def finalize_chunked_upload(request, upload_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
+def _chunking_params():
+    """Content-defined chunking parameters clients must use so their chunks line up with stored ones."""
+    return {
+        "algorithm": "fastcdc",
+        "hash": "sha256",
+        "min_size": settings.CLOUD_DELTA_MIN_CHUNK_SIZE,
+        "avg_size": settings.CLOUD_DELTA_AVG_CHUNK_SIZE,
+        "max_size": settings.CLOUD_DELTA_MAX_CHUNK_SIZE,
+    }
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def initiate_delta_upload(request):
+    """
+    Initiate a delta upload: the client describes the file as content-defined chunks and only
+    uploads the chunks the server does not have yet.
+    Accepts:
+        - filename: The name of the file
+        - file_size: Total size of the file in bytes
+        - chunks: Manifest, list of {"hash": sha256 hex, "size": bytes} in file order
+        - directory: UUID of parent directory (optional)
+        - versioning: Boolean - add a version to an existing file with this name (default: true)
+
+    Returns:
+        - upload_id, the hashes of the missing chunks and the chunking parameters
+    """
+    user = request.user
+
+    filename = request.data.get("filename")
+    file_size = request.data.get("file_size")
+    manifest = request.data.get("chunks")
+    directory_id = request.data.get("directory", None)
+
+    # Chunks are kept in plaintext to be shared between files and versions, an encrypted file
+    # would sit unencrypted in the chunk store until GC. Encrypted files use chunked uploads.
+    if (
+        str(request.data.get("encrypt", "false")).lower() == "true"
+        or str(request.data.get("client_encrypted", "false")).lower() == "true"
+    ):
+        return Response(
+            {"error": "Delta uploads do not support encryption, use a chunked upload instead"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if not filename or file_size is None or not isinstance(manifest, list) or not manifest:
+        return Response(
+            {"error": "filename, file_size, and chunks are required", "chunking": _chunking_params()},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Validate the manifest
+    chunks = []
+    try:
+        for entry in manifest:
+            chunk_hash, chunk_size = str(entry["hash"]).lower(), int(entry["size"])
+            if not CHUNK_HASH_RE.match(chunk_hash) or not 0 < chunk_size <= settings.CLOUD_DELTA_MAX_CHUNK_SIZE:
+                raise ValueError(chunk_hash)
+            chunks.append((chunk_hash, chunk_size))
+        file_size = int(file_size)
+    except (KeyError, TypeError, ValueError):
+        return Response(
+            {"error": f"Each chunk needs a sha256 hash and a size of at most {settings.CLOUD_DELTA_MAX_CHUNK_SIZE} bytes"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if sum(chunk_size for _, chunk_size in chunks) != file_size:
+        return Response({"error": "Chunk sizes do not add up to file_size"}, status=status.HTTP_400_BAD_REQUEST)
+    if file_size > MAX_FILE_SIZE:
+        return Response({"error": "File size exceeds maximum limit of 5GB"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Validate directory if provided
+    if directory_id:
+        if not Directory.objects.filter(id=directory_id, owner=user).exists():
+            return Response({"error": "Directory not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+
+    upload_id = str(uuid.uuid4())
+    missing = find_missing_chunks(user.id, [chunk_hash for chunk_hash, _ in chunks])
+
+    upload_metadata = {
+        "user_id": str(user.id),
+        "filename": filename,
+        "file_size": file_size,
+        "chunks": chunks,
+        "directory_id": directory_id,
+        "versioning": str(request.data.get("versioning", "true")).lower() == "true",
+    }
+    cache.set(f"delta_upload_{upload_id}", upload_metadata, timeout=86400)  # 24 hours
+
+    missing_sizes = dict(chunks)
+    return Response(
+        {
+            "success": True,
+            "upload_id": upload_id,
+            "missing_chunks": missing,
+            "missing_bytes": sum(missing_sizes[chunk_hash] for chunk_hash in missing),
+            "total_chunks": len(chunks),
+            "chunking": _chunking_params(),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@upload_admission
+def upload_delta_chunk(request, upload_id):
+    """
+    Upload one chunk the server reported as missing.
+    Accepts:
+        - chunk: The chunk data
+        - hash: sha256 of the chunk, as listed in the manifest
+    """
+    user = request.user
+
+    upload_metadata = cache.get(f"delta_upload_{upload_id}")
+    if not upload_metadata:
+        return Response({"error": "Upload session not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+    if str(user.id) != upload_metadata["user_id"]:
+        return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+
+    chunk = request.FILES.get("chunk")
+    chunk_hash = str(request.data.get("hash", "")).lower()
+    if not chunk or not chunk_hash:
+        return Response({"error": "chunk and hash are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    expected_size = dict(upload_metadata["chunks"]).get(chunk_hash)
+    if expected_size is None:
+        return Response({"error": "Chunk is not part of this upload"}, status=status.HTTP_400_BAD_REQUEST)
+    if chunk.size != expected_size:
+        return Response({"error": "Chunk size does not match the manifest"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        write_chunk(user.id, chunk_hash, chunk.chunks())
+    except ChunkHashMismatch as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": f"Failed to save chunk: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({"success": True, "hash": chunk_hash}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@upload_admission
+def finalize_delta_upload(request, upload_id):
+    """
+    Rebuild the file from stored chunks once none are missing.
+    Creates the MediaFile and CloudFile entries.
+
+    Returns:
+        - CloudFile data, or the chunks that are still missing
+    """
+    user = request.user
+
+    upload_metadata = cache.get(f"delta_upload_{upload_id}")
+    if not upload_metadata:
+        return Response({"error": "Upload session not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+    if str(user.id) != upload_metadata["user_id"]:
+        return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+
+    chunks = upload_metadata["chunks"]
+    missing = find_missing_chunks(user.id, [chunk_hash for chunk_hash, _ in chunks])
+    if missing:
+        return Response(
+            {"error": "Not all chunks received", "missing_chunks": missing},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    # A hash fixes the chunk's length, so a manifest size that disagrees with the store is a client bug
+    for chunk_hash, chunk_size in dict(chunks).items():
+        if chunk_path(user.id, chunk_hash).stat().st_size != chunk_size:
+            return Response(
+                {"error": f"Manifest size of chunk {chunk_hash} does not match the stored chunk"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    parent_directory = None
+    if upload_metadata["directory_id"]:
+        parent_directory = Directory.objects.filter(id=upload_metadata["directory_id"], owner=user).first()
+
+    filename = upload_metadata["filename"]
+    manifest_file = ChunkManifestFile(
+        [chunk_path(user.id, chunk_hash) for chunk_hash, _ in chunks],
+        [chunk_size for _, chunk_size in chunks],
+        filename,
+        mimetypes.guess_type(filename)[0] or "application/octet-stream",
+    )
+    try:
+        media_file = create_media_file(
+            file=manifest_file,
+            folder="cloud",
+            owner=user,
+        )
+        cloud_file, _ = save_uploaded_file(user, filename, parent_directory, media_file, upload_metadata["versioning"])
+    except Exception as e:
+        return Response({"error": f"Failed to finalize upload: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    finally:
+        manifest_file.close()
+
+    cache.delete(f"delta_upload_{upload_id}")
+
+    serializer = CloudFileSerializer(cloud_file)
+    return Response(
+        {"success": True, "message": "File uploaded successfully", "file": serializer.data},
+        status=status.HTTP_201_CREATED,
+    )
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def rename_directory(request, directory_id):
@@ -725,7 +1164,9 @@ def rename_directory(request, directory_id):
             return Response({"error": "A directory with this name already exists in this location"}, status=status.HTTP_400_BAD_REQUEST)
 
         directory.name = new_name
-        directory.save()
+        with transaction.atomic():
+            directory.save()
+            record_changes([directory_change("rename", directory)])
         
         return Response(DirectorySerializer(directory).data)
     except Directory.DoesNotExist:
@@ -767,7 +1208,9 @@ def rename_file(request, file_id):
             return Response({"error": "A file with this name already exists in this location"}, status=status.HTTP_400_BAD_REQUEST)
 
         file_obj.name = new_name
-        file_obj.save()
+        with transaction.atomic():
+            file_obj.save()
+            record_changes([file_change("rename", file_obj)])
         
         return Response(CloudFileSerializer(file_obj).data)
     except CloudFile.DoesNotExist:
@@ -811,7 +1254,10 @@ def move_directory(request, directory_id):
              return Response({"error": "A directory with this name already exists in the destination"}, status=status.HTTP_400_BAD_REQUEST)
 
         directory.parent = new_parent
-        directory.save()
+        with transaction.atomic():
+            directory.save()
+            record_changes([directory_change("move", directory)])
+            move_access(directory)
         
         return Response(DirectorySerializer(directory).data)
     except Directory.DoesNotExist:
@@ -846,10 +1292,1256 @@ def move_file(request, file_id):
              return Response({"error": "A file with this name already exists in the destination"}, status=status.HTTP_400_BAD_REQUEST)
         
         file_obj.directory = new_parent
-        file_obj.save()
+        with transaction.atomic():
+            file_obj.save()
+            record_changes([file_change("move", file_obj)])
         
         return Response(CloudFileSerializer(file_obj).data)
     except CloudFile.DoesNotExist:
         return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+COPY_BATCH_SIZE = 1000
+
+
+def _copy_name(name, taken):
+    """Name for a copy placed next to `taken` names: "a.jpg", "a (copy).jpg", "a (copy 2).jpg", ..."""
+    if name not in taken:
+        return name
+    stem, ext = os.path.splitext(name)
+    candidate = f"{stem} (copy){ext}"
+    number = 2
+    while candidate in taken:
+        candidate = f"{stem} (copy {number}){ext}"
+        number += 1
+    return candidate
+
+
+def _directory_subtree(directory):
+    """
+    (id, parent_id, name) rows of a directory and all of its descendants, root first and
+    parents before children. Loads the owner's directory tree in one query.
+    """
+    children = {}
+    for row in Directory.objects.filter(owner_id=directory.owner_id).values_list("id", "parent_id", "name"):
+        children.setdefault(row[1], []).append(row)
+
+    subtree = [(directory.id, directory.parent_id, directory.name)]
+    for directory_id, _, _ in subtree:
+        subtree.extend(children.get(directory_id, ()))
+    return subtree
+
+
+def _get_target_directory(user, parent_id):
+    """Resolve an optional parent id to a Directory, None for root. Raises Directory.DoesNotExist."""
+    if not parent_id:
+        return None
+    return Directory.objects.get(id=parent_id, owner=user)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def copy_file(request, file_id):
+    """
+    Copy a file without duplicating its bytes; the copy shares the original's MediaFile.
+    Accepts:
+        - parent: UUID of the destination directory (optional, defaults to the file's own directory, null for root)
+    """
+    user = request.user
+
+    try:
+        file_obj = CloudFile.objects.get(id=file_id, owner=user, is_deleted=False, pending_upload=False)
+    except CloudFile.DoesNotExist:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        parent_id = request.data["parent"] if "parent" in request.data else file_obj.directory_id
+        new_parent = _get_target_directory(user, parent_id)
+    except Directory.DoesNotExist:
+        return Response({"error": "Target directory not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    taken = set(
+        CloudFile.objects.filter(directory=new_parent, owner=user, is_deleted=False).values_list("name", flat=True)
+    )
+    with transaction.atomic():
+        copy = CloudFile.objects.create(
+            name=_copy_name(file_obj.name, taken), owner=user, directory=new_parent, media_id=file_obj.media_id
+        )
+        add_media_references([file_obj.media_id])
+        record_changes([file_change("create", copy)])
+
+    return Response(
+        {"success": True, "message": "File copied successfully", "file": CloudFileSerializer(copy).data},
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def copy_directory(request, directory_id):
+    """
+    Copy a directory with all subdirectories and files.
+    Only rows are created, the copied files share the originals' MediaFiles.
+    Accepts:
+        - parent: UUID of the destination directory (optional, defaults to the directory's own parent, null for root)
+    """
+    user = request.user
+
+    try:
+        directory = Directory.objects.get(id=directory_id, owner=user)
+    except Directory.DoesNotExist:
+        return Response({"error": "Directory not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        parent_id = request.data["parent"] if "parent" in request.data else directory.parent_id
+        new_parent = _get_target_directory(user, parent_id)
+    except Directory.DoesNotExist:
+        return Response({"error": "Target directory not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    subtree = _directory_subtree(directory)
+    if new_parent and new_parent.id in {directory_id for directory_id, _, _ in subtree}:
+        return Response({"error": "Cannot copy a directory into itself or its children"}, status=status.HTTP_400_BAD_REQUEST)
+
+    taken = set(Directory.objects.filter(parent=new_parent, owner=user).values_list("name", flat=True))
+
+    # New ids are assigned up front so children can reference their parents before anything is saved
+    new_ids = {directory_id: uuid.uuid4() for directory_id, _, _ in subtree}
+    new_directories = [
+        Directory(id=new_ids[directory.id], name=_copy_name(directory.name, taken), owner=user, parent=new_parent)
+    ]
+    for directory_id, parent_id, name in subtree[1:]:
+        new_directories.append(Directory(id=new_ids[directory_id], name=name, owner=user, parent_id=new_ids[parent_id]))
+
+    files = (
+        CloudFile.objects.filter(owner=user, directory_id__in=new_ids.keys(), is_deleted=False, pending_upload=False)
+        .values_list("name", "directory_id", "media_id")
+        .order_by()
+    )
+    copied_files = 0
+    with transaction.atomic():
+        Directory.objects.bulk_create(new_directories, batch_size=COPY_BATCH_SIZE)
+        record_changes(directory_change("create", new_directory) for new_directory in new_directories)
+        inherit_access(user.id, new_directories)
+        batch, media_ids = [], []
+        for name, source_directory_id, media_id in files.iterator(chunk_size=COPY_BATCH_SIZE):
+            batch.append(CloudFile(name=name, owner=user, directory_id=new_ids[source_directory_id], media_id=media_id))
+            media_ids.append(media_id)
+            if len(batch) >= COPY_BATCH_SIZE:
+                CloudFile.objects.bulk_create(batch)
+                record_changes(file_change("create", cloud_file) for cloud_file in batch)
+                copied_files += len(batch)
+                batch = []
+        CloudFile.objects.bulk_create(batch)
+        record_changes(file_change("create", cloud_file) for cloud_file in batch)
+        copied_files += len(batch)
+        add_media_references(media_ids)
+
+    return Response(
+        {
+            "success": True,
+            "message": "Directory copied successfully",
+            "directory": DirectorySerializer(new_directories[0]).data,
+            "copied_directories": len(new_directories),
+            "copied_files": copied_files,
+        },
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def delete_file(request, file_id):
+    """
+    Delete a file. Its bytes are freed once no other copy references them.
+    """
+    user = request.user
+
+    try:
+        file_obj = CloudFile.objects.get(id=file_id, owner=user, is_deleted=False)
+    except CloudFile.DoesNotExist:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    with transaction.atomic():
+        release_file_tags([file_obj.id])
+        file_obj.is_deleted = True
+        file_obj.deleted_at = timezone.now()
+        file_obj.save()
+        release_media_references([file_obj.media_id])
+        record_changes([file_change("delete", file_obj)])
+
+    return Response({"success": True, "message": "File deleted successfully"}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def delete_directory(request, directory_id):
+    """
+    Delete a directory with all subdirectories and files.
+    """
+    user = request.user
+
+    try:
+        directory = Directory.objects.get(id=directory_id, owner=user)
+    except Directory.DoesNotExist:
+        return Response({"error": "Directory not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    subtree_ids = [directory_id for directory_id, _, _ in _directory_subtree(directory)]
+    media_ids = list(
+        CloudFile.objects.filter(owner=user, directory_id__in=subtree_ids, is_deleted=False).values_list("media_id", flat=True)
+    )
+    # Versions go with their files and hold references of their own
+    version_media_ids = list(
+        FileVersion.objects.filter(file__owner=user, file__directory_id__in=subtree_ids).values_list("media_id", flat=True)
+    )
+    with transaction.atomic():
+        release_media_references(media_ids + version_media_ids)
+        release_file_tags(CloudFile.objects.filter(owner=user, directory_id__in=subtree_ids, is_deleted=False))
+        # Only the top directory is journaled, clients drop everything below it
+        record_changes([directory_change("delete", directory)])
+        # Cascades to the files of the subtree
+        directory.delete()
+
+    return Response(
+        {"success": True, "message": "Directory deleted successfully", "deleted_files": len(media_ids)},
+        status=status.HTTP_200_OK,
+    )
+
+
+def _share_data(shared_item):
+    return {
+        "id": shared_item.id,
+        "user": {"id": shared_item.user_id, "email": shared_item.user.email, "name": shared_item.user.name},
+        "permission": shared_item.permission,
+        "created_at": shared_item.created_at,
+    }
+
+
+def _manage_shares(request, item_filter):
+    """
+    List, grant or revoke the shares of one file or directory of the requesting user.
+    GET lists the shares; POST grants or updates one; DELETE revokes one.
+    """
+    owner = request.user
+    if request.method == "GET":
+        shares = SharedItem.objects.filter(**item_filter).select_related("user").order_by("created_at")
+        return Response({"shares": [_share_data(shared_item) for shared_item in shares]}, status=status.HTTP_200_OK)
+
+    email = request.data.get("email")
+    if not email:
+        return Response({"error": "email is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        grantee = User.objects.get(email=email)
+    except User.DoesNotExist:
+        return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+    if grantee.id == owner.id:
+        return Response({"error": "Cannot share with yourself"}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        if request.method == "DELETE":
+            deleted, _ = SharedItem.objects.filter(user=grantee, **item_filter).delete()
+            if not deleted:
+                return Response({"error": "Not shared with this user"}, status=status.HTTP_404_NOT_FOUND)
+            sync_access(owner.id)
+            return Response({"success": True, "message": "Share revoked"}, status=status.HTTP_200_OK)
+
+        permission = request.data.get("permission", "view")
+        if permission not in dict(SharedItem.PERMISSION_CHOICES):
+            return Response({"error": "permission must be view or edit"}, status=status.HTTP_400_BAD_REQUEST)
+        shared_item, created = SharedItem.objects.update_or_create(
+            user=grantee, **item_filter, defaults={"permission": permission}
+        )
+        sync_access(owner.id)
+
+    return Response(
+        {"success": True, "share": _share_data(shared_item)},
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET", "POST", "DELETE"])
+@permission_classes([IsAuthenticated])
+def share_file(request, file_id):
+    """
+    Share a file with another user.
+    Accepts (POST, DELETE):
+        - email: Email of the user to share with or to revoke
+        - permission: "view" (default) or "edit" (POST only)
+
+    Returns:
+        - shares (GET), the share (POST), or a success message (DELETE)
+    """
+    try:
+        file_obj = CloudFile.objects.get(id=file_id, owner=request.user, is_deleted=False)
+    except CloudFile.DoesNotExist:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+    return _manage_shares(request, {"content": file_obj})
+
+
+@api_view(["GET", "POST", "DELETE"])
+@permission_classes([IsAuthenticated])
+def share_directory(request, directory_id):
+    """
+    Share a directory, with everything below it, with another user.
+    Accepts (POST, DELETE):
+        - email: Email of the user to share with or to revoke
+        - permission: "view" (default) or "edit" (POST only)
+
+    Returns:
+        - shares (GET), the share (POST), or a success message (DELETE)
+    """
+    try:
+        directory = Directory.objects.get(id=directory_id, owner=request.user)
+    except Directory.DoesNotExist:
+        return Response({"error": "Directory not found"}, status=status.HTTP_404_NOT_FOUND)
+    return _manage_shares(request, {"directory": directory})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def shared_with_me(request):
+    """
+    API endpoint to browse what other users shared with the requesting user.
+    Query params:
+        - parent: UUID of a shared directory (optional, if not provided returns the shared items themselves)
+
+    Returns:
+        - directories, files, breadcrumbs, current_directory as explorer_view, plus permission
+    """
+    user = request.user
+    parent_id = request.GET.get("parent", None)
+
+    if not parent_id:
+        shares = list(SharedItem.objects.filter(user=user).select_related("content__media", "directory"))
+        directories = [shared_item for shared_item in shares if shared_item.directory_id]
+        files = [shared_item for shared_item in shares if shared_item.content_id and not shared_item.content.is_deleted]
+        directories_data = [
+            {**DirectorySerializer(shared_item.directory).data, "permission": shared_item.permission}
+            for shared_item in directories
+        ]
+        files_data = [
+            {**CloudFileSerializer(shared_item.content).data, "permission": shared_item.permission}
+            for shared_item in files
+        ]
+        return Response(
+            {"directories": directories_data, "files": files_data, "breadcrumbs": [], "current_directory": None},
+            status=status.HTTP_200_OK,
+        )
+
+    try:
+        permission = get_directory_permission(user, parent_id)
+    except ValidationError:
+        permission = None
+    if permission is None:
+        return Response({"error": "Directory not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+
+    current_directory = Directory.objects.get(id=parent_id)
+    directories = Directory.objects.filter(parent=current_directory).order_by("name")
+    files = CloudFile.objects.filter(directory=current_directory, is_deleted=False).select_related("media").order_by("name")
+
+    # Breadcrumbs stop at the topmost directory shared with the user
+    accessible = {
+        directory_id: (parent, name)
+        for directory_id, parent, name in Directory.objects.filter(
+            access_entries__user=user, owner_id=current_directory.owner_id
+        ).values_list("id", "parent_id", "name")
+    }
+    breadcrumbs = []
+    directory_id = current_directory.id
+    while directory_id in accessible:
+        parent, name = accessible[directory_id]
+        breadcrumbs.insert(0, {"id": directory_id, "name": name})
+        directory_id = parent
+
+    return Response(
+        {
+            "directories": [
+                {**data, "permission": permission} for data in DirectorySerializer(directories, many=True).data
+            ],
+            "files": [{**data, "permission": permission} for data in CloudFileSerializer(files, many=True).data],
+            "breadcrumbs": breadcrumbs,
+            "current_directory": {**DirectorySerializer(current_directory).data, "permission": permission},
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def _manage_share_links(request, item_filter):
+    """
+    GET lists the share links of one file or directory; POST creates one.
+    Accepts (POST):
+        - expires_in_days: Days until the link stops working (optional, default never)
+    """
+    if request.method == "GET":
+        links = ShareLink.objects.filter(owner=request.user, **item_filter).order_by("created_at")
+        return Response({"links": ShareLinkSerializer(links, many=True).data}, status=status.HTTP_200_OK)
+
+    expires_at = None
+    expires_in_days = request.data.get("expires_in_days")
+    if expires_in_days not in (None, ""):
+        try:
+            expires_in_days = int(expires_in_days)
+        except (TypeError, ValueError):
+            return Response({"error": "expires_in_days must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if expires_in_days < 1:
+            return Response({"error": "expires_in_days must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+        expires_at = timezone.now() + timedelta(days=expires_in_days)
+
+    link = ShareLink.objects.create(owner=request.user, expires_at=expires_at, **item_filter)
+    return Response({"success": True, "link": ShareLinkSerializer(link).data}, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def file_share_links(request, file_id):
+    """
+    Public links to a file, for people without an account.
+    Accepts (POST):
+        - expires_in_days: Days until the link stops working (optional, default never)
+    """
+    try:
+        file_obj = CloudFile.objects.get(id=file_id, owner=request.user, is_deleted=False)
+    except CloudFile.DoesNotExist:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+    return _manage_share_links(request, {"file": file_obj})
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def directory_share_links(request, directory_id):
+    """
+    Public links to a directory and everything below it, for people without an account.
+    Accepts (POST):
+        - expires_in_days: Days until the link stops working (optional, default never)
+    """
+    try:
+        directory = Directory.objects.get(id=directory_id, owner=request.user)
+    except Directory.DoesNotExist:
+        return Response({"error": "Directory not found"}, status=status.HTTP_404_NOT_FOUND)
+    return _manage_share_links(request, {"directory": directory})
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def revoke_share_link(request, token):
+    """
+    Revoke a public link of the requesting user.
+    """
+    deleted, _ = ShareLink.objects.filter(token=token, owner=request.user).delete()
+    if not deleted:
+        return Response({"error": "Link not found"}, status=status.HTTP_404_NOT_FOUND)
+    invalidate_share_link(token)
+    return Response({"success": True, "message": "Link revoked"}, status=status.HTTP_200_OK)
+
+
+SHARE_LISTING_PAGE_SIZE = 100
+SHARE_LISTING_MAX_PAGE_SIZE = 500
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@throttle_classes([ShareLinkThrottle])
+def public_share(request, token):
+    """
+    Read-only listing behind a public link; no account needed.
+    Query params:
+        - parent: UUID of a directory inside a shared directory (optional, defaults to the shared directory)
+        - offset: Number of items to skip (default 0)
+        - limit: Number of items per page (default 100, max 500)
+
+    Returns:
+        - directory, breadcrumbs, items ([{type, id, name, ...}], directories first), total, next_offset
+    """
+    link = get_share_link(token)
+    if link is None:
+        return Response({"error": "Link not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        offset = max(int(request.GET.get("offset", 0)), 0)
+        limit = min(max(int(request.GET.get("limit", SHARE_LISTING_PAGE_SIZE)), 1), SHARE_LISTING_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "offset and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    listing = get_public_listing(token, link, request.GET.get("parent") or None)
+    if listing is None:
+        error = "File not found" if link["file_id"] else "Directory not found"
+        return Response({"error": error}, status=status.HTTP_404_NOT_FOUND)
+
+    items = listing["items"]
+    return Response(
+        {
+            "directory": listing["directory"],
+            "breadcrumbs": listing["breadcrumbs"],
+            "items": items[offset : offset + limit],
+            "total": len(items),
+            "next_offset": offset + limit if offset + limit < len(items) else None,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+@throttle_classes([ShareLinkDownloadThrottle])
+def public_share_file(request, token, file_id):
+    """
+    Stream a file behind a public link, honouring Range requests.
+    Query params:
+        - download: "true" to get an attachment instead of inline content
+    """
+    link = get_share_link(token)
+    if link is None:
+        return Response({"error": "Link not found or expired"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        file_obj = CloudFile.objects.select_related("media").get(
+            id=file_id, owner_id=link["owner_id"], is_deleted=False, pending_upload=False
+        )
+    except CloudFile.DoesNotExist:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+    if link["file_id"]:
+        in_scope = file_obj.id == link["file_id"]
+    else:
+        in_scope = file_obj.directory_id is not None and link_directory_path(link, file_obj.directory_id) is not None
+    if not in_scope or file_obj.media is None:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    media = file_obj.media
+    stored_file = media.file_path()
+    if not stored_file.exists():
+        return Response({"error": "Physical file not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    response = _media_response(request, media, stored_file)
+    disposition = "attachment" if request.GET.get("download", "").lower() == "true" else "inline"
+    response["Content-Disposition"] = f'{disposition}; filename="{file_obj.name}"'
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def file_versions(request, file_id):
+    """
+    Earlier versions of a file, newest first. The current content is the file itself.
+    """
+    versions = list(
+        FileVersion.objects.filter(file_id=file_id, file__owner=request.user, file__is_deleted=False)
+        .select_related("media")
+        .order_by("-version_number")
+    )
+    if not versions and not CloudFile.objects.filter(id=file_id, owner=request.user, is_deleted=False).exists():
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(
+        {"file": str(file_id), "versions": FileVersionSerializer(versions, many=True).data},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def restore_file_version(request, file_id, version_id):
+    """
+    Make an earlier version the current content of a file.
+    The content being replaced is kept as the newest version, so a restore can be undone.
+    """
+    try:
+        version = FileVersion.objects.select_related("file", "media").get(
+            id=version_id, file_id=file_id, file__owner=request.user, file__is_deleted=False
+        )
+    except FileVersion.DoesNotExist:
+        return Response({"error": "Version not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    cloud_file = set_file_content(version.file, version.media, reuse_media=True)
+    return Response(
+        {"success": True, "message": f"Restored version {version.version_number}", "file": CloudFileSerializer(cloud_file).data},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def organize_directory(request):
+    """
+    Sort the files of a directory into Category/Subcategory folders in the background.
+    Accepts:
+        - directory: UUID of the directory to organize (optional, if not provided organizes the root level)
+
+    An unfinished job for the same directory is resumed instead of starting a new one.
+
+    Returns:
+        - The organize job, poll organize/<job_id>/ for progress
+    """
+    user = request.user
+    directory_id = request.data.get("directory", None)
+
+    directory = None
+    if directory_id:
+        try:
+            directory = Directory.objects.get(id=directory_id, owner=user)
+        except Directory.DoesNotExist:
+            return Response({"error": "Directory not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+
+    job = (
+        OrganizeJob.objects.filter(owner=user, directory=directory)
+        .exclude(status="completed")
+        .order_by("-created_at")
+        .first()
+    )
+    if job is None:
+        job = OrganizeJob.objects.create(owner=user, directory=directory)
+    start_organize_job(job)
+
+    return Response(
+        {"success": True, "message": "Organize job started", "job": OrganizeJobSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def organize_job_status(request, job_id):
+    """
+    Progress of an organize job.
+    """
+    try:
+        job = OrganizeJob.objects.get(id=job_id, owner=request.user)
+    except OrganizeJob.DoesNotExist:
+        return Response({"error": "Organize job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(OrganizeJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+TIMELINE_PAGE_SIZE = 24
+TIMELINE_MAX_PAGE_SIZE = 120
+
+
+def _parse_period(value):
+    """
+    Parse a timeline period, "YYYY-MM" or "YYYY-MM-DD", in the current timezone.
+
+    Returns:
+        tuple: (start, end) aware datetimes, end exclusive
+
+    Raises:
+        ValueError: If the value is not a valid month or day
+    """
+    if len(value) == 7:
+        start = datetime.strptime(value, "%Y-%m")
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        start = datetime.strptime(value, "%Y-%m-%d")
+        end = datetime.fromordinal(start.toordinal() + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+SEARCH_FACET_TAGS = 20
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_files(request):
+    """
+    Search the user's files by name, ordered by name.
+    Query params:
+        - q: Text to look for in file names (optional)
+        - match: "substring" (default) or "prefix"
+        - tag: Tag UUID, repeat to require several tags (optional)
+        - type: MIME type ("image/png") or top-level type ("image") (optional)
+        - min_size, max_size: Size bounds in bytes (optional)
+        - from, to: YYYY-MM or YYYY-MM-DD upload date bounds, both inclusive (optional)
+        - cursor: next_cursor of the previous page (optional)
+        - limit: Number of files per page (default 50, max 200)
+        - facets: "false" to skip facet counts, e.g. when paging
+
+    Returns:
+        - files: Matching files, next_cursor (null on the last page)
+        - facets: {types: [{type, count}], tags: [{id, name, count}]} over all matches
+    """
+    user = request.user
+    query = request.GET.get("q", "").strip()
+    match = request.GET.get("match", "substring")
+    if match not in ("substring", "prefix"):
+        return Response({"error": "match must be substring or prefix"}, status=status.HTTP_400_BAD_REQUEST)
+
+    files = CloudFile.objects.filter(owner=user, is_deleted=False, pending_upload=False)
+    if query:
+        files = filter_by_name(files, query, prefix=match == "prefix")
+
+    for tag_id in request.GET.getlist("tag"):
+        try:
+            files = files.filter(id__in=FileTag.objects.filter(tag_id=uuid.UUID(tag_id), tag__owner=user).values("file_id"))
+        except ValueError:
+            return Response({"error": "Invalid tag id"}, status=status.HTTP_400_BAD_REQUEST)
+
+    mime_type = request.GET.get("type")
+    if mime_type:
+        if "/" in mime_type:
+            files = files.filter(media__mime_type=mime_type)
+        else:
+            files = files.filter(media__mime_type__startswith=f"{mime_type}/")
+
+    try:
+        if request.GET.get("min_size"):
+            files = files.filter(media__size__gte=int(request.GET["min_size"]))
+        if request.GET.get("max_size"):
+            files = files.filter(media__size__lte=int(request.GET["max_size"]))
+        if request.GET.get("from"):
+            files = files.filter(created_at__gte=_parse_period(request.GET["from"])[0])
+        if request.GET.get("to"):
+            files = files.filter(created_at__lt=_parse_period(request.GET["to"])[1])
+        limit = min(max(int(request.GET.get("limit", SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "Invalid size, date or limit"}, status=status.HTTP_400_BAD_REQUEST)
+
+    page = files
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            page = page.filter(after_search_cursor(cursor))
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    page = list(with_tags(page.select_related("media").order_by("name", "id"))[: limit + 1])
+    next_cursor = encode_search_cursor(page[limit - 1].name, page[limit - 1].id) if len(page) > limit else None
+
+    response_data = {"files": TaggedCloudFileSerializer(page[:limit], many=True).data, "next_cursor": next_cursor}
+
+    if request.GET.get("facets", "true").lower() != "false":
+        # Facets count every match, not just this page, but only need the ids of the matches
+        types = {}
+        for mime, count in files.values_list("media__mime_type").annotate(count=Count("id")).order_by():
+            top_level = (mime or "").split("/")[0] or "other"
+            types[top_level] = types.get(top_level, 0) + count
+        tags = (
+            FileTag.objects.filter(file_id__in=files.values("id"))
+            .values("tag_id", "tag__name")
+            .annotate(count=Count("id"))
+            .order_by("-count", "tag__name")[:SEARCH_FACET_TAGS]
+        )
+        response_data["facets"] = {
+            "types": [{"type": top_level, "count": count} for top_level, count in sorted(types.items(), key=lambda item: -item[1])],
+            "tags": [{"id": row["tag_id"], "name": row["tag__name"], "count": row["count"]} for row in tags],
+        }
+
+    return Response(response_data, status=status.HTTP_200_OK)
+
+
+TAG_MAX_BATCH = 1000  # Files per apply/remove request
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def tags_view(request):
+    """
+    GET lists the user's tags with their file counts; POST creates a tag.
+    Accepts (POST):
+        - name: Tag name, unique per user
+        - related_user: Email of the person the tag is about (optional, makes it a people album)
+    """
+    user = request.user
+    if request.method == "GET":
+        tags = Tag.objects.filter(owner=user).select_related("related_user").order_by("name")
+        return Response({"tags": TagSerializer(tags, many=True).data}, status=status.HTTP_200_OK)
+
+    name = (request.data.get("name") or "").strip()
+    if not name:
+        return Response({"error": "name is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if Tag.objects.filter(owner=user, name=name).exists():
+        return Response({"error": "A tag with this name already exists"}, status=status.HTTP_400_BAD_REQUEST)
+
+    related_user = None
+    email = request.data.get("related_user")
+    if email:
+        try:
+            related_user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+        if Tag.objects.filter(owner=user, related_user=related_user).exists():
+            return Response({"error": "This person already has a tag"}, status=status.HTTP_400_BAD_REQUEST)
+
+    tag = Tag.objects.create(owner=user, name=name, related_user=related_user)
+    return Response({"success": True, "tag": TagSerializer(tag).data}, status=status.HTTP_201_CREATED)
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def delete_tag(request, tag_id):
+    """
+    Delete a tag; the files keep existing.
+    """
+    deleted, _ = Tag.objects.filter(id=tag_id, owner=request.user).delete()
+    if not deleted:
+        return Response({"error": "Tag not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"success": True, "message": "Tag deleted"}, status=status.HTTP_200_OK)
+
+
+def _tag_batch(request):
+    """Validated (file_ids, tag_ids) of an apply/remove request, or an error Response."""
+    file_ids = request.data.get("files")
+    tag_ids = request.data.get("tags")
+    if not isinstance(file_ids, list) or not file_ids or not isinstance(tag_ids, list) or not tag_ids:
+        return Response({"error": "files and tags must be non-empty lists of ids"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(file_ids) > TAG_MAX_BATCH:
+        return Response({"error": f"At most {TAG_MAX_BATCH} files per request"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        owned_tags = list(Tag.objects.filter(id__in=tag_ids, owner=request.user).values_list("id", flat=True))
+        owned_files = owned_live_files(request.user, file_ids)
+    except ValidationError:
+        return Response({"error": "files and tags must be lists of ids"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(owned_tags) != len(set(tag_ids)) or len(owned_files) != len(set(file_ids)):
+        return Response({"error": "Some files or tags were not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+    return owned_files, owned_tags
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def apply_tags(request):
+    """
+    Tag many files with one or more tags at once; pairs that already exist are skipped.
+    Accepts:
+        - files: List of CloudFile UUIDs (at most 1000)
+        - tags: List of Tag UUIDs
+
+    Returns:
+        - Number of tags added
+    """
+    batch = _tag_batch(request)
+    if isinstance(batch, Response):
+        return batch
+    added = tag_files(*batch)
+    return Response({"success": True, "added": added}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def remove_tags(request):
+    """
+    Remove one or more tags from many files at once.
+    Accepts:
+        - files: List of CloudFile UUIDs (at most 1000)
+        - tags: List of Tag UUIDs
+
+    Returns:
+        - Number of tags removed
+    """
+    batch = _tag_batch(request)
+    if isinstance(batch, Response):
+        return batch
+    removed = untag_files(*batch)
+    return Response({"success": True, "removed": removed}, status=status.HTTP_200_OK)
+
+
+def _tagged_files_page(request, tag):
+    """One page of the live files with a tag, ordered by name, with every file's tags."""
+    try:
+        limit = min(max(int(request.GET.get("limit", SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Driven by the (tag, file) index instead of joining every file of the user
+    files = CloudFile.objects.filter(
+        id__in=FileTag.objects.filter(tag=tag).values("file_id"), is_deleted=False, pending_upload=False
+    )
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            files = files.filter(after_search_cursor(cursor))
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    page = list(with_tags(files.select_related("media").order_by("name", "id"))[: limit + 1])
+    next_cursor = encode_search_cursor(page[limit - 1].name, page[limit - 1].id) if len(page) > limit else None
+
+    return Response(
+        {
+            "tag": TagSerializer(tag).data,
+            "files": TaggedCloudFileSerializer(page[:limit], many=True).data,
+            "next_cursor": next_cursor,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def tag_files_view(request, tag_id):
+    """
+    Files with a tag, ordered by name.
+    Query params:
+        - cursor: next_cursor of the previous page (optional)
+        - limit: Number of files per page (default 50, max 200)
+    """
+    try:
+        tag = Tag.objects.select_related("related_user").get(id=tag_id, owner=request.user)
+    except Tag.DoesNotExist:
+        return Response({"error": "Tag not found"}, status=status.HTTP_404_NOT_FOUND)
+    return _tagged_files_page(request, tag)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def people_view(request):
+    """
+    The user's people albums: tags about a person, largest first.
+    """
+    tags = (
+        Tag.objects.filter(owner=request.user, related_user__isnull=False)
+        .select_related("related_user")
+        .order_by("-file_count", "name")
+    )
+    return Response({"people": TagSerializer(tags, many=True).data}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def person_files(request, user_id):
+    """
+    Files of the people album of one person, ordered by name.
+    Query params:
+        - cursor: next_cursor of the previous page (optional)
+        - limit: Number of files per page (default 50, max 200)
+    """
+    try:
+        # A single lookup on the unique (owner, related_user) index
+        tag = Tag.objects.select_related("related_user").get(owner=request.user, related_user_id=user_id)
+    except Tag.DoesNotExist:
+        return Response({"error": "No album for this person"}, status=status.HTTP_404_NOT_FOUND)
+    return _tagged_files_page(request, tag)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def timeline_view(request):
+    """
+    Photo and video counts per month or day of capture, newest first.
+    Query params:
+        - granularity: "month" (default) or "day"
+        - month: YYYY-MM, only return buckets inside this month (optional)
+        - cursor: next_cursor of the previous page (optional)
+        - limit: Number of buckets per page (default 24, max 120)
+
+    Returns:
+        - buckets: [{period, count}] and next_cursor (null on the last page)
+    """
+    granularity = request.GET.get("granularity", "month")
+    if granularity not in ("month", "day"):
+        return Response({"error": "granularity must be 'month' or 'day'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(max(int(request.GET.get("limit", TIMELINE_PAGE_SIZE)), 1), TIMELINE_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Media kept only by older versions or trashed files is not on the timeline
+    media = MediaFile.objects.filter(
+        Exists(CloudFile.objects.filter(media_id=OuterRef("id"), is_deleted=False, pending_upload=False)),
+        owner=request.user,
+        is_deleted=False,
+        captured_at__isnull=False,
+    )
+    try:
+        month = request.GET.get("month")
+        if month:
+            if len(month) != 7:
+                raise ValueError(month)
+            month_start, month_end = _parse_period(month)
+            media = media.filter(captured_at__gte=month_start, captured_at__lt=month_end)
+
+        # Keyset pagination: continue below the start of the last bucket already returned
+        cursor = request.GET.get("cursor")
+        if cursor:
+            media = media.filter(captured_at__lt=_parse_period(cursor)[0])
+    except ValueError:
+        return Response({"error": "Invalid month or cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+    trunc, period_format = (TruncMonth, "%Y-%m") if granularity == "month" else (TruncDay, "%Y-%m-%d")
+    rows = list(
+        media.annotate(period=trunc("captured_at"))
+        .values("period")
+        .annotate(count=Count("*"))
+        .order_by("-period")[: limit + 1]
+    )
+
+    buckets = [
+        {"period": timezone.localtime(row["period"]).strftime(period_format), "count": row["count"]}
+        for row in rows[:limit]
+    ]
+    next_cursor = buckets[-1]["period"] if len(rows) > limit else None
+
+    return Response(
+        {"granularity": granularity, "buckets": buckets, "next_cursor": next_cursor},
+        status=status.HTTP_200_OK,
+    )
+
+
+DUPLICATES_PAGE_SIZE = 50
+
+
+def _duplicate_groups(user):
+    """
+    A user's content hashes held by more than one live MediaFile, grouped on (owner, media_hash).
+    Content kept only by versions or the trash cannot be reclaimed here, and files sharing one
+    MediaFile already share its storage, so only distinct media behind live files are counted.
+    """
+    live_files = CloudFile.objects.filter(media_id=OuterRef("id"), is_deleted=False, pending_upload=False)
+    copies = Count("id")
+    return (
+        MediaFile.objects.filter(owner=user, media_hash__gt="")
+        .filter(Exists(live_files))
+        .values("media_hash")
+        .annotate(copies=copies, file_size=Max("size"), reclaimable_bytes=(copies - 1) * Max("size"))
+        .filter(copies__gt=1)
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def duplicates_view(request):
+    """
+    Groups of cloud files with identical content, largest savings first.
+    Query params:
+        - offset: Number of groups to skip (default 0)
+        - limit: Number of groups to return (default 50, max 200)
+
+    Returns:
+        - groups: [{media_hash, file_size, copies, reclaimable_bytes, files}], plus totals over all groups
+    """
+    user = request.user
+    try:
+        offset = max(int(request.GET.get("offset", 0)), 0)
+        limit = min(max(int(request.GET.get("limit", DUPLICATES_PAGE_SIZE)), 1), 200)
+    except ValueError:
+        return Response({"error": "offset and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    groups = _duplicate_groups(user)
+    totals = groups.aggregate(total_groups=Count("media_hash"), total_reclaimable_bytes=Sum("reclaimable_bytes"))
+    page = list(groups.order_by("-reclaimable_bytes", "media_hash")[offset : offset + limit])
+
+    files_by_hash = {group["media_hash"]: [] for group in page}
+    files = (
+        CloudFile.objects.filter(
+            owner=user, is_deleted=False, pending_upload=False, media__media_hash__in=files_by_hash.keys()
+        )
+        .select_related("media", "directory")
+        .order_by("created_at")
+    )
+    for cloud_file in files:
+        data = CloudFileSerializer(cloud_file).data
+        data["directory"] = str(cloud_file.directory_id) if cloud_file.directory_id else None
+        data["path"] = cloud_file.directory.path if cloud_file.directory else ""
+        files_by_hash[cloud_file.media.media_hash].append(data)
+    for group in page:
+        group["files"] = files_by_hash[group["media_hash"]]
+
+    return Response(
+        {
+            "groups": page,
+            "total_groups": totals["total_groups"],
+            "total_reclaimable_bytes": totals["total_reclaimable_bytes"] or 0,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def resolve_duplicates(request):
+    """
+    Keep one file of each duplicate group and move the other copies to the trash.
+    Accepts:
+        - keep: List of CloudFile UUIDs, one per duplicate group; every other file with the same content is deleted
+
+    Returns:
+        - Number of deleted files and the bytes freed
+    """
+    user = request.user
+    keep_ids = request.data.get("keep")
+    if not isinstance(keep_ids, list) or not keep_ids:
+        return Response({"error": "keep must be a non-empty list of file ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        kept = list(
+            CloudFile.objects.filter(id__in=keep_ids, owner=user, is_deleted=False, media__isnull=False).values_list(
+                "id", "media_id", "media__media_hash"
+            )
+        )
+    except ValidationError:
+        return Response({"error": "keep must be a list of file ids"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(kept) != len(set(keep_ids)):
+        return Response({"error": "Some files were not found or access denied"}, status=status.HTTP_404_NOT_FOUND)
+
+    hashes = {media_hash for _, _, media_hash in kept}
+    duplicate_hashes = set(
+        _duplicate_groups(user).filter(media_hash__in=hashes).values_list("media_hash", flat=True)
+    )
+    if hashes - duplicate_hashes:
+        return Response({"error": "Some files are not in a duplicate group"}, status=status.HTTP_400_BAD_REQUEST)
+
+    copies = CloudFile.objects.filter(
+        owner=user, is_deleted=False, pending_upload=False, media__media_hash__in=duplicate_hashes
+    ).exclude(id__in=[file_id for file_id, _, _ in kept])
+    removed = list(copies.select_related("media").only("id", "name", "owner_id", "directory_id", "media__size"))
+    sizes = {cloud_file.media_id: cloud_file.media.size for cloud_file in removed}
+
+    with transaction.atomic():
+        release_file_tags([cloud_file.id for cloud_file in removed])
+        CloudFile.objects.filter(id__in=[cloud_file.id for cloud_file in removed]).update(
+            is_deleted=True, deleted_at=timezone.now()
+        )
+        released = release_media_references([cloud_file.media_id for cloud_file in removed])
+        record_changes(file_change("delete", cloud_file) for cloud_file in removed)
+
+    return Response(
+        {"success": True, "deleted_files": len(removed), "freed_bytes": sum(sizes[media_id] for media_id in released)},
+        status=status.HTTP_200_OK,
+    )
+
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_WAIT = 30  # Seconds a long-poll may be held open
+
+
+def _journal_page(user, cursor, limit):
+    events = list(
+        ChangeEvent.objects.filter(owner=user, id__gt=cursor)
+        .order_by("id")
+        .values_list("id", "action", "item_type", "item_id", "parent_id", "name", "created_at")[: limit + 1]
+    )
+    changes = [
+        {"id": event_id, "action": action, "type": item_type, "item": item_id, "parent": parent_id, "name": name, "at": at}
+        for event_id, action, item_type, item_id, parent_id, name, at in events[:limit]
+    ]
+    return {
+        "changes": changes,
+        "cursor": changes[-1]["id"] if changes else cursor,
+        "has_more": len(events) > limit,
+    }
+
+
+@require_GET
+async def changes_view(request):
+    """
+    Journal of tree changes since a cursor, for sync clients.
+    Query params:
+        - cursor: Last cursor the client has applied (optional; without it only the current cursor
+          is returned, to be stored after an initial full listing)
+        - limit: Maximum number of changes to return (default 500, max 500)
+        - wait: Seconds to long-poll for new changes when there are none yet (default 0, max 30)
+
+    Returns:
+        - changes: [{id, action, type, item, parent, name, at}] oldest first
+        - cursor: Cursor to send next time, has_more: whether to fetch again straight away
+
+    Async view: a long-poll waits on the event loop instead of holding a worker thread.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    try:
+        cursor = request.GET.get("cursor")
+        cursor = int(cursor) if cursor not in (None, "") else None
+        limit = min(max(int(request.GET.get("limit", CHANGES_PAGE_SIZE)), 1), CHANGES_PAGE_SIZE)
+        wait = min(max(float(request.GET.get("wait", 0)), 0), CHANGES_MAX_WAIT)
+    except ValueError:
+        return JsonResponse({"error": "cursor, limit and wait must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if cursor is None:
+        latest = await sync_to_async(get_latest_cursor)(user.id)
+        return JsonResponse({"changes": [], "cursor": latest, "has_more": False})
+
+    if wait and not await wait_for_changes(user.id, cursor, wait):
+        return JsonResponse({"changes": [], "cursor": cursor, "has_more": False})
+
+    page = await sync_to_async(_journal_page)(user, cursor, limit)
+    return JsonResponse(page, encoder=JSONEncoder, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def storage_usage(request):
+    """
+    Storage used by the requesting user, from the storage rollups.
+
+    Returns:
+        - bytes, count: Totals over the user's live media
+        - types: [{key, bytes, count}] by MIME family, largest first
+        - folders: [{key, bytes, count}] by folder ("cloud", "avatars")
+    """
+    types = storage_breakdown("mime_family", owner_id=request.user.id)
+    return Response(
+        {
+            "bytes": sum(group["bytes"] for group in types),
+            "count": sum(group["count"] for group in types),
+            "types": types,
+            "folders": storage_breakdown("folder", owner_id=request.user.id),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def hot_cache_stats(request):
+    """
+    Hit/miss counters and occupancy of this worker's decrypted file cache.
+    """
+    return Response(hot_file_cache.stats(), status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def upload_scheduler_stats(request):
+    """
+    Upload admission control of this worker: active and deferred requests and upload
+    throughput over the last minute, in total and per user.
+    """
+    return Response(upload_scheduler.stats(), status=status.HTTP_200_OK)
+
+
+INTEGRITY_REPORT_LIMIT = 500
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def integrity_report(request):
+    """
+    Results of the integrity scrubber (scrub_media command) for live media.
+
+    Returns:
+        - counts: Media per integrity status ("" = never verified), oldest_verification
+        - problems: Missing and corrupt media with owner and the files using them (latest verified first, up to 500)
+    """
+    media = MediaFile.objects.filter(is_deleted=False)
+    counts = {
+        row["integrity_status"] or "unverified": row["count"]
+        for row in media.values("integrity_status").annotate(count=Count("id")).order_by()
+    }
+    oldest_verification = media.exclude(last_verified_at=None).order_by("last_verified_at").values_list(
+        "last_verified_at", flat=True
+    ).first()
+
+    problems = list(
+        media.filter(integrity_status__in=["missing", "corrupt"])
+        .order_by("-last_verified_at")
+        .values(
+            "id", "filename", "owner__email", "size", "integrity_status", "integrity_error", "last_verified_at"
+        )[:INTEGRITY_REPORT_LIMIT]
+    )
+    files_by_media = {}
+    for media_id, file_id, name in CloudFile.objects.filter(
+        media_id__in=[problem["id"] for problem in problems], is_deleted=False
+    ).values_list("media_id", "id", "name"):
+        files_by_media.setdefault(media_id, []).append({"id": file_id, "name": name})
+    for problem in problems:
+        problem["owner"] = problem.pop("owner__email")
+        problem["files"] = files_by_media.get(problem["id"], [])
+
+    return Response(
+        {"counts": counts, "oldest_verification": oldest_verification, "problems": problems},
+        status=status.HTTP_200_OK,
+    )
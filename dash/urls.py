@@ -1,10 +1,11 @@
 from django.urls import path
 
-from dash.views import LoginView, Stats, UserDetailView, UserListView
+from dash.views import LoginView, Stats, StorageStats, UserDetailView, UserListView
 
 urlpatterns = [
     path("login/", LoginView.as_view(), name="login"),
     path("stats/", Stats.as_view(), name="stats"),
+    path("storage/", StorageStats.as_view(), name="storage-stats"),
     path("users/", UserListView.as_view(), name="user-list"),
     path("users/<int:pk>/", UserDetailView.as_view(), name="user-detail"),
 ]
@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import date, timedelta
 
 from django.contrib.auth import authenticate
 from django.utils import timezone
@@ -10,7 +10,9 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from accounts.models import User
+from api.models import Server
 from chats.models import Chat, Message
+from cloud.utils.rollups import ROLLUP_GROUP_BY, storage_breakdown
 from dash.serializers import DashboardUserSerializer
 
 
@@ -139,6 +141,70 @@ class Stats(APIView):
         return Response(stats)
 
 
+class StorageStats(APIView):
+    """
+    What takes space in the cloud, read from the storage rollups (no MediaFile scans).
+
+    Query params:
+        - group_by: owner, mime_family, folder, server or month (default mime_family)
+        - owner, mime_family, folder, server: Restrict to one value (optional)
+        - from, to: YYYY-MM upload months, both inclusive (optional)
+        - limit: Number of groups (default 50)
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        group_by = request.GET.get("group_by", "mime_family")
+        if group_by not in ROLLUP_GROUP_BY:
+            return Response(
+                {"error": f"group_by must be one of {', '.join(ROLLUP_GROUP_BY)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters = {}
+        try:
+            for param in ("owner", "server"):
+                if request.GET.get(param):
+                    filters[f"{param}_id"] = int(request.GET[param])
+            for param in ("mime_family", "folder"):
+                if request.GET.get(param):
+                    filters[param] = request.GET[param]
+            if request.GET.get("from"):
+                year, month = map(int, request.GET["from"].split("-"))
+                filters["month__gte"] = date(year, month, 1)
+            if request.GET.get("to"):
+                year, month = map(int, request.GET["to"].split("-"))
+                filters["month__lte"] = date(year, month, 1)
+            limit = max(int(request.GET.get("limit", 50)), 1)
+        except ValueError:
+            return Response({"error": "Invalid owner, server, month or limit"}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = storage_breakdown(group_by, **filters)
+        total = {"bytes": sum(group["bytes"] for group in groups), "count": sum(group["count"] for group in groups)}
+        groups = groups[:limit]
+
+        # Readable labels for id keys
+        if group_by == "owner":
+            users = User.objects.in_bulk([group["key"] for group in groups])
+            for group in groups:
+                user = users.get(group["key"])
+                group["label"] = user.email if user else None
+        elif group_by == "server":
+            servers = Server.objects.in_bulk([group["key"] for group in groups if group["key"]])
+            for group in groups:
+                server = servers.get(group["key"])
+                group["label"] = server.name if server else None
+
+        return Response(
+            {
+                "group_by": group_by,
+                "total": total,
+                "groups": groups,
+                "servers": list(Server.objects.order_by("name").values("id", "name", "total_space")),
+            }
+        )
+
+
 class UserDetailView(RetrieveDestroyAPIView):
     serializer_class = DashboardUserSerializer
     permission_classes = (permissions.IsAdminUser,)
@@ -78,7 +78,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "main.middleware.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -194,12 +194,62 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = None  # No limit on request body size
 # Only allow one file per upload request
 DATA_UPLOAD_MAX_NUMBER_FILES = 1
 
+# Cloud Storage Settings
+# Remote files (e.g. Google avatars) are streamed to disk and aborted once they grow past this size
+CLOUD_REMOTE_FETCH_MAX_SIZE = int(os.environ.get("CLOUD_REMOTE_FETCH_MAX_SIZE", 20 * 1024 * 1024))  # 20MB
+# Wall-clock limit for a single remote download, so slow senders cannot hold a worker forever
+CLOUD_REMOTE_FETCH_TIMEOUT = int(os.environ.get("CLOUD_REMOTE_FETCH_TIMEOUT", 30))  # seconds
+# Threads shared by all requests for hashing/encrypting ingested files (caps the cores ingest may use)
+CLOUD_INGEST_WORKERS = int(os.environ.get("CLOUD_INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+# Codec used to compress text-like uploads before encryption (empty string disables compression)
+CLOUD_COMPRESSION_CODEC = os.environ.get("CLOUD_COMPRESSION_CODEC", "zlib")
+CLOUD_STREAM_BLOCK_SIZE = int(os.environ.get("CLOUD_STREAM_BLOCK_SIZE", 1024 * 1024))  # 1MB per worker thread read in async downloads
+# In-memory LRU of decrypted small files (per process) so repeat previews skip disk reads and AES work
+CLOUD_HOT_CACHE_MAX_BYTES = int(os.environ.get("CLOUD_HOT_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # 64MB
+CLOUD_HOT_CACHE_MAX_FILE_SIZE = int(os.environ.get("CLOUD_HOT_CACHE_MAX_FILE_SIZE", 1024 * 1024))  # 1MB
+# Hand raw files to the front proxy instead of streaming them from Python, e.g. "X-Accel-Redirect" for nginx
+# (with an internal location mapping CLOUD_SENDFILE_PREFIX to MEDIA_ROOT). Unset = serve from Django.
+CLOUD_SENDFILE_HEADER = os.environ.get("CLOUD_SENDFILE_HEADER", "")
+CLOUD_SENDFILE_PREFIX = os.environ.get("CLOUD_SENDFILE_PREFIX", "/protected-media/")
+# Content-defined chunking parameters handed to delta-sync clients (FastCDC min/average/max chunk sizes)
+CLOUD_DELTA_MIN_CHUNK_SIZE = int(os.environ.get("CLOUD_DELTA_MIN_CHUNK_SIZE", 256 * 1024))  # 256KB
+CLOUD_DELTA_AVG_CHUNK_SIZE = int(os.environ.get("CLOUD_DELTA_AVG_CHUNK_SIZE", 1024 * 1024))  # 1MB
+CLOUD_DELTA_MAX_CHUNK_SIZE = int(os.environ.get("CLOUD_DELTA_MAX_CHUNK_SIZE", 4 * 1024 * 1024))  # 4MB
+# File version retention: previous versions kept per file, and how long they live (0 = no limit).
+# The count is enforced on every new version, the age by the prune_versions command.
+CLOUD_VERSION_MAX_COUNT = int(os.environ.get("CLOUD_VERSION_MAX_COUNT", 20))
+CLOUD_VERSION_MAX_AGE_DAYS = int(os.environ.get("CLOUD_VERSION_MAX_AGE_DAYS", 90))
+# Integrity scrubbing (scrub_media command): re-verify every blob this often, reading at most
+# CLOUD_SCRUB_BYTES_PER_SECOND (0 = unthrottled) in CLOUD_SCRUB_READ_SIZE sequential reads
+CLOUD_SCRUB_INTERVAL_DAYS = int(os.environ.get("CLOUD_SCRUB_INTERVAL_DAYS", 30))
+CLOUD_SCRUB_BYTES_PER_SECOND = int(os.environ.get("CLOUD_SCRUB_BYTES_PER_SECOND", 50 * 1024 * 1024))  # 50MB/s
+CLOUD_SCRUB_READ_SIZE = int(os.environ.get("CLOUD_SCRUB_READ_SIZE", 4 * 1024 * 1024))  # 4MB
+# Storage garbage collection (cloud_gc command): abandoned upload sessions and temp downloads,
+# blob directories without a MediaFile (after a grace period for ingests in flight), deleted media
+# nothing references any more, and delta-sync chunks no manifest has used for a while
+CLOUD_GC_TEMP_MAX_AGE_HOURS = int(os.environ.get("CLOUD_GC_TEMP_MAX_AGE_HOURS", 24))  # Matches the upload session lifetime
+CLOUD_GC_ORPHAN_GRACE_HOURS = int(os.environ.get("CLOUD_GC_ORPHAN_GRACE_HOURS", 6))
+CLOUD_GC_DELETED_MEDIA_DAYS = int(os.environ.get("CLOUD_GC_DELETED_MEDIA_DAYS", 7))
+CLOUD_GC_CHUNK_MAX_AGE_DAYS = int(os.environ.get("CLOUD_GC_CHUNK_MAX_AGE_DAYS", 30))
+# Upload admission control (per process): concurrent upload requests and upload bandwidth per user and
+# in total (0 = unlimited bandwidth); buckets hold CLOUD_UPLOAD_BURST_SECONDS worth of bytes
+CLOUD_UPLOAD_USER_CONCURRENCY = int(os.environ.get("CLOUD_UPLOAD_USER_CONCURRENCY", 4))
+CLOUD_UPLOAD_GLOBAL_CONCURRENCY = int(os.environ.get("CLOUD_UPLOAD_GLOBAL_CONCURRENCY", 16))
+CLOUD_UPLOAD_USER_BYTES_PER_SECOND = int(os.environ.get("CLOUD_UPLOAD_USER_BYTES_PER_SECOND", 20 * 1024 * 1024))  # 20MB/s
+CLOUD_UPLOAD_GLOBAL_BYTES_PER_SECOND = int(os.environ.get("CLOUD_UPLOAD_GLOBAL_BYTES_PER_SECOND", 100 * 1024 * 1024))  # 100MB/s
+CLOUD_UPLOAD_BURST_SECONDS = int(os.environ.get("CLOUD_UPLOAD_BURST_SECONDS", 2))
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-    )
+    ),
+    # Rates for the scoped throttles of the public share link endpoints (per client IP)
+    "DEFAULT_THROTTLE_RATES": {
+        "share_link": "120/min",
+        "share_link_download": "60/min",
+    },
 }
 
 SIMPLE_JWT = {